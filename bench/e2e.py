@@ -0,0 +1,280 @@
+"""Offline end-to-end benchmark of chat turns and chart tools.
+
+Runs realistic scenarios against the stand-ins in `bench.standins` (fake FreeAstrologyAPI,
+mongomock, fake geocoder, in-memory vector store, scripted chat model), so nothing leaves
+the machine and results are repeatable. Per-stage latency comes from the app's own
+tracing spans (`src/tracing.py`); a second pass under tracemalloc reports allocations.
+
+    python -m bench.e2e                          # run and print the report
+    python -m bench.e2e --save-baseline          # write bench/baseline.json
+    python -m bench.e2e --baseline bench/baseline.json --tolerance 0.5   # exit 1 on regression
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from bench.standins import PROJECT_ROOT, OfflineStack, composed_turn, offline_stack, reset_caches
+
+from langchain_core.messages import HumanMessage
+
+import src.tracing as tracing
+from src.agent import create_agent_executor
+from src.tools import _tool_impl
+
+DEFAULT_BASELINE = os.path.join(PROJECT_ROOT, "bench", "baseline.json")
+PROFILE = {"dob": "1990-05-01", "tob": "06:30", "city": "New Delhi, India"}
+GENDER = "Male"
+# Regressions smaller than this are timer noise on sub-millisecond scenarios
+ABS_SLACK_MS = 2.0
+# Below this many iterations p95 is (nearly) the single slowest run, so only p50 is gated
+MIN_P95_ITERATIONS = 20
+
+
+@dataclass
+class Scenario:
+    name: str
+    run: Callable[[OfflineStack, int], Optional[str]]  # returns the session id whose trace to collect
+    cold: bool = False  # reset caches before every iteration
+
+
+def _session(name: str, i: int) -> str:
+    return f"bench-{name}-{i}@offline"
+
+
+def _turn(session_id: str, question: str) -> str:
+    executor = create_agent_executor(session_id, GENDER)
+    executor.invoke(
+        {"messages": [HumanMessage(content=composed_turn(PROFILE, question))]},
+        {"configurable": {"session_id": session_id}},
+    )
+    return session_id
+
+
+def _tool(name: str) -> Callable[[OfflineStack, int], str]:
+    def run(stack: OfflineStack, i: int) -> str:
+        session_id = _session(name, i)
+        with tracing.start_trace("tool_impl", session_id, enabled=True):
+            _tool_impl(PROFILE["dob"], PROFILE["tob"], PROFILE["city"], "D1")
+        return session_id
+
+    return run
+
+
+def _single_chart(stack: OfflineStack, i: int) -> str:
+    return _turn(_session("single_chart", i), "How will my career grow over the next few years?")
+
+
+def _multi_chart(stack: OfflineStack, i: int) -> str:
+    return _turn(_session("multi_chart", i), "Compare my marriage prospects with my career and status.")
+
+
+def _follow_up(stack: OfflineStack, i: int) -> str:
+    session_id = _session("follow_up", i)
+    _turn(session_id, "What does my Navamsa say about my spouse?")
+    tracing.pop_trace(session_id)  # measure only the second turn, which replays history
+    return _turn(session_id, "And when is marriage likely?")
+
+
+def _greeting(stack: OfflineStack, i: int) -> str:
+    return _turn(_session("greeting", i), "Namaste!")
+
+
+SCENARIOS = [
+    Scenario("tool_impl_cold", _tool("tool_impl_cold"), cold=True),
+    Scenario("tool_impl_warm", _tool("tool_impl_warm")),
+    Scenario("turn_single_chart", _single_chart, cold=True),
+    Scenario("turn_multi_chart", _multi_chart, cold=True),
+    Scenario("turn_follow_up", _follow_up),
+    Scenario("turn_greeting", _greeting),
+]
+
+
+def _pct(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(values),
+        "p50_ms": round(statistics.median(values), 3),
+        "p95_ms": round(_pct(values, 0.95), 3),
+        "max_ms": round(max(values), 3),
+    }
+
+
+def run_latency(stack: OfflineStack, scenario: Scenario, iterations: int, warmup: int = 1) -> Dict[str, object]:
+    totals: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    for i in range(-warmup, iterations):
+        if scenario.cold:
+            reset_caches(stack)
+        start = time.perf_counter()
+        session_id = scenario.run(stack, i)
+        elapsed = (time.perf_counter() - start) * 1000
+        trace = tracing.pop_trace(session_id) if session_id else None
+        if i < 0:
+            continue
+        totals.append(elapsed)
+        if trace is None:
+            continue
+        per_name: Dict[str, float] = {}
+        for s in trace.spans:
+            if s.parent_id is not None:  # the root is the total
+                per_name[s.name] = per_name.get(s.name, 0.0) + s.duration_ms
+        for name, ms in per_name.items():
+            stages.setdefault(name, []).append(ms)
+    return {
+        "total": _summary(totals),
+        "stages": {name: _summary(v) for name, v in sorted(stages.items())},
+    }
+
+
+def _site(filename: str, lineno: int) -> str:
+    path = os.path.abspath(filename)
+    if path.startswith(PROJECT_ROOT + os.sep):
+        path = os.path.relpath(path, PROJECT_ROOT)
+    else:  # stdlib / site-packages: the package and module are enough
+        path = "/".join(path.split(os.sep)[-2:])
+    return f"{path}:{lineno}"
+
+
+def run_allocations(stack: OfflineStack, scenario: Scenario, top: int = 5) -> Dict[str, object]:
+    """One warm-up and one measured iteration under tracemalloc."""
+    if scenario.cold:
+        reset_caches(stack)
+    tracing.pop_trace(scenario.run(stack, 10_000) or "")
+    if scenario.cold:
+        reset_caches(stack)
+    tracemalloc.start(10)
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        tracing.pop_trace(scenario.run(stack, 10_001) or "")
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")]
+    diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+    allocated = sum(d.size_diff for d in diff if d.size_diff > 0)
+    blocks = sum(d.count_diff for d in diff if d.count_diff > 0)
+    sites = []
+    for d in sorted(diff, key=lambda d: d.size_diff, reverse=True)[:top]:
+        frame = d.traceback[0]
+        sites.append({
+            "site": _site(frame.filename, frame.lineno),
+            "kb": round(d.size_diff / 1024, 1), "blocks": d.count_diff,
+        })
+    return {"peak_kb": round(peak / 1024, 1), "retained_kb": round(allocated / 1024, 1),
+            "retained_blocks": blocks, "top_sites": sites}
+
+
+def run(iterations: int = 20, api_latency_ms: float = 0.0, llm_latency_ms: float = 0.0,
+        names: Optional[List[str]] = None, allocations: bool = True) -> Dict[str, object]:
+    selected = [s for s in SCENARIOS if not names or s.name in names]
+    results: Dict[str, object] = {}
+    enabled, rate = tracing.TRACING_ENABLED, tracing.TRACE_SAMPLE_RATE
+    tracing.TRACING_ENABLED, tracing.TRACE_SAMPLE_RATE = True, 1.0
+    try:
+        with offline_stack(api_latency_ms=api_latency_ms, llm_latency_ms=llm_latency_ms) as stack:
+            for scenario in selected:
+                result = run_latency(stack, scenario, iterations)
+                if allocations:
+                    result["allocations"] = run_allocations(stack, scenario)
+                results[scenario.name] = result
+            api_requests = stack.api.requests
+    finally:
+        tracing.TRACING_ENABLED, tracing.TRACE_SAMPLE_RATE = enabled, rate
+    return {
+        "config": {"iterations": iterations, "api_latency_ms": api_latency_ms, "llm_latency_ms": llm_latency_ms,
+                   "python": sys.version.split()[0]},
+        "api_requests": api_requests,
+        "scenarios": results,
+    }
+
+
+def compare(report: Dict[str, object], baseline: Dict[str, object], tolerance: float) -> List[str]:
+    """Regressions of p50/p95 latency or peak allocation beyond `tolerance` (relative) vs the baseline.
+
+    p95 is compared only when the run has at least MIN_P95_ITERATIONS samples.
+    """
+    problems = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = report["scenarios"].get(name)
+        if current is None:
+            continue
+        keys = ["p50_ms"]
+        if current["total"].get("n", 0) >= MIN_P95_ITERATIONS:
+            keys.append("p95_ms")
+        for key in keys:
+            was, now = base["total"][key], current["total"][key]
+            if now > was * (1 + tolerance) + ABS_SLACK_MS:
+                problems.append(f"{name}: {key} {now:.2f} > baseline {was:.2f} (+{tolerance:.0%})")
+        was_kb = base.get("allocations", {}).get("peak_kb")
+        now_kb = current.get("allocations", {}).get("peak_kb")
+        if was_kb and now_kb and now_kb > was_kb * (1 + tolerance) + 64:
+            problems.append(f"{name}: peak_kb {now_kb:.0f} > baseline {was_kb:.0f} (+{tolerance:.0%})")
+    return problems
+
+
+def print_report(report: Dict[str, object], stages: bool = True) -> None:
+    cfg = report["config"]
+    print(f"iterations={cfg['iterations']} api_latency_ms={cfg['api_latency_ms']} "
+          f"llm_latency_ms={cfg['llm_latency_ms']} api_requests={report['api_requests']}")
+    print(f"{'scenario':<22} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9} {'peak_kb':>9} {'kept_kb':>9}")
+    for name, r in report["scenarios"].items():
+        t, a = r["total"], r.get("allocations", {})
+        print(f"{name:<22} {t['p50_ms']:>9.2f} {t['p95_ms']:>9.2f} {t['max_ms']:>9.2f} "
+              f"{a.get('peak_kb', 0):>9.0f} {a.get('retained_kb', 0):>9.0f}")
+        if not stages:
+            continue
+        for stage, s in r["stages"].items():
+            print(f"  {stage:<32} {s['p50_ms']:>9.2f} {s['p95_ms']:>9.2f}")
+        for site in a.get("top_sites", []):
+            print(f"  alloc {site['site']:<40} {site['kb']:>8.1f} KB {site['blocks']:>6} blocks")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of chat turns and chart tools.")
+    parser.add_argument("-n", "--iterations", type=int, default=20, help="Measured iterations per scenario")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Simulated FreeAstrologyAPI latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated chat model latency per call")
+    parser.add_argument("--scenario", action="append", choices=[s.name for s in SCENARIOS], help="Run only these")
+    parser.add_argument("--no-alloc", action="store_true", help="Skip the tracemalloc pass")
+    parser.add_argument("--brief", action="store_true", help="Totals only, no per-stage lines")
+    parser.add_argument("--json", metavar="PATH", help="Also write the full report as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="Fail (exit 1) on regression against this report")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed relative regression (default 0.5)")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, metavar="PATH",
+                        help=f"Write this run as the baseline (default {os.path.relpath(DEFAULT_BASELINE, PROJECT_ROOT)})")
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.api_latency_ms, args.llm_latency_ms, args.scenario, not args.no_alloc)
+    print_report(report, stages=not args.brief)
+    for path in filter(None, (args.json, args.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Wrote {path}")
+    if args.baseline:
+        if args.iterations < MIN_P95_ITERATIONS:
+            print(f"Gating p50 only: p95 needs -n >= {MIN_P95_ITERATIONS}")
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for p in problems:
+            print(f"REGRESSION {p}")
+        if problems:
+            return 1
+        print("No regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+"""Concurrent-session load generator on the offline stand-ins.
+
+Each simulated session runs in its own thread (as each Streamlit session does) with its
+own `session_id` and birth profile, and issues chat turns with a think time between
+them. `--cache-hit-ratio` is the share of sessions whose profile is one of a few charts
+fetched before the run (chart cache hits); the rest use a unique birth date, so their
+first chart of each type goes to the fake FreeAstrologyAPI.
+
+    python -m bench.load --sessions 1,5,10,25,50 --turns 3 --think-ms 200
+    python -m bench.load --sessions 20 --api-latency-ms 300 --llm-latency-ms 800
+
+Every level reports throughput, turn latency percentiles, process memory growth per
+session and the connections opened to Mongo and to the chart API, then points at the
+level where throughput stops scaling.
+"""
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from bench.standins import CITY_COORDS, OfflineStack, composed_turn, offline_stack, reset_caches
+
+from langchain_core.messages import HumanMessage
+
+from src.agent import create_agent_executor
+from src.tools import _tool_impl
+
+QUESTIONS = [
+    "How will my career grow over the next few years?",
+    "What does my Navamsa say about my spouse?",
+    "Compare my marriage prospects with my career and status.",
+    "Will I have children, and when?",
+    "Thank you!",
+]
+WARM_PROFILES = 4
+# Throughput gain below this between two load levels counts as saturated
+SATURATION_GAIN = 0.10
+
+
+@dataclass
+class LevelResult:
+    sessions: int
+    turns: int = 0
+    errors: int = 0
+    wall_s: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list)
+    rss_growth_kb: float = 0.0
+    heap_growth_kb: Optional[float] = None
+    peak_threads: int = 0
+    http_connections: int = 0
+    http_requests: int = 0
+    http_peak_in_flight: int = 0
+    mongo_clients: int = 0
+
+    @property
+    def throughput(self) -> float:
+        return self.turns / self.wall_s if self.wall_s else 0.0
+
+    def pct(self, q: float) -> float:
+        if not self.latencies_ms:
+            return 0.0
+        ordered = sorted(self.latencies_ms)
+        return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _rss_kb() -> float:
+    """Current resident set size; falls back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 if sys.platform == "darwin" else peak
+
+
+def _profile(index: int, warm: bool) -> Dict[str, str]:
+    cities = sorted(CITY_COORDS)
+    if warm:
+        slot = index % WARM_PROFILES
+        return {"dob": (date(1985, 1, 1) + timedelta(days=slot)).isoformat(), "tob": "06:30",
+                "city": cities[slot % len(cities)]}
+    return {
+        "dob": (date(1950, 1, 1) + timedelta(days=index)).isoformat(),
+        "tob": f"{index % 24:02d}:{index * 7 % 60:02d}",
+        "city": cities[index % len(cities)],
+    }
+
+
+def _prewarm(stack: OfflineStack) -> None:
+    """Fetch the shared profiles' charts and build the agent so levels measure steady state."""
+    create_agent_executor("load-warmup@offline", "Male").invoke(
+        {"messages": [HumanMessage(content=composed_turn(_profile(0, warm=True), QUESTIONS[0]))]},
+        {"configurable": {"session_id": "load-warmup@offline"}},
+    )
+    for slot in range(WARM_PROFILES):
+        p = _profile(slot, warm=True)
+        for chart in ("D1", "D9", "D10", "D7"):
+            _tool_impl(p["dob"], p["tob"], p["city"], chart)
+
+
+class _Sampler(threading.Thread):
+    """Polls thread count and RSS while a level runs."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(name="load-sampler", daemon=True)
+        self.interval = interval
+        self.peak_threads = threading.active_count()
+        self.peak_rss_kb = _rss_kb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            self.peak_rss_kb = max(self.peak_rss_kb, _rss_kb())
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def run_level(stack: OfflineStack, sessions: int, turns: int, think_ms: float, cache_hit_ratio: float,
+              seed: int, level_tag: str, trace_heap: bool = False) -> LevelResult:
+    rng = random.Random(seed)
+    plans = []
+    for i in range(sessions):
+        warm = rng.random() < cache_hit_ratio
+        questions = [QUESTIONS[(i + t) % len(QUESTIONS)] for t in range(turns)]
+        thinks = [rng.uniform(0.5, 1.5) * think_ms / 1000 for _ in range(turns)]
+        plans.append((f"load-{level_tag}-{i}@offline", _profile((seed * 10_000 + i) % 20_000, warm), questions, thinks))
+
+    result = LevelResult(sessions=sessions)
+    lock = threading.Lock()
+    start_gate = threading.Barrier(sessions + 1)
+
+    def session(session_id: str, profile: Dict[str, str], questions: List[str], thinks: List[float]):
+        executor = create_agent_executor(session_id, "Female" if hash(session_id) % 2 else "Male")
+        start_gate.wait()
+        for question, think in zip(questions, thinks):
+            time.sleep(think)
+            started = time.perf_counter()
+            ok = True
+            try:
+                executor.invoke(
+                    {"messages": [HumanMessage(content=composed_turn(profile, question))]},
+                    {"configurable": {"session_id": session_id}},
+                )
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                result.turns += 1
+                if ok:
+                    result.latencies_ms.append(elapsed)
+                else:
+                    result.errors += 1
+
+    threads = [threading.Thread(target=session, args=plan, name=f"session-{i}") for i, plan in enumerate(plans)]
+    http_before = (stack.api.connections, stack.api.requests)
+    stack.api.peak_active = 0
+    gc.collect()
+    rss_before = _rss_kb()
+    if trace_heap:
+        tracemalloc.start()
+    heap_before = tracemalloc.get_traced_memory()[0] if trace_heap else 0
+    sampler = _Sampler()
+    sampler.start()
+    for t in threads:
+        t.start()
+    start_gate.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    result.wall_s = time.perf_counter() - started
+    sampler.stop()
+    gc.collect()
+    if trace_heap:
+        result.heap_growth_kb = (tracemalloc.get_traced_memory()[0] - heap_before) / 1024
+        tracemalloc.stop()
+    result.rss_growth_kb = max(sampler.peak_rss_kb, _rss_kb()) - rss_before
+    result.peak_threads = sampler.peak_threads
+    result.http_connections = stack.api.connections - http_before[0]
+    result.http_requests = stack.api.requests - http_before[1]
+    result.http_peak_in_flight = stack.api.peak_active
+    result.mongo_clients = stack.stats.get("mongo_clients", 0)
+    return result
+
+
+def saturation_level(results: List[LevelResult]) -> Optional[int]:
+    """First session count whose throughput gain over the previous level falls below SATURATION_GAIN."""
+    for prev, cur in zip(results, results[1:]):
+        if prev.throughput and cur.throughput < prev.throughput * (1 + SATURATION_GAIN):
+            return cur.sessions
+    return None
+
+
+def print_results(results: List[LevelResult]) -> None:
+    print(f"{'sessions':>8} {'turns':>6} {'err':>4} {'turns/s':>8} {'p50_ms':>8} {'p95_ms':>8} {'p99_ms':>8} "
+          f"{'kb/sess':>8} {'threads':>7} {'http_conn':>9} {'http_req':>8} {'inflight':>8} {'mongo':>5}")
+    for r in results:
+        growth = r.heap_growth_kb if r.heap_growth_kb is not None else r.rss_growth_kb
+        print(f"{r.sessions:>8} {r.turns:>6} {r.errors:>4} {r.throughput:>8.1f} {r.pct(0.5):>8.1f} "
+              f"{r.pct(0.95):>8.1f} {r.pct(0.99):>8.1f} {growth / r.sessions:>8.0f} {r.peak_threads:>7} "
+              f"{r.http_connections:>9} {r.http_requests:>8} {r.http_peak_in_flight:>8} {r.mongo_clients:>5}")
+    level = saturation_level(results)
+    if level is not None:
+        print(f"Throughput stops scaling at about {level} concurrent sessions "
+              f"(<{SATURATION_GAIN:.0%} gain over the previous level).")
+    else:
+        print("Throughput still scaling at the highest level tested.")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Concurrent chat sessions against the offline stand-ins.")
+    parser.add_argument("--sessions", default="1,5,10,25", help="Comma-separated concurrent session counts to run")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per session")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="Mean think time before each turn (±50%%)")
+    parser.add_argument("--cache-hit-ratio", type=float, default=0.5,
+                        help="Share of sessions using a pre-fetched birth profile (chart cache hits)")
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="Simulated FreeAstrologyAPI latency")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0, help="Simulated chat model latency per call")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Measure Python heap growth with tracemalloc instead of RSS (slower)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    levels = [int(n) for n in args.sessions.split(",") if n.strip()]
+    print(f"turns={args.turns} think_ms={args.think_ms} cache_hit_ratio={args.cache_hit_ratio} "
+          f"api_latency_ms={args.api_latency_ms} llm_latency_ms={args.llm_latency_ms}")
+    results = []
+    with offline_stack(api_latency_ms=args.api_latency_ms, llm_latency_ms=args.llm_latency_ms) as stack:
+        for idx, sessions in enumerate(levels):
+            reset_caches(stack)
+            _prewarm(stack)
+            results.append(run_level(stack, sessions, args.turns, args.think_ms, args.cache_hit_ratio,
+                                     seed=args.seed + idx, level_tag=f"{idx}-{sessions}", trace_heap=args.trace_memory))
+            print(f"  {sessions} sessions: {results[-1].turns} turns in {results[-1].wall_s:.1f}s", file=sys.stderr)
+    print_results(results)
+    return 1 if any(r.errors for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
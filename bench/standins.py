@@ -0,0 +1,320 @@
+"""Local stand-ins for every external dependency of a chat turn.
+
+`offline_stack()` points the app at a fake FreeAstrologyAPI HTTP server replaying the
+chart fixtures, an in-memory Mongo (mongomock), a fixed-table geocoder, an in-memory
+vector store with deterministic embeddings and a scripted chat model, so the real
+agent graph, tools, caches and history run end to end without network access.
+LangSmith tracing and background history summaries are switched off while it is active.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+
+import mongomock
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.vectorstores import InMemoryVectorStore
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FIXTURE_DIR = os.path.join(PROJECT_ROOT, "tests", "fixtures", "charts")
+API_HOST = "https://json.freeastrologyapi.com"
+
+CITY_COORDS = {
+    "New Delhi, India": (28.6139, 77.2090),
+    "Mumbai, India": (19.0760, 72.8777),
+    "Kathmandu, Nepal": (27.7172, 85.3240),
+    "Pune, India": (18.5204, 73.8567),
+    "Chennai, India": (13.0827, 80.2707),
+}
+
+BPHS_PASSAGES = [
+    "The tenth house rules karma, profession and honours; its lord in a kendra gives a rise in status.",
+    "The seventh house and Venus signify the spouse; the Navamsa shows the strength of marriage.",
+    "Jupiter aspecting the fifth house blesses the native with children and wisdom.",
+    "The lord of the Lagna in the sixth, eighth or twelfth house weakens health.",
+    "Saturn in the tenth gives a slow but lasting career through discipline and service.",
+    "The second house governs wealth and speech; the Hora chart refines its promise.",
+    "Rahu in the tenth grants fame in foreign lands; Ketu there inclines to renunciation.",
+    "A strong Moon in the Lagna gives a calm mind and popularity.",
+]
+
+
+# -------------------- FreeAstrologyAPI --------------------
+
+class FakeAstrologyAPI:
+    """Threaded HTTP server answering every chart endpoint from the recorded fixtures.
+
+    D1 (`/planets`) serves D1.json; every divisional endpoint serves D9.json. `latency_ms`
+    simulates the remote round trip.
+    """
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.requests = 0
+        self.connections = 0
+        self.active = 0
+        self.peak_active = 0  # most requests in flight at once
+        self._lock = threading.Lock()
+        with open(os.path.join(FIXTURE_DIR, "D1.json"), "rb") as f:
+            self._d1 = f.read()
+        with open(os.path.join(FIXTURE_DIR, "D9.json"), "rb") as f:
+            self._varga = f.read()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with api._lock:
+                    api.connections += 1
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with api._lock:
+                    api.requests += 1
+                    api.active += 1
+                    api.peak_active = max(api.peak_active, api.active)
+                try:
+                    if api.latency_ms:
+                        time.sleep(api.latency_ms / 1000)
+                finally:
+                    with api._lock:
+                        api.active -= 1
+                body = api._d1 if self.path.rstrip("/") == "/planets" else api._varga
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-astro-api", daemon=True)
+
+    def start(self) -> "FakeAstrologyAPI":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# -------------------- Geocoder / retriever --------------------
+
+@dataclass
+class _Location:
+    latitude: float
+    longitude: float
+
+
+class FakeGeocoder:
+    """Nominatim-compatible `geocode` over a fixed city table."""
+
+    def __init__(self, coords: Optional[Dict[str, tuple]] = None):
+        self.coords = coords or CITY_COORDS
+        self.calls = 0
+
+    def geocode(self, city, exactly_one=True, timeout=None):
+        self.calls += 1
+        hit = self.coords.get(city)
+        return _Location(*hit) if hit else None
+
+
+def fake_retriever(k: int = 4):
+    """In-memory vector store of BPHS-like passages with deterministic embeddings."""
+    store = InMemoryVectorStore(DeterministicFakeEmbedding(size=256))
+    store.add_documents([Document(page_content=p) for p in BPHS_PASSAGES])
+    return store.as_retriever(search_kwargs={"k": k})
+
+
+# -------------------- Chat model --------------------
+
+_PROFILE = re.compile(r"DOB:\s*(?P<dob>\S+)\s*\nTime:\s*(?P<tob>\S+)\s*\nCity:\s*(?P<city>[^\n]+)")
+_GREETING = re.compile(r"^\s*(hi|hello|namaste|thanks?|thank you)\b", re.IGNORECASE)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Deterministic stand-in for the agent's chat model.
+
+    On the first step of a turn it calls the chart tools the local query router picks
+    for the question (D1 if none) plus the BPHS search; once the tool results are in, it
+    answers. Greetings are answered directly. The decision depends only on the messages,
+    so one instance can serve any number of concurrent sessions.
+    """
+
+    latency_ms: float = 0.0
+    answer_words: int = 120
+    tool_names: Dict[str, str] = {}  # chart code -> tool name
+    router: Optional[object] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-offline"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _plan(self, messages) -> AIMessage:
+        from src.tool_router import question_text
+
+        since_user = []
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                human = m
+                break
+            since_user.append(m)
+        else:
+            human = None
+        question = question_text(messages)
+        if any(isinstance(m, ToolMessage) for m in since_user) or human is None or _GREETING.match(question):
+            charts = [m.name for m in since_user if isinstance(m, ToolMessage)]
+            words = " ".join(["insight"] * self.answer_words)
+            return AIMessage(content=f"<thinking>used {', '.join(charts) or 'no tools'}</thinking>Answer: {words}")
+        profile = _PROFILE.search(human.content if isinstance(human.content, str) else "")
+        args = profile.groupdict() if profile else {"dob": "1990-01-01", "tob": "06:00", "city": "New Delhi, India"}
+        args["city"] = args["city"].strip()
+        decision = self.router.route(question) if self.router is not None else None
+        codes = [c for c in (decision.charts if decision and not decision.fallback else []) if c in self.tool_names]
+        calls = [{"name": self.tool_names[c], "args": dict(args), "id": f"call_{c}"} for c in (codes or ["D1"])]
+        calls.append({"name": "bphs_search_pinecone", "args": {"query": question[:200]}, "id": "call_bphs"})
+        return AIMessage(content="", tool_calls=calls)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        msg = self._plan(messages)
+        prompt_tokens = sum(len(str(m.content)) for m in messages) // 4 + 1
+        msg.usage_metadata = {
+            "input_tokens": prompt_tokens, "output_tokens": len(str(msg.content)) // 4 + 1,
+            "total_tokens": prompt_tokens + len(str(msg.content)) // 4 + 1,
+        }
+        return ChatResult(generations=[ChatGeneration(message=msg)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        """Streams the planned answer word by word; tool calls arrive as a single chunk."""
+        msg = self._generate(messages, stop, **kwargs).generations[0].message
+        if msg.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(
+                content="", tool_call_chunks=[
+                    {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                    for i, c in enumerate(msg.tool_calls)
+                ], usage_metadata=msg.usage_metadata,
+            ))
+            return
+        words = re.findall(r"\S+\s*", msg.content)
+        for i, word in enumerate(words):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=word, usage_metadata=msg.usage_metadata if i == len(words) - 1 else None,
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
+
+
+# -------------------- Wiring --------------------
+
+@dataclass
+class OfflineStack:
+    api: FakeAstrologyAPI
+    mongo: object
+    geocoder: FakeGeocoder
+    model: ScriptedChatModel
+    services: object
+    stats: Dict[str, int] = field(default_factory=dict)  # mongo_clients: clients the container built
+
+
+@contextmanager
+def offline_stack(api_latency_ms: float = 0.0, llm_latency_ms: float = 0.0):
+    """Install the stand-ins into the process-wide service container and tool config."""
+    import src.agent as agent_mod
+    import src.chat_memory as chat_memory
+    import src.services as services_mod
+    import src.tools as tools
+    from src.rate_limiter import RateLimiter
+    from src.tool_router import QueryRouter, chart_code_for_tool
+
+    api = FakeAstrologyAPI(latency_ms=api_latency_ms).start()
+    mongo = mongomock.MongoClient()
+    geocoder = FakeGeocoder()
+    chart_tools = {chart_code_for_tool(t.name): t for t in agent_mod.AGENT_TOOLS if chart_code_for_tool(t.name)}
+    model = ScriptedChatModel(
+        latency_ms=llm_latency_ms,
+        tool_names={code: t.name for code, t in chart_tools.items()},
+        router=QueryRouter({code: t.description or "" for code, t in chart_tools.items()}),
+    )
+    stats = {"mongo_clients": 0}
+
+    def mongo_factory():
+        stats["mongo_clients"] += 1
+        return mongo
+
+    services = services_mod.Services(mongo_factory=mongo_factory)
+    services._resources.update({
+        "geocoder": geocoder, "retriever": fake_retriever(),
+        "chat_model:fast": model, "chat_model:strong": model,
+        "rate_limiter": RateLimiter(None),  # the stand-in API has no quota to protect
+    })
+
+    saved = {
+        "services": services_mod._services, "agent": agent_mod._shared_agent,
+        "template": agent_mod._load_system_template,
+        "config": {code: dict(cfg) for code, cfg in tools.CHART_CONFIG.items()},
+        "summaries": chat_memory.HISTORY_SUMMARY_ENABLED,
+        "langsmith": os.environ.get("LANGCHAIN_TRACING_V2"),
+    }
+    os.environ["LANGCHAIN_TRACING_V2"] = "false"
+    chat_memory.HISTORY_SUMMARY_ENABLED = False
+    services_mod._services = services
+    agent_mod._shared_agent = None
+    agent_mod._load_system_template = lambda: agent_mod.DEFAULT_SYSTEM_PROMPT
+    for cfg in tools.CHART_CONFIG.values():
+        cfg["data"] = cfg["data"].replace(API_HOST, api.base_url)
+    tools._bphs_cache.clear()
+    try:
+        yield OfflineStack(api, mongo, geocoder, model, services, stats)
+    finally:
+        api.stop()
+        for code, cfg in saved["config"].items():
+            tools.CHART_CONFIG[code].update(cfg)
+        services_mod._services = saved["services"]
+        agent_mod._shared_agent = saved["agent"]
+        agent_mod._load_system_template = saved["template"]
+        chat_memory.HISTORY_SUMMARY_ENABLED = saved["summaries"]
+        if saved["langsmith"] is None:
+            os.environ.pop("LANGCHAIN_TRACING_V2", None)
+        else:
+            os.environ["LANGCHAIN_TRACING_V2"] = saved["langsmith"]
+
+
+def reset_caches(stack: OfflineStack) -> None:
+    """Drop every cached chart, geocode and BPHS result so the next call goes cold."""
+    import src.tools as tools
+    import src.utils as utils
+    from src.config import MONGO_API_CACHE_COLLECTION, MONGO_DB_NAME
+
+    stack.mongo[MONGO_DB_NAME][MONGO_API_CACHE_COLLECTION].delete_many({})
+    with utils._geocode_lock:
+        utils._GEOCODE_CACHE.clear()
+    with tools._bphs_cache_lock:
+        tools._bphs_cache.clear()
+
+
+def composed_turn(profile: Dict[str, str], question: str) -> str:
+    """The user message exactly as the Streamlit chat composes it."""
+    from src.agent import compose_turn_input
+    return compose_turn_input(profile, question)
@@ -14,6 +14,7 @@ from src.logging_utils import configure_logging, attach_console_handler, get_log
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
 from src.ui.auth_gate import ensure_authenticated
+from src.ui.resources import check_services
 from src.ui.session import init_session_state, render_session_form_and_create_agent, get_or_create_agent_executor
 from src.ui.history import render_session_history
 from src.ui.chat import handle_chat_interaction
@@ -29,6 +30,8 @@ if not LANGCHAIN_API_KEY:
     st.warning("LANGCHAIN_API_KEY not set. LangSmith tracing disabled.", icon="⚠️")
     app_logger.warning("LANGCHAIN_API_KEY not set; LangSmith tracing disabled.")
 
+check_services(app_logger)
+
 ensure_authenticated()
 
 init_session_state()
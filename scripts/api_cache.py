@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import argparse
+
+# Ensure project root is on sys.path so 'src' package is importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.api_cache import AGE_BUCKETS, OLDEST_BUCKET, backfill, cache_stats, ensure_indexes, prune
+from src.config import (
+    MONGO_API_CACHE_COLLECTION, API_CACHE_IDLE_TTL_DAYS, API_CACHE_MAX_ENTRIES, API_CACHE_MAX_MB,
+)
+from src.logging_utils import configure_logging
+from src.services import get_services
+
+
+def print_stats(report: dict) -> None:
+    ages = [label for _, label in AGE_BUCKETS] + [OLDEST_BUCKET]
+    print(f"{'chart':<8} {'entries':>8} {'MB':>8} {'avg_KB':>7} {'hits':>8} {'hit_rate':>8}  "
+          + " ".join(f"{a:>7}" for a in ages))
+    rows = list(report["charts"].items()) + [("total", report["total"])]
+    for name, s in rows:
+        avg_kb = s["bytes"] / s["entries"] / 1024 if s["entries"] else 0.0
+        print(f"{name:<8} {s['entries']:>8} {s['bytes'] / 1048576:>8.2f} {avg_kb:>7.1f} {s['hits']:>8} "
+              f"{s['hit_rate']:>8.1%}  " + " ".join(f"{s['ages'].get(a, 0):>7}" for a in ages))
+    storage = report.get("storage")
+    if storage:
+        print(f"Mongo storage: {(storage.get('storageSize') or 0) / 1048576:.1f} MB data, "
+              f"{(storage.get('totalIndexSize') or 0) / 1048576:.1f} MB indexes")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lifecycle management for the Mongo chart cache (api_cache).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("bootstrap", help="Create indexes and backfill lifecycle fields on older entries")
+    p_prune = sub.add_parser("prune", help="Expire idle entries and evict LRU entries beyond the size bounds")
+    p_prune.add_argument("--idle-days", type=float, default=API_CACHE_IDLE_TTL_DAYS)
+    p_prune.add_argument("--max-entries", type=int, default=API_CACHE_MAX_ENTRIES)
+    p_prune.add_argument("--max-mb", type=float, default=API_CACHE_MAX_MB)
+    p_stats = sub.add_parser("stats", help="Entries, size, hit rate and age distribution per chart type")
+    p_stats.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+
+    configure_logging()
+    collection = get_services().mongo_db()[MONGO_API_CACHE_COLLECTION]
+    if args.command == "bootstrap":
+        ensure_indexes(collection)
+        print(f"Indexes ready; backfilled {backfill(collection)} entries")
+    elif args.command == "prune":
+        result = prune(collection, idle_ttl_days=args.idle_days, max_entries=args.max_entries, max_mb=args.max_mb)
+        print(f"Expired {result['expired']} idle entries, evicted {result['evicted_entries']} "
+              f"({result['evicted_bytes'] / 1048576:.2f} MB)")
+    else:
+        report = cache_stats(collection)
+        if args.json:
+            print(json.dumps(report, indent=2, default=str))
+        else:
+            print_stats(report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
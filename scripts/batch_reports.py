@@ -0,0 +1,55 @@
+import os
+import sys
+import argparse
+
+# Ensure project root is on sys.path so 'src' package is importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.batch import BatchRunner, load_profiles, load_template
+from src.metrics import CACHE_REQUESTS
+
+DEFAULT_TEMPLATE = os.path.join(PROJECT_ROOT, "data", "report_templates", "full_life.json")
+
+
+def _progress(entry, summary):
+    generated = summary.done + summary.deduped + summary.failed
+    pending = summary.total - summary.skipped
+    note = f" ({entry['error']})" if entry["status"] == "failed" else ""
+    print(f"[{generated}/{pending}] {entry['id']}: {entry['status']}{note}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a markdown reading per native from a report template.")
+    parser.add_argument("profiles", help="CSV or JSONL of natives: id, name, dob, tob, city, gender")
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="Report template JSON (topics and questions)")
+    parser.add_argument("--out", default="reports", help="Output directory for reports and manifest.jsonl")
+    parser.add_argument("--workers", type=int, default=4, help="Reports generated in parallel")
+    parser.add_argument("--retries", type=int, default=2, help="Retries per question before a report fails")
+    parser.add_argument("--limit", type=int, help="Only the first N natives")
+    parser.add_argument("--no-warm", action="store_true", help="Skip fetching the template charts up front")
+    args = parser.parse_args(argv)
+
+    template = load_template(args.template)
+    profiles = load_profiles(args.profiles)[: args.limit]
+    runner = BatchRunner(template, args.out, workers=args.workers, retries=args.retries,
+                         warm=not args.no_warm, on_report=_progress)
+    summary = runner.run(profiles)
+
+    print(f"\n{summary.done} generated, {summary.deduped} copied from identical natives, "
+          f"{summary.skipped} already done, {summary.failed} failed "
+          f"in {summary.elapsed_s:.1f}s ({summary.reports_per_minute:.1f} reports/min)")
+    if summary.cost_per_report is not None:
+        print(f"Estimated model cost: ${summary.cost_usd:.4f} total, ${summary.cost_per_report:.4f} per generated report")
+    else:
+        print("Estimated model cost: unknown (no price configured for the selected models)")
+    hits = CACHE_REQUESTS.value(cache="api_cache", tier="mongo", result="hit")
+    misses = CACHE_REQUESTS.value(cache="api_cache", tier="mongo", result="miss")
+    print(f"Chart cache: {hits:.0f} hits, {misses:.0f} API calls")
+    print(f"Reports in {os.path.abspath(args.out)}")
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
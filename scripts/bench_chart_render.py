@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import glob
+import argparse
+import timeit
+
+# Ensure project root is on sys.path so 'src' package is importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.chart_normalizer import normalize_chart
+from src.chart_svg import STYLES, ChartRenderCache, chart_hash, render_chart_svg
+
+FIXTURE_DIR = os.path.join(PROJECT_ROOT, "tests", "fixtures", "charts")
+
+
+def _per_call_us(fn, number: int) -> float:
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time local SVG chart rendering per chart and style.")
+    parser.add_argument("paths", nargs="*", help="Chart payload JSON files named <CHART>.json (default: test fixtures)")
+    parser.add_argument("-n", "--number", type=int, default=500, help="Calls per timing run")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.json")))
+    print(f"{'chart':<6} {'style':<6} {'render_us':>10} {'cached_us':>10} {'svg_bytes':>10}")
+    for path in paths:
+        chart_type = os.path.splitext(os.path.basename(path))[0].upper()
+        with open(path, "r", encoding="utf-8") as f:
+            rows = normalize_chart(chart_type, json.load(f))
+        digest = chart_hash(chart_type, rows)
+        for style in STYLES:
+            cache = ChartRenderCache()
+            svg = cache.svg_for(chart_type, rows, style, digest)
+            render_us = _per_call_us(lambda: render_chart_svg(chart_type, rows, style), args.number)
+            cached_us = _per_call_us(lambda: cache.svg_for(chart_type, rows, style, digest), args.number)
+            print(f"{chart_type:<6} {style:<6} {render_us:>10.1f} {cached_us:>10.2f} {len(svg):>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import glob
+import argparse
+
+# Ensure project root is on sys.path so 'src' package is importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.chart_normalizer import compact_chart
+
+FIXTURE_DIR = os.path.join(PROJECT_ROOT, "tests", "fixtures", "charts")
+
+
+def _token_counter():
+    """tiktoken's cl100k_base when its encoding is available locally, else a ~4 chars/token estimate."""
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        return "cl100k_base", lambda text: len(enc.encode(text))
+    except Exception:
+        return "approx(len/4)", lambda text: len(text) // 4 + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LLM token cost of raw vs compact chart tool outputs.")
+    parser.add_argument("paths", nargs="*", help="Chart payload JSON files named <CHART>.json (default: test fixtures)")
+    args = parser.parse_args()
+
+    paths = args.paths or sorted(glob.glob(os.path.join(FIXTURE_DIR, "*.json")))
+    encoding, count = _token_counter()
+    print(f"Tokenizer: {encoding}")
+    print(f"{'chart':<6} {'raw':>8} {'compact':>8} {'saved':>7}")
+    total_raw = total_compact = 0
+    for path in paths:
+        chart_type = os.path.splitext(os.path.basename(path))[0].upper()
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        # Raw is what the tool returned before: {"chart_type", "chart_data"} serialized as JSON
+        raw = json.dumps({"chart_type": chart_type, "chart_data": payload})
+        table = compact_chart(chart_type, payload) or raw
+        raw_tokens, compact_tokens = count(raw), count(table)
+        total_raw += raw_tokens
+        total_compact += compact_tokens
+        print(f"{chart_type:<6} {raw_tokens:>8} {compact_tokens:>8} {1 - compact_tokens / raw_tokens:>7.0%}")
+    if total_raw:
+        print(f"{'total':<6} {total_raw:>8} {total_compact:>8} {1 - total_compact / total_raw:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
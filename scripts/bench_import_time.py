@@ -0,0 +1,100 @@
+import os
+import sys
+import ast
+import json
+import argparse
+import subprocess
+
+# Ensure project root is on sys.path so 'src' package is importable
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+# Entry points whose module-level imports make up a cold start
+ENTRY_POINTS = {
+    "main": os.path.join(PROJECT_ROOT, "main.py"),
+    "ingest": os.path.join(PROJECT_ROOT, "scripts", "ingest.py"),
+}
+# Provider SDKs that should only load on first use of their provider
+PROVIDER_MODULES = ("langchain_openai", "langchain_google_genai", "langchain_aws", "boto3")
+
+
+def import_statements(path: str) -> str:
+    """The file's top-level import statements, so importing them does not run the app itself."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    nodes = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+    return "\n".join(ast.unparse(n) for n in nodes)
+
+
+def parse_importtime(stderr: str):
+    """{module: (self_us, cumulative_us)} and the total from `-X importtime` output."""
+    modules = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, raw_name = line[len("import time:"):].split("|", 2)
+        name = raw_name.strip()
+        modules[name] = (int(self_us), int(cumulative_us))
+        if len(raw_name) - len(raw_name.lstrip()) <= 1:  # top level: one space after the bar
+            total += int(cumulative_us)
+    return modules, total
+
+
+def measure(code: str, repeat: int):
+    """Fastest of `repeat` fresh interpreters running `code` under -X importtime."""
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=PROJECT_ROOT, capture_output=True, text=True,
+            env={**os.environ, "PYTHONPATH": PROJECT_ROOT, "PYTHONDONTWRITEBYTECODE": "1"},
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+        modules, total = parse_importtime(proc.stderr)
+        if best is None or total < best[1]:
+            best = (modules, total)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import time of main.py and scripts/ingest.py.")
+    parser.add_argument("targets", nargs="*", help=f"Entry points ({', '.join(ENTRY_POINTS)}) or module names")
+    parser.add_argument("-n", "--repeat", type=int, default=3, help="Fresh interpreters per target; the fastest counts")
+    parser.add_argument("--top", type=int, default=8, help="Slowest top-level imports to list")
+    parser.add_argument("--max-ms", type=float, help="Exit 1 if any target takes longer than this")
+    parser.add_argument("--json", metavar="PATH", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    targets = args.targets or list(ENTRY_POINTS)
+    results = {}
+    for target in targets:
+        code = import_statements(ENTRY_POINTS[target]) if target in ENTRY_POINTS else f"import {target}"
+        modules, total_us = measure(code, args.repeat)
+        providers = [m for m in PROVIDER_MODULES if m in modules]
+        top = sorted(
+            ((name, cum) for name, (_, cum) in modules.items() if "." not in name),
+            key=lambda item: item[1], reverse=True,
+        )[:args.top]
+        results[target] = {"total_ms": round(total_us / 1000, 1), "modules": len(modules),
+                           "provider_sdks": providers, "top": [[n, round(c / 1000, 1)] for n, c in top]}
+        print(f"{target:<10} {total_us / 1000:>8.1f} ms  {len(modules):>5} modules  "
+              f"provider SDKs: {', '.join(providers) or 'none'}")
+        for name, cum in top:
+            print(f"    {name:<36} {cum / 1000:>8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Wrote {args.json}")
+    if args.max_ms is not None:
+        slow = [t for t, r in results.items() if r["total_ms"] > args.max_ms]
+        if slow:
+            print(f"Over {args.max_ms:.0f} ms: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+import argparse
 from typing import Optional
 from dotenv import load_dotenv
 from langchain_community.document_loaders import PyPDFLoader
@@ -15,19 +16,86 @@ if PROJECT_ROOT not in sys.path:
 from src.embedding_factory import get_embedding_model, get_embedding_dimension
 from pinecone import Pinecone, ServerlessSpec
 from src.logging_utils import configure_logging, get_logger, log_call, log_operation
+from src.answer_cache import get_answer_cache, index_version
+from src.embedding_snapshot import SnapshotWriter, load_snapshot, snapshot_name, upsert_snapshot, upsert_vectors
 
 # (path already configured above)
 
-from src.config import PINECONE_API_KEY, PINECONE_INDEX_NAME 
+from src.config import PINECONE_API_KEY, PINECONE_INDEX_NAME, EMBEDDING_SNAPSHOT_DIR, EMBEDDING_PROVIDER
 
 # Load environment variables from .env file
 load_dotenv()
 configure_logging()
 _logger = get_logger(__name__)
 
+NAMESPACE = "bphs"
+
+
+def _invalidate_cached_answers():
+    """Answers grounded in the previous index content are no longer trustworthy."""
+    try:
+        cache = get_answer_cache()
+        if cache is not None:
+            cache.invalidate(index_version=index_version())
+    except Exception as e:
+        _logger.warning(f"Could not invalidate cached answers: {e}")
+
+
+def _embedding_provider() -> str:
+    return EMBEDDING_PROVIDER.lower()
+
+
+def _ensure_index(pc: Pinecone, dimension: int) -> bool:
+    """Create the Pinecone index if missing; return False on a dimension mismatch."""
+    region = os.getenv("PINECONE_REGION", "us-east-1")
+    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+        _logger.info(f"Creating Index '{PINECONE_INDEX_NAME}' with dimension {dimension}...")
+        with log_operation(_logger, "pinecone_create_index"):
+            pc.create_index(
+                name=PINECONE_INDEX_NAME,
+                dimension=dimension, 
+                metric='cosine',
+                spec=ServerlessSpec(cloud='aws', region=region)
+            )
+    else:
+        # Verify dimension matches
+        index_info = pc.describe_index(PINECONE_INDEX_NAME)
+        if index_info.dimension != dimension:
+            _logger.critical(
+                f"Index dimension mismatch: got {index_info.dimension}, expected {dimension}."
+            )
+            _logger.error("Please delete the index in Pinecone console and run this script again.")
+            return False
+        # Best-effort region check for awareness (non-fatal)
+        try:
+            idx_region = getattr(index_info, "spec", {}).get("region", None)
+            if idx_region and idx_region != region:
+                _logger.warning(f"Index region {idx_region} differs from configured {region}")
+        except Exception:
+            pass
+    return True
+
+
+@log_call
+def ingest_from_snapshot(snapshot_path: str, batch_size: int = 100) -> Optional[None]:
+    """Rebuild the Pinecone index from a local embedding snapshot (no embedding API calls)."""
+    snapshot = load_snapshot(snapshot_path, expected_provider=_embedding_provider())
+    with log_operation(_logger, "pinecone_client_init"):
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+    if not _ensure_index(pc, snapshot.manifest["dimension"]):
+        return
+    index = pc.Index(PINECONE_INDEX_NAME)
+    with log_operation(_logger, "pinecone_upsert_snapshot"):
+        written = upsert_snapshot(snapshot, index, namespace=NAMESPACE, batch_size=batch_size)
+    _logger.info(f"Snapshot ingestion complete: {written} vectors upserted from {snapshot_path}")
+    _invalidate_cached_answers()
+
 
 @log_call
-def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pdf") -> Optional[None]:
+def ingest_data(
+    pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pdf",
+    snapshot_dir: Optional[str] = EMBEDDING_SNAPSHOT_DIR,
+) -> Optional[None]:
     # 1. Load and Split
     if not os.path.exists(pdf_path):
         _logger.error(f"PDF not found at {pdf_path}")
@@ -69,39 +137,15 @@ def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pd
     dimension = get_embedding_dimension()
     _logger.info(f"Embedding dimension selected: {dimension}")
     
-    region = os.getenv("PINECONE_REGION", "us-east-1")
-    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
-        _logger.info(f"Creating Index '{PINECONE_INDEX_NAME}' with dimension {dimension}...")
-        with log_operation(_logger, "pinecone_create_index"):
-            pc.create_index(
-                name=PINECONE_INDEX_NAME,
-                dimension=dimension, 
-                metric='cosine',
-                spec=ServerlessSpec(cloud='aws', region=region)
-            )
-    else:
-        # Verify dimension matches
-        index_info = pc.describe_index(PINECONE_INDEX_NAME)
-        if index_info.dimension != dimension:
-            _logger.critical(
-                f"Index dimension mismatch: got {index_info.dimension}, expected {dimension}."
-            )
-            _logger.error("Please delete the index in Pinecone console and run this script again.")
-            return
-        # Best-effort region check for awareness (non-fatal)
-        try:
-            idx_region = getattr(index_info, "spec", {}).get("region", None)
-            if idx_region and idx_region != region:
-                _logger.warning(f"Index region {idx_region} differs from configured {region}")
-        except Exception:
-            pass
+    if not _ensure_index(pc, dimension):
+        return
 
     # 3. Batch Ingestion with robust retry
     with log_operation(_logger, "init_embeddings"):
         embeddings = get_embedding_model()
 
     # Initialize VectorStore once (avoid per-batch overhead)
-    namespace = "bphs"
+    namespace = NAMESPACE
     docsearch = PineconeVectorStore(
         index_name=PINECONE_INDEX_NAME,
         embedding=embeddings,
@@ -112,6 +156,13 @@ def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pd
     total_docs = len(docs)
     _logger.info(f"Starting ingestion with batch size {batch_size}...")
 
+    # Persist vectors alongside the upsert so the index can be rebuilt without re-embedding
+    writer = None
+    if snapshot_dir:
+        provider = _embedding_provider()
+        snapshot_path = os.path.join(snapshot_dir, snapshot_name(namespace, provider))
+        writer = SnapshotWriter(snapshot_path, total_docs, dimension, provider, namespace)
+
     for i in range(0, total_docs, batch_size):
         batch = docs[i : i + batch_size]
         _logger.info(f"Processing batch {i} to {i+len(batch)} / {total_docs}...")
@@ -123,6 +174,8 @@ def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pd
             page = d.metadata.get("page", "na")
             local_idx = d.metadata.get("chunk_index", j)
             ids.append(f"{namespace}:{src}:p{page}:c{local_idx}")
+        texts = [d.page_content for d in batch]
+        metadatas = [dict(d.metadata) for d in batch]
 
         # Retry this batch until success or max retries
         retries = 0
@@ -130,8 +183,12 @@ def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pd
         backoff = 1.0
         while retries < max_retries:
             try:
+                with log_operation(_logger, f"embed_batch_{i}"):
+                    vectors = embeddings.embed_documents(texts)
                 with log_operation(_logger, f"pinecone_upsert_batch_{i}"):
-                    docsearch.add_documents(batch, ids=ids)
+                    upsert_vectors(docsearch, ids, texts, metadatas, vectors, namespace=namespace)
+                if writer is not None:
+                    writer.append(ids, texts, metadatas, vectors)
                 _logger.info(f"Batch {i}/{total_docs}: Upserted {len(batch)} docs")
                 time.sleep(1.0)  # gentle pacing
                 break
@@ -149,8 +206,21 @@ def ingest_data(pdf_path: str = "data/brihat-parashara-hora-shastra-english-v.pd
                 time.sleep(backoff)
                 backoff *= 2  # exponential backoff
 
+    if writer is not None:
+        writer.close()
+    _invalidate_cached_answers()
     _logger.info("Ingestion Complete!")
 
 if __name__ == "__main__":
-    _logger.info("Running ingest_data from __main__")
-    ingest_data()
+    parser = argparse.ArgumentParser(description="Ingest BPHS into Pinecone.")
+    parser.add_argument("--pdf", default="data/brihat-parashara-hora-shastra-english-v.pdf", help="Source PDF path")
+    parser.add_argument("--snapshot-dir", default=EMBEDDING_SNAPSHOT_DIR, help="Where to write the embedding snapshot")
+    parser.add_argument("--no-snapshot", action="store_true", help="Do not write an embedding snapshot")
+    parser.add_argument("--from-snapshot", help="Rebuild the index from an existing snapshot directory")
+    args = parser.parse_args()
+    if args.from_snapshot:
+        _logger.info(f"Running ingest_from_snapshot({args.from_snapshot}) from __main__")
+        ingest_from_snapshot(args.from_snapshot)
+    else:
+        _logger.info("Running ingest_data from __main__")
+        ingest_data(args.pdf, snapshot_dir=None if args.no_snapshot else args.snapshot_dir)
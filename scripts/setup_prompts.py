@@ -11,6 +11,8 @@ if PROJECT_ROOT not in sys.path:
 
 from src.logging_utils import configure_logging, get_logger
 from src.config import JYOTISH_AI_PROMPT_REPO 
+from src.prompt_utils import extract_prompt_text, prompt_version, save_prompt_snapshot
+from src.answer_cache import get_answer_cache
 
 load_dotenv()
 configure_logging()
@@ -63,6 +65,7 @@ Follow these steps in order.
     - **Disease, Misfortune, Punishment:** Use `chart_d30_misfortunes_trimsamsa`.
     - **Past Karma, Deep Tendencies:** Use `chart_d60_pastkarma_shashtiamsa`.
     - *For any other specific chart request (e.g., D5, D6, D8, D11, D27, D40, D45), use `chart_varga_specific`.*
+    - **Timing ("when will…", current or upcoming periods):** Also call `dasha_vimshottari` and read the relevant house lords against the running Mahadasha/Antardasha. Never guess dasha dates.
 
 2.  **Fetch Data:** Call the selected chart tool.
     - **CRITICAL FAIL-SAFE:** Check the tool output immediately.
@@ -110,6 +113,17 @@ Astrology API Responses:
         print("Prompt pushed successfully.")
     except Exception as e:
         print("Failed to push prompt:", e)
+    # Local snapshot lets the app start (and create sessions) without reaching LangSmith
+    snapshot_path = save_prompt_snapshot(prompt_repo_path, extract_prompt_text(prompt))
+    print(f"Prompt snapshot written to {snapshot_path}")
+    # Cached answers produced under any other prompt version are stale now
+    try:
+        cache = get_answer_cache()
+        if cache is not None:
+            purged = cache.purge_stale({"prompt_version": prompt_version(extract_prompt_text(prompt))})
+            print(f"Purged {purged} cached answers from older prompt versions.")
+    except Exception as e:
+        print("Failed to purge cached answers:", e)
 
 
 if __name__ == "__main__":
@@ -1,92 +1,267 @@
-from langsmith import Client
-
+import threading
 from dataclasses import dataclass
+from functools import lru_cache
+from typing import Annotated
+from typing_extensions import NotRequired
 from langchain.agents import create_agent
-from langchain.tools import tool, ToolRuntime
-from langchain_mongodb import MongoDBChatMessageHistory
+from langchain.agents.middleware import AgentMiddleware, AgentState, dynamic_prompt, ModelRequest
+from langchain.agents.middleware.types import OmitFromOutput
+from langchain_core.messages import AnyMessage, HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langchain_core.runnables.history import RunnableWithMessageHistory
-from src.prompt_utils import get_prompt_content
+from src.chat_memory import WindowedChatHistory
+from src.config import JYOTISH_AI_PROMPT_REPO
+from src.prompt_utils import get_prompt_store, prompt_version
+from src.streaming import block_text
+from src.tool_execution import ToolExecutionMiddleware, abort_turn, end_turn, start_turn
+from src.tracing import span, start_trace
+from src.tool_router import ToolRouterMiddleware
+from src.model_router import ModelTierMiddleware
 
 from src.tools import (
     get_d10_chart, get_d9_chart, get_d1_chart, get_d2_chart, get_d7_chart, get_d24_chart,
     get_d3_chart, get_d4_chart, get_d12_chart, get_d16_chart, get_d20_chart, get_d30_chart, get_d60_chart,
-    search_bphs
+    get_vimshottari_dasha, search_bphs
 )
-from src.config import MONGO_URI, MONGO_DB_NAME, MONGO_CHAT_HISTORY_COLLECTION
 from src.logging_utils import get_logger, log_call
+from src.services import get_services
 
-# Define context for astrology session (can be extended as needed)
+# Per-session state injected at invoke time; the compiled graph itself is shared.
 @dataclass
 class AstrologyContext:
     session_id: str
+    gender: str = "Other"
 
 
 logger = get_logger(__name__)
 
-@log_call
-def create_agent_executor(session_id: str, gender: str):
-    """Create an agent with tools and chat history bound to session_id."""
-    import os
-    prompt_repo_path = os.environ.get("JYOTISH_AI_PROMPT_REPO", "jyotish-ai")
+AGENT_TOOLS = [
+    get_d10_chart,
+    get_d9_chart,
+    get_d1_chart,
+    get_d2_chart,
+    get_d7_chart,
+    get_d24_chart,
+    # Newly added explicit varga tools
+    get_d3_chart,
+    get_d4_chart,
+    get_d12_chart,
+    get_d16_chart,
+    get_d20_chart,
+    get_d30_chart,
+    get_d60_chart,
+    # Local dasha timeline from the cached D1 chart
+    get_vimshottari_dasha,
+    # Pinecone BPHS search tool for RAG context
+    search_bphs,
+]
+
+DEFAULT_SYSTEM_PROMPT = (
+    "You are an expert Vedic Astrologer named 'Jyotish AI'. Your knowledge comes only from tools and BPHS.\n"
+    "Strictly use Vedic (Sidereal) principles; refuse non-astrology, politics, stocks, gambling."
+)
+
+# Where the template's {gender} placeholder points; the per-session value is appended after
+# the static prompt so the system prompt prefix is byte-identical across sessions. The tool
+# list ahead of it stays identical only because, with prompt caching on, ToolRouterMiddleware
+# narrows through tool_choice (or not at all) instead of unbinding schemas.
+_GENDER_REFERENCE = "given under 'Session context' at the end of these instructions"
+_SESSION_CONTEXT = (
+    "\n\nSession context:\n- User gender: {gender}. "
+    "Consider this when interpreting specific Dashas or planetary placements."
+)
+
+
+_fallback_warned = False
+
+
+def _load_system_template() -> str:
+    """Current system prompt template from the prompt store, or the built-in default."""
+    global _fallback_warned
     try:
-        logger.info("Fetching system prompt via prompt_utils.get_prompt_content")
-        system_prompt = get_prompt_content(prompt_repo_path)
-        # Try to inject gender into template if placeholder exists
+        return get_prompt_store().get(JYOTISH_AI_PROMPT_REPO)
+    except Exception as e:
+        # Runs on every model call: warn once, not per call, while the store has nothing
+        if not _fallback_warned:
+            _fallback_warned = True
+            logger.warning(f"System prompt not available from cache/snapshot: {e}. Falling back to default.")
+        return DEFAULT_SYSTEM_PROMPT
+
+
+def system_prompt_version() -> str:
+    """Content hash of the system prompt template currently served to the agent."""
+    return prompt_version(_load_system_template())
+
+
+@lru_cache(maxsize=8)
+def static_system_prompt(template: str) -> str:
+    """The cacheable part of the system prompt: the template with no per-session values in it."""
+    return template.replace("{gender}", _GENDER_REFERENCE)
+
+
+@lru_cache(maxsize=64)
+def render_system_prompt(template: str, gender: str) -> str:
+    """Static prompt first, then the session context, so prompt caches can reuse the prefix."""
+    return static_system_prompt(template) + _SESSION_CONTEXT.format(gender=gender)
+
+
+@dynamic_prompt
+def astrology_system_prompt(request: ModelRequest) -> str:
+    """Build the system prompt per model call from the session's AstrologyContext."""
+    context = getattr(request.runtime, "context", None) if request.runtime else None
+    gender = getattr(context, "gender", None) or "Other"
+    return render_system_prompt(_load_system_template(), gender)
+
+
+class HistoryState(AgentState):
+    # Windowed history supplied by RunnableWithMessageHistory; read by the model only, never returned
+    chat_history: NotRequired[Annotated[list[AnyMessage], OmitFromOutput]]
+
+
+class ChatHistoryMiddleware(AgentMiddleware):
+    """Prepend the session's windowed chat history to each model call.
+
+    A leading summary SystemMessage is appended to the system prompt instead of being
+    sent mid-conversation, which several providers reject.
+    """
+
+    state_schema = HistoryState
+
+    def _with_history(self, request: ModelRequest) -> ModelRequest:
+        history = list((request.state or {}).get("chat_history") or [])
+        notes = [block_text(m.content) for m in history if isinstance(m, SystemMessage)]
+        history = [m for m in history if not isinstance(m, SystemMessage)]
+        overrides = {}
+        if history:
+            overrides["messages"] = [*history, *request.messages]
+        if notes:
+            base = request.system_prompt or ""
+            overrides["system_message"] = SystemMessage(content="\n\n".join([base, *notes]).strip())
+        return request.override(**overrides) if overrides else request
+
+    def wrap_model_call(self, request, handler):
+        return handler(self._with_history(request))
+
+    async def awrap_model_call(self, request, handler):
+        return await handler(self._with_history(request))
+
+
+class TracingMiddleware(AgentMiddleware):
+    """Open a span around every model and tool call of a traced turn (no-op otherwise)."""
+
+    @staticmethod
+    def _tool_span(request):
+        return span(f"tool:{request.tool_call.get('name', 'tool')}")
+
+    def wrap_model_call(self, request, handler):
+        with span("model"):
+            return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        with span("model"):
+            return await handler(request)
+
+    def wrap_tool_call(self, request, handler):
+        with self._tool_span(request):
+            return handler(request)
+
+    async def awrap_tool_call(self, request, handler):
+        with self._tool_span(request):
+            return await handler(request)
+
+
+def _new_turn_messages(output: dict) -> dict:
+    """Keep only messages produced this turn; the input HumanMessage is already recorded as input."""
+    return {"messages": [m for m in output.get("messages", []) if not isinstance(m, HumanMessage)]}
+
+
+def _session_runnable(context: AstrologyContext) -> RunnableLambda:
+    """Run the shared graph for one session, always with invoke semantics.
+
+    Streaming the graph directly would hand RunnableWithMessageHistory per-node update
+    chunks instead of the final state; model tokens still reach `astream_events` through
+    callbacks, so nothing is lost by invoking here.
+    """
+    def run_turn(inputs, config):
+        turn = start_turn(context.session_id)
         try:
-            system_prompt = system_prompt.format(gender=gender)
-        except Exception:
-            # If formatting fails (no placeholder), append a clear context line
-            system_prompt = (
-                system_prompt
-                + f"\nContext: The user is {gender}. Consider this when interpreting specific Dashas or planetary placements."
+            with start_trace("turn", context.session_id):
+                return _new_turn_messages(get_shared_agent().invoke(inputs, config, context=context))
+        except BaseException:
+            abort_turn(context.session_id)  # stop sibling tool calls still queued or running
+            raise
+        finally:
+            end_turn(context.session_id, turn)
+
+    async def arun_turn(inputs, config):
+        turn = start_turn(context.session_id)
+        try:
+            with start_trace("turn", context.session_id):
+                return _new_turn_messages(await get_shared_agent().ainvoke(inputs, config, context=context))
+        except BaseException:
+            abort_turn(context.session_id)
+            raise
+        finally:
+            end_turn(context.session_id, turn)
+
+    return RunnableLambda(run_turn, afunc=arun_turn, name="AgentTurn")
+
+
+_shared_agent = None
+_shared_agent_lock = threading.Lock()
+
+
+@log_call
+def get_shared_agent():
+    """Process-wide compiled agent graph and chat model, built once and reused by every session."""
+    global _shared_agent
+    with _shared_agent_lock:
+        if _shared_agent is None:
+            logger.info("Creating chat model via service container")
+            model = get_services().chat_model()
+            tool_router = ToolRouterMiddleware(AGENT_TOOLS)
+            _shared_agent = create_agent(
+                model,
+                tools=AGENT_TOOLS,
+                context_schema=AstrologyContext,
+                middleware=[
+                    TracingMiddleware(),
+                    astrology_system_prompt,
+                    ChatHistoryMiddleware(),
+                    tool_router,
+                    ModelTierMiddleware(tool_router.router),
+                    ToolExecutionMiddleware(),
+                ],
             )
-    except Exception as e:
-        logger.warning(f"Failed to fetch prompt from LangSmith: {e}. Falling back to default.")
-        system_prompt = (
-            "You are an expert Vedic Astrologer named 'Jyotish AI'. Your knowledge comes only from tools and BPHS.\n"
-            "Strictly use Vedic (Sidereal) principles; refuse non-astrology, politics, stocks, gambling."
-        )
-        system_prompt += (
-            f"\nContext: The user is {gender}. Consider this when interpreting specific Dashas or planetary placements."
-        )
-
-    from src.llm_factory import get_chat_model
-    logger.info("Creating chat model via factory")
-    model = get_chat_model()
-    agent = create_agent(
-        model,
-        tools=[
-            get_d10_chart,
-            get_d9_chart,
-            get_d1_chart,
-            get_d2_chart,
-            get_d7_chart,
-            get_d24_chart,
-            # Newly added explicit varga tools
-            get_d3_chart,
-            get_d4_chart,
-            get_d12_chart,
-            get_d16_chart,
-            get_d20_chart,
-            get_d30_chart,
-            get_d60_chart,
-            # Pinecone BPHS search tool for RAG context
-            search_bphs,
-        ],
-        context_schema=AstrologyContext,
-        system_prompt=system_prompt,
+            logger.info("Shared agent graph compiled with tools")
+        return _shared_agent
+
+
+def compose_turn_input(profile: dict, question: str) -> str:
+    """The human message for a turn: birth profile block followed by the user's question."""
+    return (
+        "User Profile:\n"
+        f"DOB: {profile['dob']}\nTime: {profile['tob']}\nCity: {profile['city']}\n\n"
+        "User Input:\n"
+        f"{question}\n\n"
     )
-    logger.info("Agent created with tools")
+
+
+def get_session_history(session_id: str) -> WindowedChatHistory:
+    return WindowedChatHistory(session_id)
+
+
+@log_call
+def create_agent_executor(session_id: str, gender: str):
+    """Bind the shared agent graph to a session: context (session_id, gender) plus chat history."""
+    context = AstrologyContext(session_id=session_id, gender=gender or "Other")
+    get_shared_agent()  # build (or reuse) the process-wide graph up front so failures surface at session start
+    agent = _session_runnable(context)
 
     # Optionally wrap with chat history if needed
     agent_with_history = RunnableWithMessageHistory(
         agent,
-        lambda sid: MongoDBChatMessageHistory(
-            session_id=session_id,
-            connection_string=MONGO_URI,
-            database_name=MONGO_DB_NAME,
-            collection_name=MONGO_CHAT_HISTORY_COLLECTION,
-        ),
+        get_session_history,
         input_messages_key="messages",
         history_messages_key="chat_history",
     ).with_config(
@@ -96,6 +271,6 @@ def create_agent_executor(session_id: str, gender: str):
             "metadata": {"session_id": session_id},
         }
     )
-    logger.info("Agent wrapped with MongoDB chat history")
+    logger.info("Session bound to shared agent with MongoDB chat history")
 
     return agent_with_history
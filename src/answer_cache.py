@@ -0,0 +1,161 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, MongoClient
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.config import (
+    MONGO_DB_NAME, MONGO_ANSWER_CACHE_COLLECTION, PINECONE_INDEX_NAME, EMBEDDING_PROVIDER, BPHS_INDEX_VERSION,
+    ANSWER_CACHE_ENABLED, ANSWER_CACHE_TTL_SECONDS, ANSWER_CACHE_SCOPE,
+)
+from src.logging_utils import get_logger
+from src.metrics import record_cache
+
+logger = get_logger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a user question."""
+    text = unicodedata.normalize("NFKC", str(question or "")).lower()
+    text = " ".join(text.split())
+    return re.sub(r"[\s?.!]+$", "", text)
+
+
+def normalize_profile(profile: dict) -> Dict[str, str]:
+    """Birth details that determine the charts, plus gender (it is part of the system prompt)."""
+    h, m = (str(profile.get("tob", "")).strip().split(":") + ["0", "0"])[:2]
+    try:
+        tob = f"{int(h):02d}:{int(m):02d}"
+    except ValueError:
+        tob = str(profile.get("tob", "")).strip()
+    return {
+        "dob": str(profile.get("dob", "")).strip(),
+        "tob": tob,
+        "city": " ".join(str(profile.get("city", "")).lower().replace(",", " ").split()),
+        "gender": str(profile.get("gender") or "other").strip().lower(),
+    }
+
+
+def index_version() -> str:
+    return f"{PINECONE_INDEX_NAME}:{EMBEDDING_PROVIDER}:{BPHS_INDEX_VERSION}"
+
+
+def current_versions() -> Dict[str, str]:
+    """Prompt, model and index versions that an answer produced right now depends on."""
+    from src.agent import system_prompt_version
+    from src.llm_factory import chat_model_id
+    return {
+        "prompt_version": system_prompt_version(),
+        "model": chat_model_id(),
+        "index_version": index_version(),
+    }
+
+
+def answer_key(profile: dict, question: str, versions: Dict[str, str]) -> str:
+    payload = {
+        "profile": normalize_profile(profile),
+        "question": normalize_question(question),
+        **{k: versions[k] for k in ("prompt_version", "model", "index_version")},
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class AnswerCache:
+    """Mongo-backed cache of complete assistant answers.
+
+    Entries expire via a TTL index on `expires_at` (and are re-checked on read, since
+    Mongo's TTL monitor only runs once a minute). Version fields are stored alongside the
+    answer so stale generations can be purged when prompts or the BPHS index change.
+    """
+
+    def __init__(self, client: MongoClient, ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS):
+        self.collection = client[MONGO_DB_NAME][MONGO_ANSWER_CACHE_COLLECTION]
+        self.ttl_seconds = ttl_seconds
+        try:
+            self.collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+        except Exception as e:
+            logger.warning(f"Failed to ensure answer cache TTL index: {e}")
+
+    def get(self, key: str) -> Optional[dict]:
+        doc = self.collection.find_one({"_id": key}, {"answer": 1, "notes": 1, "expires_at": 1})
+        if not doc:
+            record_cache("answer_cache", "mongo", False)
+            return None
+        expires_at = doc.get("expires_at")
+        if expires_at is not None:
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            if expires_at <= datetime.now(timezone.utc):
+                record_cache("answer_cache", "mongo", False)
+                return None
+        record_cache("answer_cache", "mongo", True)
+        self.collection.update_one({"_id": key}, {"$inc": {"hits": 1}})
+        return {"answer": doc.get("answer", ""), "notes": doc.get("notes") or []}
+
+    def put(self, key: str, answer: str, versions: Dict[str, str], notes: Optional[List[str]] = None) -> None:
+        now = datetime.now(timezone.utc)
+        self.collection.replace_one(
+            {"_id": key},
+            {
+                "_id": key,
+                "answer": answer,
+                "notes": list(notes or []),
+                **versions,
+                "hits": 0,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            },
+            upsert=True,
+        )
+
+    def invalidate(self, **fields) -> int:
+        """Delete entries matching the given version fields (all entries when none are given)."""
+        deleted = self.collection.delete_many(dict(fields)).deleted_count
+        logger.info(f"Invalidated {deleted} cached answers ({fields or 'all'})")
+        return deleted
+
+    def purge_stale(self, versions: Dict[str, str]) -> int:
+        """Delete entries produced under any prompt/model/index version other than `versions`."""
+        stale = [{k: {"$ne": v}} for k, v in versions.items()]
+        deleted = self.collection.delete_many({"$or": stale}).deleted_count if stale else 0
+        logger.info(f"Purged {deleted} stale cached answers")
+        return deleted
+
+
+_cache: Optional[AnswerCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when disabled."""
+    global _cache
+    if not ANSWER_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            from src.services import get_services
+            _cache = AnswerCache(get_services().mongo)
+        return _cache
+
+
+def turn_cache_key(profile: dict, question: str, first_turn: bool) -> Optional[Tuple[str, Dict[str, str]]]:
+    """(key, versions) for this turn, or None when the turn is outside ANSWER_CACHE_SCOPE.
+
+    `first_turn` is whether the session's stored history is empty. Any earlier turns (or
+    their summary) are replayed to the model, so an answer given with history must neither
+    be served from nor written to an entry shared by everyone with the same birth data.
+    """
+    if ANSWER_CACHE_SCOPE == "first_turn" and not first_turn:
+        return None
+    versions = current_versions()
+    return answer_key(profile, question, versions), versions
+
+
+def record_cached_turn(history, composed_input: str, answer: str) -> None:
+    """Append a cache-served turn to the session history so follow-ups see it."""
+    history.add_messages([HumanMessage(content=composed_input), AIMessage(content=answer)])
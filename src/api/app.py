@@ -0,0 +1,390 @@
+"""Headless ASGI service: sessions, chart fetch and streamed chat turns.
+
+Run with `uvicorn src.api.app:app --host 0.0.0.0 --port 8000 --workers 4`. Sessions, chat
+history and the per-session turn lease live in Mongo, so any worker behind a load balancer
+can serve any session. Within a worker every request is async: the agent streams through
+`astream_agent_turn`, and the blocking Mongo / chart calls run in the default thread pool
+against the shared clients of the service container.
+"""
+import asyncio
+import hmac
+import json
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Dict, Optional
+
+from langchain_core.messages import HumanMessage
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from src.agent import compose_turn_input, create_agent_executor, get_session_history
+from src.answer_cache import get_answer_cache, record_cached_turn, turn_cache_key
+from src.auth import get_active_password, hash_password
+from src.chart_svg import STYLES, chart_from_tool_output, chart_hash, get_render_cache
+from src.config import (
+    API_AUTH_ENABLED, API_MAX_CONCURRENT_TURNS, API_TURN_LEASE_SECONDS, MONGO_API_SESSIONS_COLLECTION,
+)
+from src.logging_utils import get_logger
+from src.metrics import REGISTRY
+from src.prefetch import start_prefetch
+from src.services import get_services
+from src.streaming import ThinkingFilter, astream_agent_turn, block_text
+from src.tools import CHART_CONFIG, _tool_impl
+from src.tracing import format_breakdown, pop_trace
+
+logger = get_logger(__name__)
+
+GENDERS = ("Male", "Female", "Other")
+_AUTH_CACHE_SECONDS = 60
+# API session ids are generated here and namespaced, so they can never address the chat
+# history of a Streamlit session (keyed by the user's email)
+SESSION_PREFIX = "api:"
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+# -------------------- Sessions --------------------
+
+def validate_profile(data: dict) -> Dict[str, str]:
+    """Birth profile from a request body, in the same shape the Streamlit form produces."""
+    if not isinstance(data, dict):
+        raise ApiError(400, "Body must be a JSON object")
+    try:
+        dob = datetime.strptime(str(data.get("dob", "")), "%Y-%m-%d").strftime("%Y-%m-%d")
+        tob = datetime.strptime(str(data.get("tob", "")), "%H:%M").strftime("%H:%M")
+    except ValueError:
+        raise ApiError(400, "dob must be YYYY-MM-DD and tob HH:MM")
+    city = " ".join(str(data.get("city") or "").split())
+    if not city or len(city) > 200:
+        raise ApiError(400, "city is required")
+    gender = str(data.get("gender") or "Other").capitalize()
+    if gender not in GENDERS:
+        raise ApiError(400, f"gender must be one of {GENDERS}")
+    return {"dob": dob, "tob": tob, "city": city, "gender": gender}
+
+
+class SessionStore:
+    """API sessions (id -> birth profile) in Mongo, shared by every worker."""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def create(self, profile: Dict[str, str]) -> dict:
+        now = datetime.now(timezone.utc)
+        doc = {"_id": SESSION_PREFIX + uuid.uuid4().hex, "profile": profile, "created_at": now, "updated_at": now}
+        self.collection.insert_one(doc)
+        return doc
+
+    def get(self, session_id: str) -> Optional[dict]:
+        return self.collection.find_one({"_id": session_id}, {"turn_lease": 0})
+
+    def touch(self, session_id: str) -> None:
+        self.collection.update_one({"_id": session_id}, {"$set": {"updated_at": datetime.now(timezone.utc)}})
+
+    def acquire_turn(self, session_id: str, ttl_seconds: float = API_TURN_LEASE_SECONDS) -> Optional[str]:
+        """Lease the session for one turn across all workers; returns the lease token, or None if held."""
+        now = datetime.now(timezone.utc)
+        token = uuid.uuid4().hex
+        doc = self.collection.find_one_and_update(
+            {"_id": session_id, "$or": [
+                {"turn_lease": {"$exists": False}},
+                {"turn_lease.expires_at": {"$lt": now}},
+            ]},
+            {"$set": {"turn_lease": {"token": token, "expires_at": now + timedelta(seconds=ttl_seconds)}}},
+            projection={"_id": 1},
+        )
+        return token if doc is not None else None
+
+    def renew_turn(self, session_id: str, token: str, ttl_seconds: float = API_TURN_LEASE_SECONDS) -> bool:
+        """Push the lease's expiry out again; False if it expired and another turn took it."""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=ttl_seconds)
+        updated = self.collection.update_one(
+            {"_id": session_id, "turn_lease.token": token}, {"$set": {"turn_lease.expires_at": expires_at}}
+        )
+        return bool(updated.matched_count)
+
+    def release_turn(self, session_id: str, token: str) -> None:
+        self.collection.update_one({"_id": session_id, "turn_lease.token": token}, {"$unset": {"turn_lease": ""}})
+
+
+def _store() -> SessionStore:
+    return SessionStore(get_services().mongo_db()[MONGO_API_SESSIONS_COLLECTION])
+
+
+async def _session_or_404(session_id: str) -> dict:
+    # Ids outside the namespace (e.g. emails stored before it existed) are never served
+    session = await asyncio.to_thread(_store().get, session_id) if session_id.startswith(SESSION_PREFIX) else None
+    if session is None:
+        raise ApiError(404, f"Unknown session: {session_id}")
+    return session
+
+
+async def _json_body(request: Request) -> dict:
+    try:
+        return await request.json()
+    except ValueError:
+        raise ApiError(400, "Body must be valid JSON")
+
+
+# -------------------- Auth --------------------
+
+_auth_cache = {"hash": None, "at": 0.0}
+
+
+async def _check_auth(request: Request) -> None:
+    """`Authorization: Bearer <app password>`: the same password as the Streamlit gate."""
+    if not API_AUTH_ENABLED:
+        return
+    header = request.headers.get("authorization", "")
+    scheme, _, token = header.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise ApiError(401, "Missing bearer token")
+    if _auth_cache["hash"] is None or time.monotonic() - _auth_cache["at"] > _AUTH_CACHE_SECONDS:
+        _auth_cache["hash"] = await asyncio.to_thread(get_active_password)
+        _auth_cache["at"] = time.monotonic()
+    if not hmac.compare_digest(hash_password(token), _auth_cache["hash"]):
+        raise ApiError(401, "Invalid token")
+
+
+def endpoint(handler):
+    """Authenticate, then map ApiError to a JSON error response."""
+
+    async def wrapped(request: Request):
+        try:
+            await _check_auth(request)
+            return await handler(request)
+        except ApiError as e:
+            return JSONResponse({"error": e.message}, status_code=e.status)
+
+    return wrapped
+
+
+# -------------------- Handlers --------------------
+
+async def health(request: Request):
+    status = await asyncio.to_thread(get_services().health)
+    ok = not any(v.startswith("error") for v in status.values())
+    return JSONResponse({"status": "ok" if ok else "degraded", "services": status}, status_code=200 if ok else 503)
+
+
+@endpoint
+async def metrics(request: Request):
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@endpoint
+async def create_session(request: Request):
+    body = await _json_body(request)
+    profile = validate_profile(body)
+    if "session_id" in body:
+        raise ApiError(400, "session_id is assigned by the server")
+    doc = await asyncio.to_thread(_store().create, profile)
+    # Warm geocoding + core charts while the client composes its first question
+    start_prefetch(doc["_id"], profile)
+    logger.info(f"API session created: {doc['_id']}")
+    return JSONResponse({"session_id": doc["_id"], "profile": profile}, status_code=201)
+
+
+@endpoint
+async def get_session(request: Request):
+    session = await _session_or_404(request.path_params["session_id"])
+    return JSONResponse({"session_id": session["_id"], "profile": session["profile"]})
+
+
+@endpoint
+async def list_messages(request: Request):
+    session = await _session_or_404(request.path_params["session_id"])
+    try:
+        limit = max(1, min(200, int(request.query_params.get("limit", "30"))))
+    except ValueError:
+        raise ApiError(400, "limit must be an integer")
+    pairs = await asyncio.to_thread(get_session_history(session["_id"]).load_tail, limit)
+    messages = []
+    for doc_id, msg in pairs:
+        text = block_text(msg.content)
+        if msg.type == "ai":
+            thinking = ThinkingFilter()
+            text = (thinking.feed(text) + thinking.flush()).strip()
+        item = {"id": str(doc_id), "role": msg.type, "content": text}
+        if msg.type == "tool":
+            item["name"] = getattr(msg, "name", None)
+        messages.append(item)
+    return JSONResponse({"session_id": session["_id"], "messages": messages})
+
+
+@endpoint
+async def get_chart(request: Request):
+    session = await _session_or_404(request.path_params["session_id"])
+    chart_type = request.path_params["chart_type"].upper()
+    if chart_type not in CHART_CONFIG:
+        raise ApiError(404, f"Unsupported chart type: {chart_type}")
+    style = request.query_params.get("style")
+    if style is not None and style not in STYLES:
+        raise ApiError(400, f"style must be one of {STYLES}")
+    profile = session["profile"]
+    result = await asyncio.to_thread(_tool_impl, profile["dob"], profile["tob"], profile["city"], chart_type)
+    if isinstance(result, dict) and result.get("error"):
+        raise ApiError(502, str(result["error"]))
+    body = {"session_id": session["_id"], "chart_type": chart_type, "chart": result}
+    if style:
+        parsed = chart_from_tool_output(result if isinstance(result, str) else json.dumps(result))
+        cache = get_render_cache()
+        if parsed and cache is not None:
+            body["svg"] = await asyncio.to_thread(cache.svg_for, parsed[0], parsed[1], style, chart_hash(*parsed))
+    return JSONResponse(body)
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _lookup_cached_answer(executor, session_id: str, profile: dict, message: str):
+    """(cache, key, versions, hit) for this turn; cache failures never block the live path."""
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None, None, None
+    try:
+        # An API session is one conversation, so its own history tells whether this is the opening turn
+        first_turn = not executor.get_session_history(session_id).load_tail(1)
+        keyed = turn_cache_key(profile, message, first_turn)
+        if keyed is None:
+            return None, None, None, None
+        key, versions = keyed
+        return cache, key, versions, cache.get(key)
+    except Exception as e:
+        logger.warning(f"Answer cache lookup failed: {e}")
+        return None, None, None, None
+
+
+async def _turn_events(app_state, session: dict, message: str) -> AsyncIterator[str]:
+    session_id, profile = session["_id"], session["profile"]
+    composed = compose_turn_input(profile, message)
+    try:
+        executor = await asyncio.to_thread(create_agent_executor, session_id, profile["gender"])
+        cache, key, versions, hit = await asyncio.to_thread(_lookup_cached_answer, executor, session_id, profile, message)
+        if hit:
+            await asyncio.to_thread(record_cached_turn, executor.get_session_history(session_id), composed, hit["answer"])
+            yield _sse("done", {"answer": hit["answer"], "notes": hit["notes"], "cached": True})
+            return
+        async with app_state.turn_slots:
+            visible = ""
+            thinking = ThinkingFilter()
+            async for kind, value in astream_agent_turn(
+                executor,
+                {"messages": [HumanMessage(content=composed)]},
+                {"configurable": {"session_id": session_id}},
+            ):
+                if kind == "model_start":
+                    # A new model step supersedes any text streamed before its tool calls
+                    visible = ""
+                    thinking = ThinkingFilter()
+                    yield _sse("reset", {})
+                elif kind == "token":
+                    text = thinking.feed(value)
+                    if text:
+                        visible += text
+                        yield _sse("token", {"text": text})
+                elif kind == "tool_start":
+                    yield _sse("tool", {"label": value})
+            tail = thinking.flush()
+            if tail:
+                visible += tail
+                yield _sse("token", {"text": tail})
+        answer = visible.strip()
+        done = {"answer": answer, "notes": thinking.segments, "cached": False}
+        trace = pop_trace(session_id)
+        if trace:
+            done["timing"] = format_breakdown(trace)
+        yield _sse("done", done)
+        if cache is not None and answer:
+            await asyncio.to_thread(cache.put, key, answer, versions, thinking.segments)
+        await asyncio.to_thread(_store().touch, session_id)
+    except Exception as e:
+        logger.exception(f"API turn failed for session {session_id}: {e}")
+        yield _sse("error", {"message": "The turn failed; please retry."})
+
+
+@endpoint
+async def post_turn(request: Request):
+    session = await _session_or_404(request.path_params["session_id"])
+    body = await _json_body(request)
+    message = body.get("message") if isinstance(body, dict) else None
+    if not isinstance(message, str) or not message.strip():
+        raise ApiError(400, "message is required")
+    # One turn at a time per session across all workers, so history stays in order
+    store = _store()
+    lease = await asyncio.to_thread(store.acquire_turn, session["_id"])
+    if lease is None:
+        raise ApiError(409, "A turn is already running for this session")
+    return LeasedEventStream(
+        _turn_events(request.app.state, session, message.strip()), store, session["_id"], lease,
+        media_type="text/event-stream", headers={"Cache-Control": "no-cache"},
+    )
+
+
+class LeasedEventStream(StreamingResponse):
+    """Streamed turn that owns its session's turn lease.
+
+    The lease is renewed every third of `API_TURN_LEASE_SECONDS` for as long as the
+    response runs (queueing for a turn slot included), and released when it ends, also
+    when the client disconnected before the body was ever started.
+    """
+
+    def __init__(self, content, store: SessionStore, session_id: str, lease: str, **kwargs):
+        super().__init__(content, **kwargs)
+        self.store = store
+        self.session_id = session_id
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send):
+        renewer = asyncio.create_task(self._renew())
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            renewer.cancel()
+            await asyncio.to_thread(self.store.release_turn, self.session_id, self.lease)
+
+    async def _renew(self) -> None:
+        while True:
+            await asyncio.sleep(API_TURN_LEASE_SECONDS / 3)
+            if not await asyncio.to_thread(self.store.renew_turn, self.session_id, self.lease, API_TURN_LEASE_SECONDS):
+                logger.warning(f"Lost the turn lease of session {self.session_id} mid-turn")
+                return
+
+
+# -------------------- App --------------------
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    app.state.turn_slots = asyncio.Semaphore(API_MAX_CONCURRENT_TURNS)
+    if not API_AUTH_ENABLED:
+        logger.warning("API authentication is disabled (API_AUTH_ENABLED=false)")
+    await asyncio.to_thread(get_services().health)
+    yield
+
+
+def create_app() -> Starlette:
+    return Starlette(
+        routes=[
+            Route("/healthz", health, methods=["GET"]),
+            Route("/metrics", metrics, methods=["GET"]),
+            Route("/sessions", create_session, methods=["POST"]),
+            Route("/sessions/{session_id}", get_session, methods=["GET"]),
+            Route("/sessions/{session_id}/messages", list_messages, methods=["GET"]),
+            Route("/sessions/{session_id}/charts/{chart_type}", get_chart, methods=["GET"]),
+            Route("/sessions/{session_id}/turns", post_turn, methods=["POST"]),
+        ],
+        lifespan=lifespan,
+    )
+
+
+app = create_app()
@@ -0,0 +1,281 @@
+import atexit
+import json
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING
+from pymongo.errors import OperationFailure
+
+from src.config import (
+    API_CACHE_IDLE_TTL_DAYS, API_CACHE_MAX_ENTRIES, API_CACHE_MAX_MB,
+    API_CACHE_ACCESS_FLUSH_SECONDS, API_CACHE_ACCESS_FLUSH_BATCH,
+)
+from src.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# Created-at age buckets reported by `cache_stats`, in days
+AGE_BUCKETS = ((1, "<1d"), (7, "1-7d"), (30, "7-30d"), (90, "30-90d"), (365, "90d-1y"))
+OLDEST_BUCKET = ">1y"
+PRUNE_BATCH = 1000
+
+_indexes_checked = False
+_indexes_lock = threading.Lock()
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def entry_fields(result: dict) -> dict:
+    """Lifecycle fields stored with a new `api_cache` entry."""
+    now = _utcnow()
+    return {
+        "created_at": now,
+        "last_access_at": now,
+        "hits": 0,
+        "size_bytes": len(json.dumps(result, separators=(",", ":"))),
+    }
+
+
+# -------------------- Access tracking --------------------
+
+class AccessTracker:
+    """Buffers cache hits and writes them to Mongo in batches from a background thread.
+
+    A hit only touches a dict; a daemon flusher (started on the first hit) writes the
+    buffered ids every `flush_seconds`, or sooner once `max_pending` distinct entries
+    are waiting, with one `update_many` per hit count, setting `last_access_at` to the
+    flush time and incrementing `hits`. Access times are therefore accurate to the flush
+    interval, which is plenty for idle expiry and LRU.
+    """
+
+    def __init__(self, flush_seconds: float = API_CACHE_ACCESS_FLUSH_SECONDS,
+                 max_pending: int = API_CACHE_ACCESS_FLUSH_BATCH):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._pending: Dict[str, int] = {}
+        self._collection = None
+        self._wake = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+
+    def record(self, collection, cache_id: str) -> None:
+        with self._lock:
+            self._collection = collection
+            self._pending[cache_id] = self._pending.get(cache_id, 0) + 1
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name="api-cache-access", daemon=True)
+                self._flusher.start()
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()  # never writes on the caller's thread
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write buffered hits; returns the number of entries updated."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            collection = self._collection
+        if not pending or collection is None:
+            return 0
+        by_count: Dict[int, List[str]] = defaultdict(list)
+        for cache_id, count in pending.items():
+            by_count[count].append(cache_id)
+        now = _utcnow()
+        try:
+            for count, ids in by_count.items():
+                collection.update_many(
+                    {"_id": {"$in": ids}}, {"$max": {"last_access_at": now}, "$inc": {"hits": count}}
+                )
+        except Exception as e:
+            logger.warning(f"Failed to record {len(pending)} api_cache accesses: {e}")
+            return 0
+        return len(pending)
+
+
+ACCESS_TRACKER = AccessTracker()
+atexit.register(ACCESS_TRACKER.flush)
+
+
+def record_access(collection, cache_id: str) -> None:
+    ACCESS_TRACKER.record(collection, cache_id)
+
+
+# -------------------- Indexes --------------------
+
+def ensure_indexes(collection, idle_ttl_days: float = API_CACHE_IDLE_TTL_DAYS) -> None:
+    """Idle-expiry TTL index on last_access_at (plain index when TTL is off) plus chart_type.
+
+    Runs once per process from the cache read path; a failure (e.g. a read-only Mongo
+    user) is logged once and not retried until restart. `scripts/api_cache.py bootstrap`
+    also backfills lifecycle fields on entries written before they existed.
+    """
+    global _indexes_checked
+    if _indexes_checked:
+        return
+    with _indexes_lock:
+        if _indexes_checked:
+            return
+        try:
+            _ensure_ttl_index(collection, idle_ttl_days)
+            collection.create_index([("chart_type", ASCENDING)])
+        except Exception as e:
+            logger.warning(f"Failed to ensure api_cache indexes (not retried until restart): {e}")
+        finally:
+            _indexes_checked = True
+
+
+def _ensure_ttl_index(collection, idle_ttl_days: float) -> None:
+    keys = [("last_access_at", ASCENDING)]
+    if idle_ttl_days <= 0:
+        collection.create_index(keys)
+        return
+    seconds = int(idle_ttl_days * 86400)
+    try:
+        collection.create_index(keys, expireAfterSeconds=seconds)
+    except OperationFailure:
+        # Index exists with another expiry (or none): change it in place
+        collection.database.command(
+            "collMod", collection.name, index={"keyPattern": {"last_access_at": 1}, "expireAfterSeconds": seconds}
+        )
+        logger.info(f"Updated api_cache idle TTL to {idle_ttl_days} days")
+
+
+def backfill(collection) -> int:
+    """Add created_at / last_access_at / hits / size_bytes to entries that predate them."""
+    updated = 0
+    missing = {"$or": [{"last_access_at": {"$exists": False}}, {"size_bytes": {"$exists": False}}]}
+    for doc in collection.find(missing, {"api_response": 1, "created_at": 1}).batch_size(PRUNE_BATCH):
+        created = doc.get("created_at") or _utcnow()
+        collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {
+                "created_at": created,
+                "last_access_at": created,
+                "size_bytes": len(json.dumps(doc.get("api_response"), separators=(",", ":"))),
+            }, "$max": {"hits": 0}},
+        )
+        updated += 1
+    logger.info(f"Backfilled lifecycle fields on {updated} api_cache entries")
+    return updated
+
+
+# -------------------- Pruning --------------------
+
+def _delete_oldest(collection, limit: int, max_bytes: Optional[int] = None) -> tuple:
+    """Delete least recently used entries: `limit` of them, or until `max_bytes` are freed."""
+    deleted = freed = 0
+    cursor = collection.find({}, {"_id": 1, "size_bytes": 1}).sort("last_access_at", ASCENDING)
+    batch: List[str] = []
+    for doc in cursor:
+        if deleted + len(batch) >= limit or (max_bytes is not None and freed >= max_bytes):
+            break
+        batch.append(doc["_id"])
+        freed += doc.get("size_bytes") or 0
+        if len(batch) >= PRUNE_BATCH:
+            deleted += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+            batch = []
+    if batch:
+        deleted += collection.delete_many({"_id": {"$in": batch}}).deleted_count
+    return deleted, freed
+
+
+def total_bytes(collection) -> int:
+    rows = list(collection.aggregate([{"$group": {"_id": None, "bytes": {"$sum": {"$ifNull": ["$size_bytes", 0]}}}}]))
+    return int(rows[0]["bytes"]) if rows else 0
+
+
+def prune(collection, idle_ttl_days: float = API_CACHE_IDLE_TTL_DAYS, max_entries: int = API_CACHE_MAX_ENTRIES,
+          max_mb: float = API_CACHE_MAX_MB) -> Dict[str, int]:
+    """Expire idle entries, then evict least recently used ones down to the entry and size bounds.
+
+    The TTL index does idle expiry on its own; the explicit pass covers deployments
+    where the index is missing or the TTL monitor is behind. 0 disables each bound.
+    """
+    ACCESS_TRACKER.flush()  # LRU order must see this process's recent hits
+    result = {"expired": 0, "evicted_entries": 0, "evicted_bytes": 0}
+    if idle_ttl_days > 0:
+        cutoff = _utcnow() - timedelta(days=idle_ttl_days)
+        result["expired"] = collection.delete_many({"last_access_at": {"$lt": cutoff}}).deleted_count
+    if max_entries > 0:
+        excess = collection.count_documents({}) - max_entries
+        if excess > 0:
+            deleted, freed = _delete_oldest(collection, excess)
+            result["evicted_entries"] += deleted
+            result["evicted_bytes"] += freed
+    if max_mb > 0:
+        excess_bytes = total_bytes(collection) - int(max_mb * 1024 * 1024)
+        if excess_bytes > 0:
+            deleted, freed = _delete_oldest(collection, collection.count_documents({}), max_bytes=excess_bytes)
+            result["evicted_entries"] += deleted
+            result["evicted_bytes"] += freed
+    logger.info(
+        f"Pruned api_cache: {result['expired']} idle, {result['evicted_entries']} evicted "
+        f"({result['evicted_bytes'] / 1024:.0f} KB)"
+    )
+    return result
+
+
+# -------------------- Stats --------------------
+
+def _age_bucket_expression(now: datetime) -> dict:
+    # Naive UTC: stored datetimes come back naive, and aggregation compares them as-is
+    naive = now.replace(tzinfo=None)
+    return {"$switch": {
+        "branches": [
+            {"case": {"$gte": ["$created_at", naive - timedelta(days=days)]}, "then": label}
+            for days, label in AGE_BUCKETS
+        ],
+        "default": OLDEST_BUCKET,
+    }}
+
+
+def cache_stats(collection) -> dict:
+    """Entries, bytes, hits, hit rate and created-at age buckets per chart type.
+
+    Hit rate is hits / (hits + entries): each entry was written by exactly one miss, so
+    this is the lifetime rate of the entries still cached.
+    """
+    ACCESS_TRACKER.flush()
+    rows = collection.aggregate([{"$group": {
+        "_id": {"chart_type": "$chart_type", "age": _age_bucket_expression(_utcnow())},
+        "entries": {"$sum": 1},
+        "bytes": {"$sum": {"$ifNull": ["$size_bytes", 0]}},
+        "hits": {"$sum": {"$ifNull": ["$hits", 0]}},
+    }}])
+    per_chart: Dict[str, dict] = {}
+    for row in rows:
+        chart = row["_id"].get("chart_type") or "unknown"
+        stats = per_chart.setdefault(chart, {"entries": 0, "bytes": 0, "hits": 0, "ages": {}})
+        stats["entries"] += row["entries"]
+        stats["bytes"] += row["bytes"]
+        stats["hits"] += row["hits"]
+        stats["ages"][row["_id"]["age"]] = stats["ages"].get(row["_id"]["age"], 0) + row["entries"]
+    total = {"entries": 0, "bytes": 0, "hits": 0, "ages": {}}
+    for stats in per_chart.values():
+        stats["hit_rate"] = stats["hits"] / (stats["hits"] + stats["entries"]) if stats["entries"] else 0.0
+        for key in ("entries", "bytes", "hits"):
+            total[key] += stats[key]
+        for age, n in stats["ages"].items():
+            total["ages"][age] = total["ages"].get(age, 0) + n
+    total["hit_rate"] = total["hits"] / (total["hits"] + total["entries"]) if total["entries"] else 0.0
+    report = {"charts": dict(sorted(per_chart.items(), key=_chart_order)), "total": total}
+    try:
+        coll = collection.database.command({"collStats": collection.name})
+        report["storage"] = {k: coll.get(k) for k in ("size", "storageSize", "totalIndexSize")}
+    except Exception:
+        pass  # not available on every deployment (or mongomock)
+    return report
+
+
+def _chart_order(item) -> tuple:
+    name = item[0]
+    return (0, int(name[1:])) if name[:1] == "D" and name[1:].isdigit() else (1, name)
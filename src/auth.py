@@ -1,7 +1,7 @@
 import os
 import hashlib
-from pymongo import MongoClient
-from src.config import MONGO_URI, MONGO_DB_NAME
+from src.config import MONGO_URI
+from src.services import get_services
 
 
 def hash_password(password: str) -> str:
@@ -26,16 +26,12 @@ def get_active_password():
         return default_hash
 
     try:
-        # Check MongoDB for an override
-        client = MongoClient(MONGO_URI)
-        db = client[MONGO_DB_NAME]
-        config_col = db["app_config"]
+        # Check MongoDB for an override (shared client; not closed here)
+        config_col = get_services().mongo_db()["app_config"]
 
         # Look for a document with _id="access_password"
         override = config_col.find_one({"_id": "access_password"})
 
-        client.close()
-
         if override and "value" in override and isinstance(override["value"], str):
             # Stored value is expected to be a hash
             return override["value"]
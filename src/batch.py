@@ -0,0 +1,294 @@
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agent import compose_turn_input, create_agent_executor, get_session_history
+from src.answer_cache import normalize_profile
+from src.llm_factory import estimate_cost
+from src.logging_utils import get_logger
+from src.model_router import track_usage
+from src.rate_limiter import api_priority
+from src.streaming import ThinkingFilter, block_text
+from src.tools import CHART_CONFIG, resolve_chart
+
+logger = get_logger(__name__)
+
+MANIFEST = "manifest.jsonl"
+
+
+@dataclass
+class Topic:
+    title: str
+    questions: List[str]
+    charts: List[str] = field(default_factory=list)  # fetched once per native before the report runs
+
+
+@dataclass
+class ReportTemplate:
+    name: str
+    title: str
+    topics: List[Topic]
+
+    @property
+    def questions(self) -> List[str]:
+        return [q for t in self.topics for q in t.questions]
+
+
+def load_template(path: str) -> ReportTemplate:
+    """JSON template: {"name", "title", "topics": [{"title", "questions": [...], "charts": [...]}]}."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    topics = [
+        Topic(t["title"], list(t["questions"]), [c.upper() for c in t.get("charts", [])])
+        for t in data.get("topics", [])
+    ]
+    if not topics or not all(t.questions for t in topics):
+        raise ValueError(f"Template {path} needs at least one topic, each with questions")
+    unknown = sorted({c for t in topics for c in t.charts} - set(CHART_CONFIG))
+    if unknown:
+        raise ValueError(f"Template {path} lists unsupported charts: {', '.join(unknown)}")
+    name = data.get("name") or os.path.splitext(os.path.basename(path))[0]
+    return ReportTemplate(name=name, title=data.get("title") or name, topics=topics)
+
+
+def load_profiles(path: str) -> List[Dict[str, str]]:
+    """Natives from CSV (header row) or JSON Lines: id, name, dob, tob, city, gender."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    profiles, seen = [], set()
+    for i, row in enumerate(rows, start=1):
+        missing = [k for k in ("dob", "tob", "city") if not str(row.get(k) or "").strip()]
+        if missing:
+            raise ValueError(f"{path} row {i}: missing {', '.join(missing)}")
+        profile = {k: str(row.get(k) or "").strip() for k in ("dob", "tob", "city")}
+        profile["gender"] = str(row.get("gender") or "Other").strip().capitalize()
+        profile["id"] = str(row.get("id") or "").strip() or f"native-{i}"
+        profile["name"] = str(row.get("name") or "").strip() or profile["id"]
+        if profile["id"] in seen:
+            raise ValueError(f"{path} row {i}: duplicate id {profile['id']}")
+        seen.add(profile["id"])
+        profiles.append(profile)
+    return profiles
+
+
+def native_key(profile: Dict[str, str]) -> str:
+    """Natives with the same birth data and gender get identical readings."""
+    return hashlib.sha256(json.dumps(normalize_profile(profile), sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _at_batch_priority(fn, *args):
+    with api_priority("batch"):
+        return fn(*args)
+
+
+def _safe_name(text: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_.@" else "_" for c in text)[:120]
+
+
+class Manifest:
+    """Append-only JSONL of per-report outcomes; the last line per id wins on resume."""
+
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, MANIFEST)
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[str, dict]:
+        entries: Dict[str, dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries[entry["id"]] = entry
+        return entries
+
+    def append(self, entry: dict) -> None:
+        entry = {**entry, "finished_at": datetime.now(timezone.utc).isoformat()}
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    done: int = 0
+    failed: int = 0
+    skipped: int = 0  # already done in an earlier run
+    deduped: int = 0  # copied from an identical native in this batch
+    elapsed_s: float = 0.0
+    cost_usd: float = 0.0
+    priced_reports: int = 0
+
+    @property
+    def reports_per_minute(self) -> float:
+        generated = self.done + self.deduped
+        return generated / (self.elapsed_s / 60) if self.elapsed_s else 0.0
+
+    @property
+    def cost_per_report(self) -> Optional[float]:
+        return self.cost_usd / self.priced_reports if self.priced_reports else None
+
+
+class BatchRunner:
+    """Generates one markdown reading per native by running the template's questions through the agent.
+
+    Reports run in parallel on a thread pool and share the process caches (geocodes, BPHS
+    passages) and the Mongo chart cache. Identical natives are generated once, each
+    native's template charts are fetched once up front, reports are streamed to
+    `<id>.md.partial` question by question, and the manifest lets a rerun skip everything
+    already finished. BPHS passages are not warmed: the agent searches with queries of its
+    own, which rarely match the template question text.
+    """
+
+    def __init__(self, template: ReportTemplate, out_dir: str, workers: int = 4, retries: int = 2,
+                 warm: bool = True, on_report: Optional[Callable[[dict, BatchSummary], None]] = None):
+        self.template = template
+        self.out_dir = out_dir
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.warm = warm
+        self.on_report = on_report
+        self.manifest = Manifest(out_dir)
+        self._summary_lock = threading.Lock()
+
+    def report_path(self, profile: Dict[str, str]) -> str:
+        return os.path.join(self.out_dir, f"{_safe_name(profile['id'])}.md")
+
+    # ---- shared lookups ----
+
+    def _warm(self, natives: List[Dict[str, str]]) -> None:
+        charts = sorted({c for t in self.template.topics for c in t.charts})
+        jobs = [(resolve_chart, (p["dob"], p["tob"], p["city"], c)) for p in natives for c in charts]
+        logger.info(f"Warming {len(charts)} charts for {len(natives)} natives")
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-warm") as pool:
+            for future in as_completed([pool.submit(_at_batch_priority, fn, *args) for fn, args in jobs]):
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.warning(f"Batch warm-up lookup failed: {e}")
+
+    # ---- one report ----
+
+    def _ask(self, executor, session_id: str, profile: Dict[str, str], question: str) -> str:
+        for attempt in range(self.retries + 1):
+            try:
+                out = executor.invoke(
+                    {"messages": [HumanMessage(content=compose_turn_input(profile, question))]},
+                    {"configurable": {"session_id": session_id}},
+                )
+                final = next((m for m in reversed(out.get("messages", [])) if isinstance(m, AIMessage)), None)
+                thinking = ThinkingFilter()
+                text = thinking.feed(block_text(final.content if final else "")) + thinking.flush()
+                return text.strip()
+            except Exception as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(f"Batch question failed ({e}); retrying {attempt + 1}/{self.retries}")
+                time.sleep(2 ** attempt)
+        return ""
+
+    def _header(self, profile: Dict[str, str]) -> str:
+        return (
+            f"# {self.template.title}: {profile['name']}\n\n"
+            f"DOB {profile['dob']} · Time {profile['tob']} · {profile['city']} · {profile['gender']}\n"
+        )
+
+    def _generate(self, profile: Dict[str, str]) -> dict:
+        session_id = f"batch:{self.template.name}:{profile['id']}"
+        get_session_history(session_id).clear()  # a resumed report starts over
+        executor = create_agent_executor(session_id, profile["gender"])
+        path = self.report_path(profile)
+        started = time.perf_counter()
+        with api_priority("batch"), track_usage() as usage, open(path + ".partial", "w", encoding="utf-8") as f:
+            f.write(self._header(profile))
+            for topic in self.template.topics:
+                f.write(f"\n## {topic.title}\n")
+                for question in topic.questions:
+                    answer = self._ask(executor, session_id, profile, question)
+                    f.write(f"\n### {question}\n\n{answer or '_No answer._'}\n")
+                    f.flush()
+        os.replace(path + ".partial", path)
+        return {
+            "elapsed_s": round(time.perf_counter() - started, 2),
+            "usage": usage,
+            "cost_usd": estimate_cost(usage),
+        }
+
+    def _copy(self, source: Dict[str, str], target: Dict[str, str]) -> None:
+        with open(self.report_path(source), "r", encoding="utf-8") as f:
+            body = f.read().split("\n", 3)[3]  # drop the source's title and birth-data lines
+        with open(self.report_path(target) + ".partial", "w", encoding="utf-8") as f:
+            f.write(self._header(target) + body)
+        os.replace(self.report_path(target) + ".partial", self.report_path(target))
+
+    def _record(self, summary: BatchSummary, entry: dict) -> None:
+        self.manifest.append(entry)
+        with self._summary_lock:
+            if entry["status"] == "done":
+                summary.done += 1
+                if entry.get("cost_usd") is not None:
+                    summary.cost_usd += entry["cost_usd"]
+                    summary.priced_reports += 1
+            elif entry["status"] == "deduped":
+                summary.deduped += 1
+            else:
+                summary.failed += 1
+        if self.on_report:
+            self.on_report(entry, summary)
+
+    def _run_group(self, summary: BatchSummary, group: List[Dict[str, str]]) -> None:
+        first = group[0]
+        try:
+            result = self._generate(first)
+        except Exception as e:
+            logger.exception(f"Report for {first['id']} failed: {e}")
+            for p in group:
+                self._record(summary, {"id": p["id"], "status": "failed", "error": str(e)})
+            return
+        self._record(summary, {"id": first["id"], "status": "done", "file": os.path.basename(self.report_path(first)),
+                               "key": native_key(first), **result})
+        for p in group[1:]:
+            self._copy(first, p)
+            self._record(summary, {"id": p["id"], "status": "deduped", "from": first["id"],
+                                   "file": os.path.basename(self.report_path(p)), "key": native_key(p)})
+
+    # ---- batch ----
+
+    def run(self, profiles: List[Dict[str, str]]) -> BatchSummary:
+        os.makedirs(self.out_dir, exist_ok=True)
+        summary = BatchSummary(total=len(profiles))
+        finished = self.manifest.load()
+        pending = []
+        for p in profiles:
+            entry = finished.get(p["id"])
+            if entry and entry["status"] in ("done", "deduped") and os.path.exists(self.report_path(p)):
+                summary.skipped += 1
+            else:
+                pending.append(p)
+        groups: Dict[str, List[Dict[str, str]]] = {}
+        for p in pending:
+            groups.setdefault(native_key(p), []).append(p)
+        logger.info(
+            f"Batch {self.template.name}: {len(pending)} reports to write ({len(groups)} unique natives), "
+            f"{summary.skipped} already done"
+        )
+        started = time.perf_counter()
+        if self.warm and groups:
+            self._warm([g[0] for g in groups.values()])
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch-report") as pool:
+            for future in as_completed([pool.submit(self._run_group, summary, g) for g in groups.values()]):
+                future.result()
+        summary.elapsed_s = time.perf_counter() - started
+        return summary
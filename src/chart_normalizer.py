@@ -0,0 +1,189 @@
+from typing import Any, Dict, List, Optional
+
+ZODIAC_SIGNS = [
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces",
+]
+
+NAKSHATRAS = [
+    "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashira", "Ardra", "Punarvasu", "Pushya", "Ashlesha",
+    "Magha", "Purva Phalguni", "Uttara Phalguni", "Hasta", "Chitra", "Swati", "Vishakha", "Anuradha", "Jyeshtha",
+    "Mula", "Purva Ashadha", "Uttara Ashadha", "Shravana", "Dhanishta", "Shatabhisha", "Purva Bhadrapada",
+    "Uttara Bhadrapada", "Revati",
+]
+
+# Ascendant + the 9 Grahas, in traditional order. Outer planets in API payloads are dropped.
+BODIES = ["Ascendant", "Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu"]
+_BODY_LOOKUP = {b.lower(): b for b in BODIES}
+_BODY_LOOKUP.update({"lagna": "Ascendant", "asc": "Ascendant"})
+
+COLUMNS = ["planet", "sign", "degree", "house", "nakshatra", "retrograde"]
+
+_NAKSHATRA_SPAN = 360.0 / 27
+
+
+def _first(d: dict, *keys):
+    for k in keys:
+        v = d.get(k)
+        if v is not None and v != "":
+            return v
+    return None
+
+
+def _to_float(v) -> Optional[float]:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return None
+
+
+def _sign_name(v) -> Optional[str]:
+    if isinstance(v, (int, float)) and 1 <= int(v) <= 12:
+        return ZODIAC_SIGNS[int(v) - 1]
+    if isinstance(v, str):
+        if v.strip().isdigit():
+            return _sign_name(int(v.strip()))
+        for s in ZODIAC_SIGNS:
+            if s.lower() == v.strip().lower():
+                return s
+    return None
+
+
+def _is_retro(v) -> bool:
+    if isinstance(v, str):
+        return v.strip().lower() in ("true", "yes", "r", "1")
+    return bool(v)
+
+
+def nakshatra_for(longitude: float) -> str:
+    return NAKSHATRAS[int((longitude % 360.0) // _NAKSHATRA_SPAN)]
+
+
+def _iter_bodies(payload: Any):
+    """Yield every dict in the payload that names a known body."""
+    stack = [payload]
+    while stack:
+        node = stack.pop(0)
+        if isinstance(node, dict):
+            body = _BODY_LOOKUP.get(str(node.get("name", "")).strip().lower())
+            if body:
+                yield body, node
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def normalize_chart(chart_type: str, chart_data: Any) -> List[Dict[str, Any]]:
+    """Turn any varga API response into fixed-schema rows (see COLUMNS), Ascendant first.
+
+    Multiple representations of the same body are merged field by field. Missing houses
+    are derived whole-sign from the ascendant; nakshatra is derived from the full
+    longitude for D1 only (divisional longitudes are not real sky positions).
+    """
+    rows: Dict[str, Dict[str, Any]] = {}
+    for body, node in _iter_bodies(chart_data):
+        row = rows.setdefault(body, {c: None for c in COLUMNS} | {"planet": body, "_full": None})
+        full = _to_float(_first(node, "fullDegree", "full_degree", "longitude"))
+        norm = _to_float(_first(node, "normDegree", "norm_degree", "degree"))
+        sign = _sign_name(_first(node, "current_sign", "sign", "sign_name", "zodiac_sign_name", "rasi"))
+        if sign is None and full is not None:
+            sign = ZODIAC_SIGNS[int((full % 360.0) // 30)]
+        if norm is None and full is not None:
+            norm = full % 30.0
+        row["_full"] = row["_full"] if row["_full"] is not None else full
+        row["sign"] = row["sign"] or sign
+        row["degree"] = row["degree"] if row["degree"] is not None else (round(norm, 2) if norm is not None else None)
+        house = _first(node, "house_number", "house")
+        if row["house"] is None and house is not None and str(house).strip().isdigit():
+            row["house"] = int(house)
+        nak = _first(node, "nakshatra_name", "nakshatra")
+        if row["nakshatra"] is None and isinstance(nak, str):
+            row["nakshatra"] = nak
+        retro = _first(node, "isRetro", "is_retro", "retrograde")
+        if retro is not None:
+            row["retrograde"] = bool(row["retrograde"]) or _is_retro(retro)
+
+    asc = rows.get("Ascendant")
+    asc_idx = ZODIAC_SIGNS.index(asc["sign"]) if asc and asc["sign"] else None
+    out = []
+    for body in BODIES:
+        row = rows.get(body)
+        if not row:
+            continue
+        if row["house"] is None and asc_idx is not None and row["sign"]:
+            row["house"] = (ZODIAC_SIGNS.index(row["sign"]) - asc_idx) % 12 + 1
+        if row["nakshatra"] is None and chart_type == "D1" and row["_full"] is not None:
+            row["nakshatra"] = nakshatra_for(row["_full"])
+        if body == "Ascendant":
+            row["retrograde"] = False
+        row.pop("_full")
+        row["retrograde"] = bool(row["retrograde"])
+        out.append(row)
+    return out
+
+
+def format_chart_table(chart_type: str, rows: List[Dict[str, Any]]) -> str:
+    """Pipe-separated table: one header line plus one line per body. 'R' marks retrograde."""
+    lines = [f"{chart_type} | " + " | ".join(COLUMNS)]
+    for r in rows:
+        lines.append(" | ".join([
+            r["planet"],
+            r["sign"] or "-",
+            f"{r['degree']:.2f}" if r["degree"] is not None else "-",
+            str(r["house"]) if r["house"] is not None else "-",
+            r["nakshatra"] or "-",
+            "R" if r["retrograde"] else "",
+        ]).rstrip(" |"))
+    return "\n".join(lines)
+
+
+def compact_chart(chart_type: str, chart_data: Any) -> Optional[str]:
+    """Compact table for the LLM, or None when the payload has no recognizable bodies."""
+    rows = normalize_chart(chart_type, chart_data)
+    if not rows:
+        return None
+    return format_chart_table(chart_type, rows)
+
+
+def ascendant_sign(chart_data: Any) -> Optional[str]:
+    """The Ascendant's sign name in a chart API payload, whatever its nesting."""
+    for body, node in _iter_bodies(chart_data):
+        if body == "Ascendant":
+            sign = _sign_name(_first(node, "current_sign", "sign", "sign_name", "zodiac_sign_name"))
+            if sign:
+                return sign
+    return None
+
+
+def body_longitude(chart_data: Any, body: str) -> Optional[float]:
+    """Full sidereal longitude (0-360) of a body in a chart API payload, or None."""
+    for name, node in _iter_bodies(chart_data):
+        if name == body:
+            full = _to_float(_first(node, "fullDegree", "full_degree", "longitude"))
+            if full is not None:
+                return full % 360.0
+    return None
+
+
+def parse_chart_table(text: str) -> Optional[tuple]:
+    """(chart_type, rows) from a `format_chart_table` string, or None if `text` is not one."""
+    lines = (text or "").strip().splitlines()
+    if not lines:
+        return None
+    head = [c.strip() for c in lines[0].split("|")]
+    if head[1:] != COLUMNS or not head[0]:
+        return None
+    rows = []
+    for line in lines[1:]:
+        cells = [c.strip() for c in line.split("|")]
+        cells += [""] * (len(COLUMNS) - len(cells))
+        planet, sign, degree, house, nakshatra, retro = cells[:len(COLUMNS)]
+        rows.append({
+            "planet": planet,
+            "sign": None if sign in ("", "-") else sign,
+            "degree": _to_float(degree),
+            "house": int(house) if house.isdigit() else None,
+            "nakshatra": None if nakshatra in ("", "-") else nakshatra,
+            "retrograde": retro == "R",
+        })
+    return head[0], rows
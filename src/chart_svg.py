@@ -0,0 +1,238 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from html import escape
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.chart_normalizer import ZODIAC_SIGNS, normalize_chart, parse_chart_table
+from src.config import CHART_SVG_STYLE, MONGO_CHART_RENDER_COLLECTION
+from src.logging_utils import get_logger
+from src.metrics import record_cache
+
+logger = get_logger(__name__)
+
+# Bump when the drawing changes so cached renders are not reused across layouts
+RENDERER_VERSION = "1"
+STYLES = ("north", "south")
+
+_SIZE = 320
+_ABBR = {
+    "Ascendant": "As", "Sun": "Su", "Moon": "Mo", "Mars": "Ma", "Mercury": "Me",
+    "Jupiter": "Ju", "Venus": "Ve", "Saturn": "Sa", "Rahu": "Ra", "Ketu": "Ke",
+}
+
+# North Indian: houses are fixed (1 = top diamond, counter-clockwise), signs rotate with the lagna.
+_NORTH_HOUSE_CENTERS = {
+    1: (0.5, 0.25), 2: (0.25, 0.1), 3: (0.1, 0.25), 4: (0.25, 0.5), 5: (0.1, 0.75), 6: (0.25, 0.9),
+    7: (0.5, 0.75), 8: (0.75, 0.9), 9: (0.9, 0.75), 10: (0.75, 0.5), 11: (0.9, 0.25), 12: (0.75, 0.1),
+}
+# South Indian: signs are fixed on a 4x4 grid (Pisces top-left, clockwise), as (column, row).
+_SOUTH_SIGN_CELLS = {
+    "Pisces": (0, 0), "Aries": (1, 0), "Taurus": (2, 0), "Gemini": (3, 0),
+    "Cancer": (3, 1), "Leo": (3, 2), "Virgo": (3, 3), "Libra": (2, 3),
+    "Scorpio": (1, 3), "Sagittarius": (0, 3), "Capricorn": (0, 2), "Aquarius": (0, 1),
+}
+
+
+def _label(row: Dict[str, Any]) -> str:
+    text = _ABBR.get(row["planet"], row["planet"][:2])
+    if row.get("degree") is not None:
+        text += f" {int(row['degree'])}°"
+    if row.get("retrograde"):
+        text += " R"
+    return text
+
+
+def _text_block(x: float, y: float, lines: List[str], size: int = 11) -> str:
+    if not lines:
+        return ""
+    top = y - (len(lines) - 1) * size * 0.55
+    return "".join(
+        f'<text x="{x:.1f}" y="{top + i * size * 1.1:.1f}" font-size="{size}" text-anchor="middle" '
+        f'dominant-baseline="middle">{escape(line)}</text>'
+        for i, line in enumerate(lines)
+    )
+
+
+def _open(title: str) -> List[str]:
+    return [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {_SIZE} {_SIZE}" width="{_SIZE}" height="{_SIZE}" '
+        f'font-family="sans-serif" role="img" aria-label="{escape(title)}">',
+        f'<rect x="1" y="1" width="{_SIZE - 2}" height="{_SIZE - 2}" fill="#fffdf7" stroke="#7a4b00" stroke-width="2"/>',
+    ]
+
+
+def _render_north(chart_type: str, rows: List[Dict[str, Any]]) -> str:
+    s = _SIZE
+    parts = _open(f"{chart_type} North Indian chart")
+    parts.append(
+        f'<g stroke="#7a4b00" stroke-width="1.5" fill="none">'
+        f'<line x1="0" y1="0" x2="{s}" y2="{s}"/><line x1="{s}" y1="0" x2="0" y2="{s}"/>'
+        f'<polygon points="{s / 2},0 {s},{s / 2} {s / 2},{s} 0,{s / 2}"/></g>'
+    )
+    asc = next((r for r in rows if r["planet"] == "Ascendant"), None)
+    asc_idx = ZODIAC_SIGNS.index(asc["sign"]) if asc and asc.get("sign") in ZODIAC_SIGNS else None
+    by_house: Dict[int, List[str]] = {h: [] for h in _NORTH_HOUSE_CENTERS}
+    for r in rows:
+        if r["planet"] != "Ascendant" and r.get("house") in by_house:
+            by_house[r["house"]].append(_label(r))
+    for house, (cx, cy) in _NORTH_HOUSE_CENTERS.items():
+        x, y = cx * s, cy * s
+        if asc_idx is not None:
+            sign_no = (asc_idx + house - 1) % 12 + 1
+            parts.append(f'<text x="{x:.1f}" y="{y - 26:.1f}" font-size="9" fill="#a0522d" text-anchor="middle">{sign_no}</text>')
+        lines = (["Asc"] if house == 1 else []) + by_house[house]
+        parts.append(_text_block(x, y, lines, size=10 if len(lines) > 3 else 11))
+    parts.append(_text_block(s / 2, s / 2, [chart_type], size=13))
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _render_south(chart_type: str, rows: List[Dict[str, Any]]) -> str:
+    s, cell = _SIZE, _SIZE / 4
+    parts = _open(f"{chart_type} South Indian chart")
+    # Outer ring of 12 cells around an empty 2x2 centre
+    parts.append(
+        '<g stroke="#7a4b00" stroke-width="1.5" fill="none">'
+        f'<line x1="{cell}" y1="0" x2="{cell}" y2="{s}"/><line x1="{3 * cell}" y1="0" x2="{3 * cell}" y2="{s}"/>'
+        f'<line x1="0" y1="{cell}" x2="{s}" y2="{cell}"/><line x1="0" y1="{3 * cell}" x2="{s}" y2="{3 * cell}"/>'
+        f'<line x1="{2 * cell}" y1="0" x2="{2 * cell}" y2="{cell}"/><line x1="{2 * cell}" y1="{3 * cell}" x2="{2 * cell}" y2="{s}"/>'
+        f'<line x1="0" y1="{2 * cell}" x2="{cell}" y2="{2 * cell}"/><line x1="{3 * cell}" y1="{2 * cell}" x2="{s}" y2="{2 * cell}"/>'
+        '</g>'
+    )
+    by_sign: Dict[str, List[str]] = {sign: [] for sign in ZODIAC_SIGNS}
+    asc_sign = None
+    for r in rows:
+        if r.get("sign") not in by_sign:
+            continue
+        if r["planet"] == "Ascendant":
+            asc_sign = r["sign"]
+        else:
+            by_sign[r["sign"]].append(_label(r))
+    for sign, (col, row) in _SOUTH_SIGN_CELLS.items():
+        x0, y0 = col * cell, row * cell
+        parts.append(f'<text x="{x0 + 4:.1f}" y="{y0 + 11:.1f}" font-size="8" fill="#a0522d">{sign[:3]}</text>')
+        if sign == asc_sign:
+            parts.append(f'<line x1="{x0}" y1="{y0 + 18}" x2="{x0 + 18}" y2="{y0}" stroke="#7a4b00"/>')
+        lines = (["Asc"] if sign == asc_sign else []) + by_sign[sign]
+        parts.append(_text_block(x0 + cell / 2, y0 + cell / 2 + 4, lines, size=9 if len(lines) > 3 else 10))
+    parts.append(_text_block(s / 2, s / 2, [chart_type], size=14))
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def render_chart_svg(chart_type: str, rows: List[Dict[str, Any]], style: str = "north") -> str:
+    """SVG for normalized chart rows (see `normalize_chart`) in North or South Indian style."""
+    if style == "north":
+        return _render_north(chart_type, rows)
+    if style == "south":
+        return _render_south(chart_type, rows)
+    raise ValueError(f"Unsupported chart style: {style}. Use one of {STYLES}.")
+
+
+def chart_hash(chart_type: str, rows: List[Dict[str, Any]]) -> str:
+    """Content address of a chart: identical placements hash the same whatever payload they came from."""
+    canonical = json.dumps({"chart_type": chart_type, "rows": rows}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def chart_from_tool_output(text: str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+    """(chart_type, rows) from a chart tool's output (compact table or raw JSON), else None."""
+    parsed = parse_chart_table(text)
+    if parsed:
+        return parsed
+    try:
+        data = json.loads(text)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(data, dict) or not data.get("chart_type") or "chart_data" not in data:
+        return None
+    rows = normalize_chart(data["chart_type"], data["chart_data"])
+    return (data["chart_type"], rows) if rows else None
+
+
+class ChartRenderCache:
+    """Content-addressed SVG cache: an in-process LRU in front of an optional Mongo collection.
+
+    Keys are `<chart hash>:<style>:v<RENDERER_VERSION>`, so a chart is drawn at most once
+    per style and renderer version no matter how many sessions or reruns display it.
+    """
+
+    def __init__(self, collection=None, max_items: int = 256):
+        self.collection = collection
+        self.max_items = max_items
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(digest: str, style: str) -> str:
+        return f"{digest}:{style}:v{RENDERER_VERSION}"
+
+    def _remember(self, key: str, svg: str) -> None:
+        with self._lock:
+            self._lru[key] = svg
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_items:
+                self._lru.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            svg = self._lru.get(key)
+            if svg is not None:
+                self._lru.move_to_end(key)
+        record_cache("chart_render", "memory", svg is not None)
+        if svg is not None or self.collection is None:
+            return svg
+        try:
+            doc = self.collection.find_one({"_id": key}, {"svg": 1})
+        except Exception as e:
+            logger.warning(f"Chart render cache read failed: {e}")
+            return None
+        record_cache("chart_render", "mongo", bool(doc))
+        if doc:
+            self._remember(key, doc["svg"])
+            return doc["svg"]
+        return None
+
+    def svg_for(self, chart_type: str, rows: List[Dict[str, Any]], style: str, digest: Optional[str] = None) -> str:
+        """Cached SVG for the chart, rendering and storing it on a miss."""
+        key = self.key(digest or chart_hash(chart_type, rows), style)
+        svg = self.get(key)
+        if svg is not None:
+            return svg
+        svg = render_chart_svg(chart_type, rows, style)
+        self._remember(key, svg)
+        if self.collection is not None:
+            try:
+                self.collection.update_one(
+                    {"_id": key},
+                    {"$setOnInsert": {"svg": svg, "chart_type": chart_type, "style": style,
+                                      "created_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Chart render cache write failed: {e}")
+        return svg
+
+
+_render_cache: Optional[ChartRenderCache] = None
+_render_cache_lock = threading.Lock()
+
+
+def get_render_cache() -> Optional[ChartRenderCache]:
+    """Process-wide render cache backed by Mongo, or None when chart rendering is off."""
+    global _render_cache
+    if CHART_SVG_STYLE not in STYLES:
+        return None
+    with _render_cache_lock:
+        if _render_cache is None:
+            collection = None
+            try:
+                from src.services import get_services
+                collection = get_services().mongo_db()[MONGO_CHART_RENDER_COLLECTION]
+            except Exception as e:
+                logger.warning(f"Chart render cache running without Mongo: {e}")
+            _render_cache = ChartRenderCache(collection)
+        return _render_cache
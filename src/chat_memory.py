@@ -0,0 +1,258 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import (
+    AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage, message_to_dict, messages_from_dict,
+)
+
+from src.config import (
+    MONGO_DB_NAME, MONGO_CHAT_HISTORY_COLLECTION, MONGO_CHAT_SUMMARY_COLLECTION,
+    HISTORY_TOKEN_BUDGET, HISTORY_MAX_MESSAGES, HISTORY_TOOL_OUTPUT_CHARS, HISTORY_SUMMARY_ENABLED,
+    HISTORY_TRIM_RATIO,
+)
+from src.logging_utils import get_logger
+from src.services import get_services
+from src.streaming import block_text
+
+logger = get_logger(__name__)
+
+# Field names match langchain_mongodb.MongoDBChatMessageHistory so existing histories stay readable.
+SESSION_ID_KEY = "SessionId"
+HISTORY_KEY = "History"
+
+SUMMARY_BATCH_MESSAGES = 30
+
+_indexes_ready = False
+_summary_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+_summaries_inflight = set()
+_summaries_lock = threading.Lock()
+
+
+def _ensure_indexes(history_col) -> None:
+    """Compound (SessionId, _id) index serves the tail query without an in-memory sort."""
+    global _indexes_ready
+    if _indexes_ready:
+        return
+    try:
+        history_col.create_index([(SESSION_ID_KEY, ASCENDING), ("_id", DESCENDING)])
+        _indexes_ready = True
+    except Exception as e:
+        logger.warning(f"Failed to ensure chat history indexes: {e}")
+
+
+def approx_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars/token); good enough for budgeting a window."""
+    return len(text) // 4 + 1
+
+
+def compact_message(msg: BaseMessage, tool_chars: int = HISTORY_TOOL_OUTPUT_CHARS) -> BaseMessage:
+    """Truncate bulky tool outputs (chart JSON) before they are replayed to the model."""
+    if isinstance(msg, ToolMessage):
+        text = block_text(msg.content)
+        if len(text) > tool_chars:
+            return msg.model_copy(update={"content": text[:tool_chars] + " …[truncated]"})
+    return msg
+
+
+def select_window(messages: Sequence[BaseMessage], token_budget: int) -> int:
+    """Return the start index of the newest suffix that fits the budget and begins with a user turn."""
+    used = 0
+    start = len(messages)
+    for i in range(len(messages) - 1, -1, -1):
+        used += approx_tokens(block_text(messages[i].content))
+        if used > token_budget and start < len(messages):
+            break
+        start = i
+    # Never open the window on an orphaned AI/tool message
+    while start < len(messages) and not isinstance(messages[start], HumanMessage):
+        start += 1
+    if start == len(messages):
+        # The newest turn alone is over budget: keep it from its question rather than send nothing
+        humans = [i for i, m in enumerate(messages) if isinstance(m, HumanMessage)]
+        if humans:
+            start = humans[-1]
+    return start
+
+
+def _transcript(messages: Sequence[BaseMessage], tool_chars: int = 300) -> str:
+    lines = []
+    for m in messages:
+        text = block_text(m.content).strip()
+        if isinstance(m, HumanMessage):
+            lines.append(f"User: {text}")
+        elif isinstance(m, ToolMessage):
+            lines.append(f"Tool ({m.name or 'tool'}): {text[:tool_chars]}")
+        elif isinstance(m, AIMessage) and text:
+            lines.append(f"Assistant: {text}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(previous_summary: str, transcript: str) -> str:
+    """Fold new conversation lines into the running summary using the configured chat model."""
+    resp = get_services().chat_model().invoke([
+        SystemMessage(
+            "You maintain a running summary of an astrology consultation. Keep the user's questions, "
+            "the charts consulted and the key conclusions. Be concise (under 200 words)."
+        ),
+        HumanMessage(
+            f"Current summary:\n{previous_summary or '(none)'}\n\n"
+            f"New conversation:\n{transcript}\n\nReturn only the updated summary."
+        ),
+    ])
+    return block_text(resp.content).strip()
+
+
+class WindowedChatHistory(BaseChatMessageHistory):
+    """Mongo-backed chat history that replays a bounded window to the model.
+
+    `messages` returns the cached rolling summary (as a leading SystemMessage) plus the
+    newest messages that fit `token_budget`; only that tail is read from Mongo. Messages
+    that fall out of the window are folded into the summary in the background, and stay
+    in the window until the summary covers them. Use `load_all` for full-history rendering.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        client: Optional[MongoClient] = None,
+        summarizer: Optional[Callable[[str, str], str]] = None,
+        token_budget: int = HISTORY_TOKEN_BUDGET,
+        max_messages: int = HISTORY_MAX_MESSAGES,
+        summarize_async: bool = True,
+    ):
+        self.session_id = session_id
+        db = (client or get_services().mongo)[MONGO_DB_NAME]
+        self.collection = db[MONGO_CHAT_HISTORY_COLLECTION]
+        self.summaries = db[MONGO_CHAT_SUMMARY_COLLECTION]
+        self.summarizer = summarizer or (llm_summarizer if HISTORY_SUMMARY_ENABLED else None)
+        self.token_budget = token_budget
+        self.max_messages = max_messages
+        self.summarize_async = summarize_async
+        _ensure_indexes(self.collection)
+
+    # ---- reads ----
+
+    def _query(self, after_id=None, before_id=None) -> dict:
+        q = {SESSION_ID_KEY: self.session_id}
+        bounds = {}
+        if after_id is not None:
+            bounds["$gt"] = after_id
+        if before_id is not None:
+            bounds["$lt"] = before_id
+        if bounds:
+            q["_id"] = bounds
+        return q
+
+    def _load_docs(self, limit: Optional[int] = None, after_id=None, before_id=None, newest: bool = True) -> List[dict]:
+        """Projected read of history docs in chronological order."""
+        cursor = self.collection.find(self._query(after_id, before_id), {HISTORY_KEY: 1})
+        cursor = cursor.sort("_id", DESCENDING if newest else ASCENDING)
+        if limit:
+            cursor = cursor.limit(limit)
+        docs = list(cursor)
+        return list(reversed(docs)) if newest else docs
+
+    @staticmethod
+    def _to_messages(docs: Sequence[dict]) -> List[BaseMessage]:
+        return messages_from_dict([json.loads(d[HISTORY_KEY]) for d in docs])
+
+    def load_summary(self) -> Tuple[str, Optional[object]]:
+        doc = self.summaries.find_one({"_id": self.session_id}, {"summary": 1, "covered_until": 1})
+        if not doc:
+            return "", None
+        return doc.get("summary") or "", doc.get("covered_until")
+
+    def load_tail(self, limit: int, before_id=None) -> List[Tuple[object, BaseMessage]]:
+        """(doc id, message) pairs for the newest `limit` messages, optionally older than `before_id`."""
+        docs = self._load_docs(limit=limit, before_id=before_id)
+        return list(zip([d["_id"] for d in docs], self._to_messages(docs)))
+
+    def load_all(self) -> List[BaseMessage]:
+        return self._to_messages(self._load_docs(newest=False))
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore[override]
+        summary, covered_until = self.load_summary()
+        docs = self._load_docs(limit=self.max_messages, after_id=covered_until)
+        msgs = [compact_message(m) for m in self._to_messages(docs)]
+        start = select_window(msgs, self.token_budget)
+        if start > 0:
+            # Trim well below the budget so the window start (and the cached prompt prefix)
+            # then stays put for several turns instead of sliding every turn
+            trimmed = select_window(msgs, int(self.token_budget * HISTORY_TRIM_RATIO))
+            if trimmed < len(msgs):  # never trim away the newest turn
+                start = max(start, trimmed)
+        if start > 0 or len(docs) >= self.max_messages:
+            # Older messages are outside the window and not yet in the summary
+            boundary = docs[start]["_id"] if start < len(docs) else None
+            if self._schedule_summary(boundary) and not self.summarize_async:
+                summary, _ = self.load_summary()
+            elif self.summarizer is not None and start > 0:
+                # Summary still pending: replay the trimmed messages (bounded by max_messages)
+                # rather than drop them from the model's context until it lands
+                start = next((i for i, m in enumerate(msgs) if isinstance(m, HumanMessage)), start)
+        window = msgs[start:]
+        if summary:
+            return [SystemMessage(content=f"Summary of the earlier conversation:\n{summary}")] + window
+        return window
+
+    # ---- writes ----
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        if not messages:
+            return
+        self.collection.insert_many(
+            [{SESSION_ID_KEY: self.session_id, HISTORY_KEY: json.dumps(message_to_dict(m))} for m in messages]
+        )
+
+    def clear(self) -> None:
+        self.collection.delete_many({SESSION_ID_KEY: self.session_id})
+        self.summaries.delete_one({"_id": self.session_id})
+
+    # ---- summarization ----
+
+    def _schedule_summary(self, boundary_id) -> bool:
+        """Start folding messages older than `boundary_id` into the summary; False if not started."""
+        if self.summarizer is None or boundary_id is None:
+            return False
+        with _summaries_lock:
+            if self.session_id in _summaries_inflight:
+                return False
+            _summaries_inflight.add(self.session_id)
+        if self.summarize_async:
+            _summary_executor.submit(self._summarize_and_release, boundary_id)
+        else:
+            self._summarize_and_release(boundary_id)
+        return True
+
+    def _summarize_and_release(self, boundary_id) -> None:
+        try:
+            self.summarize_until(boundary_id)
+        except Exception as e:
+            logger.warning(f"History summarization failed for session {self.session_id}: {e}")
+        finally:
+            with _summaries_lock:
+                _summaries_inflight.discard(self.session_id)
+
+    def summarize_until(self, boundary_id) -> str:
+        """Incrementally fold every message older than `boundary_id` into the cached summary."""
+        summary, covered_until = self.load_summary()
+        while True:
+            docs = self._load_docs(
+                limit=SUMMARY_BATCH_MESSAGES, after_id=covered_until, before_id=boundary_id, newest=False
+            )
+            if not docs:
+                return summary
+            summary = self.summarizer(summary, _transcript(self._to_messages(docs)))
+            covered_until = docs[-1]["_id"]
+            self.summaries.update_one(
+                {"_id": self.session_id},
+                {"$set": {"summary": summary, "covered_until": covered_until, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+            logger.info(f"Updated rolling summary for session {self.session_id} ({len(docs)} messages folded)")
@@ -10,9 +10,20 @@ LANGCHAIN_TRACING_V2 = os.getenv("LANGCHAIN_TRACING_V2", "true")
 LANGCHAIN_API_KEY = os.getenv("LANGCHAIN_API_KEY")
 LANGCHAIN_PROJECT = os.getenv("LANGCHAIN_PROJECT", "JYOTISH-AI")
 JYOTISH_AI_PROMPT_REPO = os.getenv("JYOTISH_AI_PROMPT_REPO", "your-username/jyotish-ai")
+# System prompt cache: in-process TTL and local snapshot written by scripts/setup_prompts.py
+PROMPT_CACHE_TTL_SECONDS = float(os.getenv("PROMPT_CACHE_TTL_SECONDS", "600"))
+PROMPT_SNAPSHOT_DIR = os.getenv("PROMPT_SNAPSHOT_DIR", "data/prompts")
 
 # LLM Provider: openai | google_genai | bedrock
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai")
+# Tiered routing: a fast model for simple turns, a strong one for multi-chart synthesis.
+# Leave the model names empty to use the per-provider defaults in src/llm_factory.py.
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING_ENABLED", "true").lower() == "true"
+LLM_FAST_MODEL = os.getenv("LLM_FAST_MODEL", "")
+LLM_STRONG_MODEL = os.getenv("LLM_STRONG_MODEL", "")
+# Provider prompt caching (OpenAI prompt_cache_key routing; Gemini 2.5 caches implicitly)
+PROMPT_CACHING_ENABLED = os.getenv("PROMPT_CACHING_ENABLED", "true").lower() == "true"
+PROMPT_CACHE_KEY = os.getenv("PROMPT_CACHE_KEY", "jyotish-ai-agent")
 
 # OpenAI / Google / Bedrock
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -27,18 +38,104 @@ AWS_REGION_NAME = os.getenv("AWS_REGION_NAME", "us-east-1")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "jyotish-ai-index")
 EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "gemini")
+# Bump after re-ingesting BPHS with different content so answer caches keyed on the index roll over
+BPHS_INDEX_VERSION = os.getenv("BPHS_INDEX_VERSION", "1")
+# Local embedding snapshots (vectors + chunk metadata) written by scripts/ingest.py
+EMBEDDING_SNAPSHOT_DIR = os.getenv("EMBEDDING_SNAPSHOT_DIR", "data/snapshots")
 
 # MongoDB
 MONGO_URI = os.getenv("MONGO_URI")
 MONGO_DB_NAME = os.getenv("MONGO_DB_NAME", "jyotish_ai_cache")
 MONGO_CHAT_HISTORY_COLLECTION = os.getenv("MONGO_CHAT_HISTORY_COLLECTION", "chat_history")
+# One Mongo client (connection pool) per process, shared by all sessions via src/services.py
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
 MONGO_API_CACHE_COLLECTION = os.getenv("MONGO_API_CACHE_COLLECTION", "api_cache")
+# Chart cache lifecycle (src/api_cache.py): entries idle this many days expire via a TTL index (0 = never);
+# `scripts/api_cache.py prune` also evicts least recently used entries beyond the bounds (0 = unbounded)
+API_CACHE_IDLE_TTL_DAYS = float(os.getenv("API_CACHE_IDLE_TTL_DAYS", "180"))
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "0"))
+API_CACHE_MAX_MB = float(os.getenv("API_CACHE_MAX_MB", "0"))
+# Cache hits are buffered and written as last_access_at / hits updates in batches
+API_CACHE_ACCESS_FLUSH_SECONDS = float(os.getenv("API_CACHE_ACCESS_FLUSH_SECONDS", "30"))
+API_CACHE_ACCESS_FLUSH_BATCH = int(os.getenv("API_CACHE_ACCESS_FLUSH_BATCH", "200"))
+MONGO_CHAT_SUMMARY_COLLECTION = os.getenv("MONGO_CHAT_SUMMARY_COLLECTION", "chat_summaries")
+MONGO_ANSWER_CACHE_COLLECTION = os.getenv("MONGO_ANSWER_CACHE_COLLECTION", "answer_cache")
+
+# Full-turn answer cache: same profile + question + prompt/model/index versions -> stored answer
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# "first_turn": only serve/store opening questions (later turns depend on the conversation); "always"
+ANSWER_CACHE_SCOPE = os.getenv("ANSWER_CACHE_SCOPE", "first_turn").lower()
+
+# Chat history replayed to the LLM: token-budgeted recent window + rolling summary of older turns
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))
+HISTORY_TOOL_OUTPUT_CHARS = int(os.getenv("HISTORY_TOOL_OUTPUT_CHARS", "1500"))
+HISTORY_SUMMARY_ENABLED = os.getenv("HISTORY_SUMMARY_ENABLED", "true").lower() == "true"
+# When the window overflows, trim to this fraction of the budget to keep the prompt prefix stable longer
+HISTORY_TRIM_RATIO = float(os.getenv("HISTORY_TRIM_RATIO", "0.6"))
+# Chat history shown in the UI: newest messages per page; "Load older messages" adds another page
+HISTORY_RENDER_MESSAGES = int(os.getenv("HISTORY_RENDER_MESSAGES", "30"))
 
 # FreeAstrologyAPI
 FREE_ASTROLOGY_API_KEY = os.getenv("FREE_ASTROLOGY_API_KEY")
 ASTRO_OBSERVATION_POINT = os.getenv("ASTRO_OBSERVATION_POINT", "topocentric")
 ASTRO_AYANAMSHA = os.getenv("ASTRO_AYANAMSHA", "lahiri")
 ASTRO_LANGUAGE = os.getenv("ASTRO_LANGUAGE", "en")
+# Nominatim requires an identifying user agent
+GEOCODER_USER_AGENT = os.getenv("GEOCODER_USER_AGENT", "vedic-astro-bot")
+# "compact" feeds the agent a fixed-schema planet table; "raw" passes the full API JSON
+CHART_OUTPUT_FORMAT = os.getenv("CHART_OUTPUT_FORMAT", "compact").lower()
+# Local SVG chart drawings in chat: "north", "south" or "off"; renders are cached by chart content
+CHART_SVG_STYLE = os.getenv("CHART_SVG_STYLE", "north").lower()
+MONGO_CHART_RENDER_COLLECTION = os.getenv("MONGO_CHART_RENDER_COLLECTION", "chart_renders")
+# Vimshottari dasha tool: days per dasha year (365.25 Julian; some traditions use 360 or 365.2425)
+DASHA_YEAR_DAYS = float(os.getenv("DASHA_YEAR_DAYS", "365.25"))
+# Client-side FreeAstrologyAPI rate limit shared by chats, prefetch and batch jobs (src/rate_limiter.py).
+# Backend "local" (this process), "file" (flock'd state file, one host) or "mongo" (all workers); 0 quota = no daily cap
+ASTRO_API_RATE_LIMIT_ENABLED = os.getenv("ASTRO_API_RATE_LIMIT_ENABLED", "true").lower() == "true"
+ASTRO_API_RATE_BACKEND = os.getenv("ASTRO_API_RATE_BACKEND", "mongo").lower()
+ASTRO_API_RATE_PER_SECOND = float(os.getenv("ASTRO_API_RATE_PER_SECOND", "1"))
+ASTRO_API_BURST = float(os.getenv("ASTRO_API_BURST", "5"))
+ASTRO_API_DAILY_QUOTA = int(os.getenv("ASTRO_API_DAILY_QUOTA", "0"))
+ASTRO_API_RATE_FILE = os.getenv("ASTRO_API_RATE_FILE", "/tmp/jyotish-astro-api-rate.json")
+MONGO_RATE_LIMIT_COLLECTION = os.getenv("MONGO_RATE_LIMIT_COLLECTION", "rate_limits")
+# Per priority class: share of the burst/daily quota left for higher classes, and max seconds queued
+ASTRO_API_PRIORITY_RESERVE = os.getenv("ASTRO_API_PRIORITY_RESERVE", "interactive:0,prefetch:0.25,batch:0.5")
+ASTRO_API_PRIORITY_DEADLINE_SECONDS = os.getenv(
+    "ASTRO_API_PRIORITY_DEADLINE_SECONDS", "interactive:20,prefetch:60,batch:600"
+)
+
+# Agent tool calls: parallel calls per turn are capped and individually time-limited
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", "8"))
+TOOL_CALL_TIMEOUT_SECONDS = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "45"))
+
+# Per-turn tool routing: bind only the chart tools a question needs (plus BPHS search)
+TOOL_ROUTER_ENABLED = os.getenv("TOOL_ROUTER_ENABLED", "true").lower() == "true"
+TOOL_ROUTER_MIN_SCORE = float(os.getenv("TOOL_ROUTER_MIN_SCORE", "0.3"))
+
+# Speculative prefetch of core charts when a session starts
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_CHARTS = [c.strip().upper() for c in os.getenv("PREFETCH_CHARTS", "D1,D9,D10").split(",") if c.strip()]
+PREFETCH_MAX_WORKERS = int(os.getenv("PREFETCH_MAX_WORKERS", "4"))
+PREFETCH_BPHS = os.getenv("PREFETCH_BPHS", "false").lower() == "true"
 
 # Application Settings
-APP_PASSWORD = os.getenv("APP_PASSWORD", "admin123")  # Default password; should be changed
\ No newline at end of file
+APP_PASSWORD = os.getenv("APP_PASSWORD", "admin123")  # Default password; should be changed
+
+# Headless HTTP API (src/api/app.py): sessions shared by all workers via Mongo; bearer token = app password
+MONGO_API_SESSIONS_COLLECTION = os.getenv("MONGO_API_SESSIONS_COLLECTION", "api_sessions")
+API_AUTH_ENABLED = os.getenv("API_AUTH_ENABLED", "true").lower() == "true"
+API_MAX_CONCURRENT_TURNS = int(os.getenv("API_MAX_CONCURRENT_TURNS", "64"))
+# A running turn holds a lease on its session document so no other worker starts one; the
+# expiry only matters when a worker dies mid-turn
+API_TURN_LEASE_SECONDS = float(os.getenv("API_TURN_LEASE_SECONDS", "300"))
+
+# Metrics (Prometheus text format): local endpoint on 127.0.0.1:METRICS_PORT (0 = off) and/or a textfile
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL_SECONDS = float(os.getenv("METRICS_FILE_INTERVAL_SECONDS", "15"))
+
+# In-process turn tracing: nested spans per chat turn, sampled per turn; shown under "assistant notes"
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
@@ -0,0 +1,162 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from src.chart_normalizer import NAKSHATRAS, body_longitude
+from src.config import DASHA_YEAR_DAYS
+
+# Vimshottari order and period lengths (years); nakshatra i is ruled by DASHA_LORDS[i % 9]
+DASHA_LORDS = ("Ketu", "Venus", "Sun", "Moon", "Mars", "Rahu", "Jupiter", "Saturn", "Mercury")
+DASHA_YEARS = np.array([7, 20, 6, 10, 7, 18, 16, 19, 17], dtype=np.float64)
+TOTAL_YEARS = float(DASHA_YEARS.sum())  # 120
+
+_NAKSHATRA_SPAN = 360.0 / 27
+_SEQ = np.arange(9)
+
+
+@dataclass(frozen=True)
+class DashaTimeline:
+    """Maha/antar/pratyantar dashas for one birth, as flat arrays in chronological order.
+
+    Row i of `lords` is the (maha, antar, pratyantar) lord indices into DASHA_LORDS of the
+    i-th pratyantar dasha; `starts`/`ends` are its bounds in years from birth. The first
+    mahadasha began before birth, so the earliest rows have negative offsets.
+    """
+
+    birth: datetime
+    moon_longitude: float
+    year_days: float
+    lords: np.ndarray  # (729, 3) int
+    starts: np.ndarray  # (729,) years from birth
+    ends: np.ndarray
+
+    @property
+    def nakshatra(self) -> str:
+        return NAKSHATRAS[int(self.moon_longitude // _NAKSHATRA_SPAN)]
+
+    @property
+    def balance_years(self) -> float:
+        """Years of the first mahadasha left at birth."""
+        return float(self.ends[80])
+
+    def dates(self, offsets: np.ndarray) -> np.ndarray:
+        seconds = np.round(np.asarray(offsets) * self.year_days * 86400).astype("timedelta64[s]")
+        return np.datetime64(self.birth, "s") + seconds
+
+    def offset(self, when: datetime) -> float:
+        return (when - self.birth).total_seconds() / 86400 / self.year_days
+
+    def level(self, depth: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(lords, starts, ends) at depth 1 (maha, 9 rows), 2 (antar, 81) or 3 (pratyantar, 729)."""
+        size = 9 ** (3 - depth)
+        return (
+            self.lords[::size, :depth],
+            self.starts.reshape(-1, size)[:, 0],
+            self.ends.reshape(-1, size)[:, -1],
+        )
+
+    def active(self, when: datetime) -> Optional[Tuple[str, str, str]]:
+        """(maha, antar, pratyantar) lords running at `when`, or None outside the 120-year cycle."""
+        i = int(np.searchsorted(self.ends, self.offset(when), side="right"))
+        if i >= len(self.ends) or self.starts[i] > self.offset(when):
+            return None
+        return tuple(DASHA_LORDS[j] for j in self.lords[i])
+
+
+@lru_cache(maxsize=512)
+def vimshottari(moon_longitude: float, birth: datetime, year_days: float = DASHA_YEAR_DAYS) -> DashaTimeline:
+    """Vimshottari timeline from the Moon's sidereal longitude at birth.
+
+    All 9 x 9 x 9 periods are built at once: each level starts with its parent's lord and
+    a sub-period lasts parent_years * lord_years / 120. The elapsed share of the birth
+    nakshatra fixes how much of the first mahadasha had already run.
+    """
+    lon = float(moon_longitude) % 360.0
+    nak = int(lon // _NAKSHATRA_SPAN)
+    first = nak % 9
+    elapsed = (lon - nak * _NAKSHATRA_SPAN) / _NAKSHATRA_SPAN
+
+    maha = (first + _SEQ) % 9
+    antar = (maha[:, None] + _SEQ) % 9
+    pratyantar = (antar[:, :, None] + _SEQ) % 9
+    years = (
+        DASHA_YEARS[maha][:, None, None] * DASHA_YEARS[antar][:, :, None] * DASHA_YEARS[pratyantar]
+        / TOTAL_YEARS ** 2
+    ).ravel()
+    ends = np.cumsum(years) - elapsed * DASHA_YEARS[first]
+    lords = np.stack([
+        np.broadcast_to(maha[:, None, None], (9, 9, 9)),
+        np.broadcast_to(antar[:, :, None], (9, 9, 9)),
+        pratyantar,
+    ], axis=-1).reshape(-1, 3)
+    for arr in (lords, ends):
+        arr.setflags(write=False)
+    starts = ends - years
+    starts.setflags(write=False)
+    return DashaTimeline(birth, lon, year_days, lords, starts, ends)
+
+
+def birth_datetime(chart_data: Any) -> Optional[datetime]:
+    """Local birth date and time echoed in a FreeAstrologyAPI payload's `input`."""
+    inp = chart_data.get("input") if isinstance(chart_data, dict) else None
+    if not isinstance(inp, dict):
+        return None
+    try:
+        return datetime(int(inp["year"]), int(inp["month"]), int(inp["date"]),
+                        int(inp.get("hours", 0)), int(inp.get("minutes", 0)), int(inp.get("seconds", 0)))
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def timeline_from_chart(chart_data: Any, birth: Optional[datetime] = None) -> Optional[DashaTimeline]:
+    """Timeline for a D1 payload, or None when it has no Moon longitude or birth time."""
+    moon = body_longitude(chart_data, "Moon")
+    birth = birth_datetime(chart_data) or birth
+    if moon is None or birth is None:
+        return None
+    return vimshottari(round(moon, 6), birth)
+
+
+def _years_months(years: float) -> str:
+    months = int(round(years * 12))
+    return f"{months // 12}y {months % 12}m"
+
+
+def _rows(timeline: DashaTimeline, depth: int, mask: np.ndarray) -> List[str]:
+    lords, starts, ends = timeline.level(depth)
+    start_dates = np.datetime_as_string(timeline.dates(np.maximum(starts[mask], 0.0)), unit="D")
+    end_dates = np.datetime_as_string(timeline.dates(ends[mask]), unit="D")
+    names = ["-".join(DASHA_LORDS[j] for j in row) for row in lords[mask]]
+    return [f"{n} | {s} | {e}" for n, s, e in zip(names, start_dates, end_dates)]
+
+
+def format_dasha_table(timeline: DashaTimeline, start: datetime, years: float = 10.0) -> str:
+    """Mahadashas for life, antardashas in [start, start + years], pratyantars of the antardasha at `start`."""
+    lo, hi = timeline.offset(start), timeline.offset(start + timedelta(days=years * timeline.year_days))
+    first = DASHA_LORDS[int(timeline.lords[0, 0])]
+    lines = [
+        f"Vimshottari dasha | Moon {timeline.moon_longitude:.2f} deg in {timeline.nakshatra} "
+        f"| balance at birth: {first} {_years_months(timeline.balance_years)}",
+        "Mahadasha | start | end",
+    ]
+    _, _, maha_ends = timeline.level(1)
+    lines += _rows(timeline, 1, maha_ends > 0)
+
+    _, antar_starts, antar_ends = timeline.level(2)
+    lines.append(f"Antardasha {start:%Y-%m-%d} to {start + timedelta(days=years * timeline.year_days):%Y-%m-%d} | start | end")
+    lines += _rows(timeline, 2, (antar_ends > max(lo, 0.0)) & (antar_starts < hi))
+
+    _, p_starts, p_ends = timeline.level(3)
+    current = int(np.searchsorted(antar_ends, lo, side="right"))
+    if current < len(antar_ends):
+        in_antar = np.zeros(len(p_ends), dtype=bool)
+        in_antar[current * 9:(current + 1) * 9] = True
+        lines.append("Pratyantardasha | start | end")
+        lines += _rows(timeline, 3, in_antar & (p_ends > 0))
+    running = timeline.active(start)
+    if running:
+        lines.append(f"Running on {start:%Y-%m-%d}: " + " / ".join(running))
+    return "\n".join(lines)
@@ -1,11 +1,15 @@
 import os
-from langchain_openai import OpenAIEmbeddings
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from src.logging_utils import get_logger, log_call
-from langchain_aws import BedrockEmbeddings
+from src.provider_registry import ProviderRegistry
 
 logger = get_logger(__name__)
 
+# Only the configured provider's SDK is imported, on the first get_embedding_model() call
+EMBEDDING_PROVIDERS = ProviderRegistry("embedding")
+EMBEDDING_PROVIDERS.register("openai", "langchain_openai", "OpenAIEmbeddings")
+EMBEDDING_PROVIDERS.register("gemini", "langchain_google_genai", "GoogleGenerativeAIEmbeddings")
+EMBEDDING_PROVIDERS.register("bedrock", "langchain_aws", "BedrockEmbeddings")
+
 def get_embedding_model():
     """
     Returns an embedding model instance based on the EMBEDDING_PROVIDER environment variable.
@@ -15,15 +19,15 @@ def get_embedding_model():
     logger.info(f"Selecting embedding provider: {provider}")
     if provider == "openai":
         api_key = os.getenv("OPENAI_API_KEY")
-        return OpenAIEmbeddings(model="text-embedding-3-small", api_key=api_key)
+        return EMBEDDING_PROVIDERS.load(provider)(model="text-embedding-3-small", api_key=api_key)
     elif provider == "gemini":
-        return GoogleGenerativeAIEmbeddings(model="models/text-embedding-004")
+        return EMBEDDING_PROVIDERS.load(provider)(model="models/text-embedding-004")
     elif provider == "bedrock":
         region = os.getenv("AWS_REGION_NAME", "us-east-1")
         profile = os.getenv("AWS_PROFILE")
         logger.info(f"Using BedrockEmbeddings model=titan-embed-text-v2 region={region} profile={profile or 'env/default'}")
         # amazon.titan-embed-text-v2:0 outputs 1024-d vectors
-        return BedrockEmbeddings(
+        return EMBEDDING_PROVIDERS.load(provider)(
             model_id="amazon.titan-embed-text-v2:0",
             region_name=region,
             credentials_profile_name=profile if profile else None,
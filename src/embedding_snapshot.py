@@ -0,0 +1,184 @@
+import os
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.config import EMBEDDING_SNAPSHOT_DIR
+from src.logging_utils import get_logger, log_call
+
+logger = get_logger(__name__)
+
+# Bump when the on-disk layout changes; loaders refuse newer formats.
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.jsonl"
+
+
+def snapshot_name(namespace: str, provider: str) -> str:
+    """Default snapshot directory name: <namespace>-<provider>-<UTC timestamp>."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+    return f"{namespace}-{provider}-{stamp}"
+
+
+class SnapshotWriter:
+    """Stream chunk ids, texts, metadata and vectors into a versioned snapshot directory.
+
+    Vectors are written straight into a memory-mapped float32 `.npy` so the whole
+    corpus never has to sit in RAM. Records are appended to a JSONL table, one row per vector.
+    """
+
+    def __init__(self, path: str, capacity: int, dimension: int, provider: str, namespace: str):
+        self.path = path
+        self.capacity = capacity
+        self.dimension = dimension
+        self.provider = provider
+        self.namespace = namespace
+        self.count = 0
+        os.makedirs(path, exist_ok=True)
+        self._vectors = np.lib.format.open_memmap(
+            os.path.join(path, VECTORS_FILE), mode="w+", dtype=np.float32, shape=(capacity, dimension)
+        )
+        self._records = open(os.path.join(path, RECORDS_FILE), "w", encoding="utf-8")
+
+    def append(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[dict], vectors: Sequence[Sequence[float]]):
+        n = len(ids)
+        if not (n == len(texts) == len(metadatas) == len(vectors)):
+            raise ValueError("ids, texts, metadatas and vectors must have the same length")
+        if self.count + n > self.capacity:
+            raise ValueError(f"Snapshot capacity exceeded ({self.count + n} > {self.capacity})")
+        arr = np.asarray(vectors, dtype=np.float32)
+        if arr.ndim != 2 or arr.shape[1] != self.dimension:
+            raise ValueError(f"Expected vectors of dimension {self.dimension}, got shape {arr.shape}")
+        self._vectors[self.count : self.count + n] = arr
+        for _id, text, meta in zip(ids, texts, metadatas):
+            self._records.write(json.dumps({"id": _id, "text": text, "metadata": meta}, ensure_ascii=False) + "\n")
+        self.count += n
+
+    @log_call
+    def close(self) -> str:
+        """Flush vectors/records and write the manifest. Returns the snapshot path."""
+        self._records.close()
+        self._vectors.flush()
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        if self.count < self.capacity:
+            # Some batches were skipped; shrink the array so rows line up with records.
+            logger.warning(f"Snapshot holds {self.count}/{self.capacity} rows; compacting vectors file")
+            trimmed = np.array(self._vectors[: self.count])
+            del self._vectors
+            np.save(vectors_path, trimmed)
+        else:
+            del self._vectors
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "embedding_provider": self.provider,
+            "dimension": self.dimension,
+            "count": self.count,
+            "namespace": self.namespace,
+            "dtype": "float32",
+        }
+        with open(os.path.join(self.path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        logger.info(f"Wrote embedding snapshot with {self.count} vectors to {self.path}")
+        return self.path
+
+
+class Snapshot:
+    """A loaded snapshot: manifest, memory-mapped vectors and the records table."""
+
+    def __init__(self, path: str, manifest: Dict[str, Any], vectors: np.ndarray, records: List[dict]):
+        self.path = path
+        self.manifest = manifest
+        self.vectors = vectors
+        self.records = records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def batches(self, batch_size: int) -> Iterator[Tuple[List[str], List[str], List[dict], np.ndarray]]:
+        for i in range(0, len(self.records), batch_size):
+            rows = self.records[i : i + batch_size]
+            yield (
+                [r["id"] for r in rows],
+                [r["text"] for r in rows],
+                [r.get("metadata") or {} for r in rows],
+                self.vectors[i : i + len(rows)],
+            )
+
+
+@log_call
+def load_snapshot(path: str, expected_provider: Optional[str] = None, expected_dimension: Optional[int] = None) -> Snapshot:
+    """Open a snapshot directory; vectors are memory-mapped read-only.
+
+    Raises ValueError when the format is unknown or when the snapshot was produced by a
+    different embedding provider/dimension than the caller expects (vectors would be useless).
+    """
+    with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    version = manifest.get("format_version")
+    if version is None or version > SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot format version: {version}")
+    if expected_provider and manifest.get("embedding_provider") != expected_provider:
+        raise ValueError(
+            f"Snapshot was embedded with '{manifest.get('embedding_provider')}', expected '{expected_provider}'"
+        )
+    if expected_dimension and manifest.get("dimension") != expected_dimension:
+        raise ValueError(f"Snapshot dimension {manifest.get('dimension')} does not match expected {expected_dimension}")
+
+    vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+    with open(os.path.join(path, RECORDS_FILE), "r", encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    if vectors.shape[0] != len(records):
+        raise ValueError(f"Snapshot is inconsistent: {vectors.shape[0]} vectors vs {len(records)} records")
+    logger.info(f"Loaded snapshot {path} ({len(records)} vectors, dim={vectors.shape[1]})")
+    return Snapshot(path, manifest, vectors, records)
+
+
+def latest_snapshot(namespace: str, provider: str, root: str = EMBEDDING_SNAPSHOT_DIR) -> Optional[str]:
+    """Return the newest snapshot directory for a namespace/provider pair, if any."""
+    if not os.path.isdir(root):
+        return None
+    prefix = f"{namespace}-{provider}-"
+    names = sorted(
+        n for n in os.listdir(root)
+        if n.startswith(prefix) and os.path.isfile(os.path.join(root, n, MANIFEST_FILE))
+    )
+    return os.path.join(root, names[-1]) if names else None
+
+
+def upsert_vectors(target, ids, texts, metadatas, vectors, namespace: Optional[str] = None, text_key: str = "text"):
+    """Upsert pre-computed vectors into a vector backend without calling the embedding model.
+
+    Accepts a Pinecone `Index`, a `PineconeVectorStore` (uses its `.index`), or any LangChain
+    vector store exposing `add_embeddings`.
+    """
+    index = getattr(target, "index", None) if not hasattr(target, "upsert") else target
+    if index is not None and hasattr(index, "upsert"):
+        rows = np.asarray(vectors, dtype=np.float32).tolist()
+        tuples = [
+            (_id, vec, {**(meta or {}), text_key: text})
+            for _id, text, meta, vec in zip(ids, texts, metadatas, rows)
+        ]
+        index.upsert(vectors=tuples, namespace=namespace)
+        return list(ids)
+    if hasattr(target, "add_embeddings"):
+        rows = np.asarray(vectors, dtype=np.float32).tolist()
+        pairs = list(zip(texts, rows))
+        return target.add_embeddings(pairs, metadatas=list(metadatas), ids=list(ids))
+    raise TypeError(f"Unsupported vector backend: {type(target).__name__}")
+
+
+@log_call
+def upsert_snapshot(snapshot: Snapshot, target, namespace: Optional[str] = None, batch_size: int = 100) -> int:
+    """Bulk-upsert every vector in a snapshot into `target`. Returns the number of vectors written."""
+    ns = namespace or snapshot.manifest.get("namespace")
+    written = 0
+    for ids, texts, metadatas, vectors in snapshot.batches(batch_size):
+        upsert_vectors(target, ids, texts, metadatas, vectors, namespace=ns)
+        written += len(ids)
+        logger.info(f"Snapshot upsert progress: {written}/{len(snapshot)}")
+    return written
@@ -1,52 +1,147 @@
-from src.config import LLM_PROVIDER, OPENAI_API_KEY, GOOGLE_API_KEY, AWS_REGION_NAME
-from langchain_openai import ChatOpenAI
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_aws import ChatBedrock
+from typing import Optional
+
+from src.config import (
+    LLM_PROVIDER, OPENAI_API_KEY, GOOGLE_API_KEY, AWS_REGION_NAME,
+    LLM_FAST_MODEL, LLM_STRONG_MODEL, MODEL_ROUTING_ENABLED, PROMPT_CACHING_ENABLED, PROMPT_CACHE_KEY,
+)
 from src.logging_utils import get_logger, log_call
+from src.provider_registry import ProviderRegistry
 
 logger = get_logger(__name__)
 
+# Provider SDKs are imported on first use of the selected provider only (see ProviderRegistry)
+CHAT_PROVIDERS = ProviderRegistry("LLM")
+CHAT_PROVIDERS.register("openai", "langchain_openai", "ChatOpenAI")
+CHAT_PROVIDERS.register("google_genai", "langchain_google_genai", "ChatGoogleGenerativeAI", aliases=("gemini",))
+CHAT_PROVIDERS.register("bedrock", "langchain_aws", "ChatBedrock")
+
+# Models served per provider and tier: "fast" for simple turns, "strong" for multi-chart synthesis
+CHAT_MODEL_TIERS = {
+    "openai": {"fast": "gpt-4.1-nano", "strong": "gpt-4.1-mini"},
+    "google_genai": {"fast": "gemini-2.5-flash", "strong": "gemini-2.5-pro"},
+    "gemini": {"fast": "gemini-2.5-flash", "strong": "gemini-2.5-pro"},
+    "bedrock": {"fast": "amazon.nova-lite-v1:0", "strong": "amazon.nova-pro-v1:0"},
+}
+TIERS = ("fast", "strong")
+
+# USD per 1M tokens: (input, cached input, output), from the providers' public price lists.
+# Used for cost estimates only (batch reports); update when prices change.
+MODEL_PRICES_PER_MTOK = {
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gemini-2.5-flash": (0.30, 0.075, 2.50),
+    "gemini-2.5-pro": (1.25, 0.31, 10.00),
+    "amazon.nova-lite-v1:0": (0.06, 0.015, 0.24),
+    "amazon.nova-pro-v1:0": (0.80, 0.20, 3.20),
+}
+
+
+def chat_model_name(tier: str = "fast") -> str:
+    """Model name for a tier of the configured provider (LLM_FAST_MODEL / LLM_STRONG_MODEL override)."""
+    override = {"fast": LLM_FAST_MODEL, "strong": LLM_STRONG_MODEL}.get(tier)
+    if override:
+        return override
+    return CHAT_MODEL_TIERS.get(LLM_PROVIDER.lower(), {}).get(tier, "unknown")
+
+
+def chat_model_id() -> str:
+    """'<provider>:<model>[+<strong model>]' for the configured LLM(s), without constructing a client."""
+    provider = LLM_PROVIDER.lower()
+    models = chat_model_name("fast")
+    if MODEL_ROUTING_ENABLED:
+        models += f"+{chat_model_name('strong')}"
+    return f"{provider}:{models}"
+
+
+def tool_narrowing() -> str:
+    """How the tool router may narrow a turn's tools without breaking the provider's prompt cache.
+
+    Tool schemas lead the cached prefix, so with caching on they must stay bound in full:
+    "allowed_tools" restricts calls through `tool_choice` instead (OpenAI), "none" leaves
+    the choice to the model (Gemini can only restrict function names when forcing a call).
+    "drop" unbinds unrouted schemas, for Bedrock Nova (never cached) or caching disabled.
+    """
+    provider = LLM_PROVIDER.lower()
+    if not PROMPT_CACHING_ENABLED or provider == "bedrock":
+        return "drop"
+    return "allowed_tools" if provider == "openai" else "none"
+
+
+def allowed_tools_choice(tool_names) -> dict:
+    """OpenAI `tool_choice` letting the model call only `tool_names` while every tool stays bound."""
+    return {
+        "type": "allowed_tools",
+        "allowed_tools": {
+            "mode": "auto",
+            "tools": [{"type": "function", "function": {"name": name}} for name in tool_names],
+        },
+    }
+
+
+def estimate_cost(usage_by_tier: dict) -> Optional[float]:
+    """USD cost of {tier: {input_tokens, output_tokens, cache_read_tokens}}; None if a model has no price."""
+    total = 0.0
+    for tier, usage in usage_by_tier.items():
+        prices = MODEL_PRICES_PER_MTOK.get(chat_model_name(tier))
+        if prices is None:
+            return None
+        price_in, price_cached, price_out = prices
+        cached = usage.get("cache_read_tokens", 0)
+        total += (
+            (usage.get("input_tokens", 0) - cached) * price_in + cached * price_cached
+            + usage.get("output_tokens", 0) * price_out
+        ) / 1_000_000
+    return total
+
 
 @log_call
-def get_chat_model():
+def get_chat_model(tier: str = "fast"):
     """
-    Factory Method to return a ChatModel based on LLM_PROVIDER.
-    Supports: OpenAI GPT-4.1-nano, Google Gemini 3 Pro Preview, AWS Bedrock Nova Lite.
+    Factory Method to return a ChatModel based on LLM_PROVIDER and tier.
+    Supports: OpenAI GPT-4.1 nano/mini, Google Gemini 2.5 Flash/Pro, AWS Bedrock Nova Lite/Pro.
+
+    Prompt caching: OpenAI caches prompt prefixes automatically; a fixed `prompt_cache_key`
+    per tier routes our requests to the same cache. Gemini 2.5 caches implicitly. ChatBedrock
+    only applies cache markers for Anthropic models, so Nova requests are not cached.
     """
+    if tier not in TIERS:
+        raise ValueError(f"Unsupported model tier: {tier}. Use one of {TIERS}.")
     provider = LLM_PROVIDER.lower()
-    logger.info(f"Selecting chat model provider: {provider}")
+    name = chat_model_name(tier)
+    logger.info(f"Selecting chat model provider: {provider} ({tier}: {name})")
 
     if provider == "openai":
-        model = ChatOpenAI(model="gpt-4.1-nano", temperature=0, api_key=OPENAI_API_KEY)
+        model_kwargs = {"prompt_cache_key": f"{PROMPT_CACHE_KEY}:{tier}"} if PROMPT_CACHING_ENABLED else {}
+        model = CHAT_PROVIDERS.load(provider)(model=name, temperature=0, api_key=OPENAI_API_KEY, model_kwargs=model_kwargs)
         return model.with_config(
             {
-                "run_name": "LLM • OpenAI gpt-4.1-nano",
-                "tags": ["llm", "provider:openai"],
-                "metadata": {"model": "gpt-4.1-nano", "temperature": 0},
+                "run_name": f"LLM • OpenAI {name}",
+                "tags": ["llm", "provider:openai", f"tier:{tier}"],
+                "metadata": {"model": name, "temperature": 0, "tier": tier},
             }
         )
 
     if provider in ("google_genai", "gemini"):
-        model = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=GOOGLE_API_KEY)
+        model = CHAT_PROVIDERS.load(provider)(model=name, google_api_key=GOOGLE_API_KEY)
         return model.with_config(
             {
-                "run_name": "LLM • Google Gemini 2.5 Flash",
-                "tags": ["llm", "provider:google_genai"],
-                "metadata": {"model": "gemini-2.5-flash"},
+                "run_name": f"LLM • Google {name}",
+                "tags": ["llm", "provider:google_genai", f"tier:{tier}"],
+                "metadata": {"model": name, "tier": tier},
             }
         )
 
     if provider == "bedrock":
-        model = ChatBedrock(
-            model_id="amazon.nova-lite-v1:0",
+        model = CHAT_PROVIDERS.load(provider)(
+            model_id=name,
             region_name=AWS_REGION_NAME,
             model_kwargs={"temperature": 0},
         )
         return model.with_config(
             {
-                "run_name": "LLM • Bedrock amazon.nova-lite-v1",
-                "tags": ["llm", "provider:bedrock"],
-                "metadata": {"model": "amazon.nova-lite-v1:0", "temperature": 0},
+                "run_name": f"LLM • Bedrock {name}",
+                "tags": ["llm", "provider:bedrock", f"tier:{tier}"],
+                "metadata": {"model": name, "temperature": 0, "tier": tier},
             }
         )
 
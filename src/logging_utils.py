@@ -3,6 +3,9 @@ import functools
 import time
 from typing import Any
 
+from src.metrics import FUNCTION_SECONDS, OPERATION_SECONDS, operation_label
+from src.tracing import span
+
 
 _LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s %(filename)s:%(lineno)d %(funcName)s - %(message)s"
 
@@ -45,28 +48,33 @@ def _safe_repr(obj: Any, max_len: int = 200) -> str:
 
 def log_call(func):
     """Decorator that logs before/after a function call and on exceptions.
-    Includes function name, module, and execution duration.
+    Includes function name, module, and execution duration; the duration is also
+    recorded in the `jyotish_function_duration_seconds` histogram and, inside a
+    sampled chat turn, as a child span of the turn's trace.
+    Messages are %-formatted lazily, and arguments are only repr'd when DEBUG is on.
     """
+    name = func.__name__
+    metric_name = f"{func.__module__}.{name}"
+    logger = logging.getLogger(func.__module__)
+
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = logging.getLogger(func.__module__)
-        logger.info(
-            f"START {func.__name__}",
-        )
-        logger.debug(
-            f"ARGS {func.__name__}",
-            extra={"args": _safe_repr(args), "kwargs": _safe_repr(kwargs)},
-        )
+        logger.info("START %s", name)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("ARGS %s args=%s kwargs=%s", name, _safe_repr(args), _safe_repr(kwargs))
         start = time.perf_counter()
-        try:
-            result = func(*args, **kwargs)
-            duration = time.perf_counter() - start
-            logger.info(f"END {func.__name__} ({duration:.3f}s)")
-            return result
-        except Exception as e:
-            duration = time.perf_counter() - start
-            logger.exception(f"ERROR {func.__name__} after {duration:.3f}s: {e}")
-            raise
+        with span(metric_name):
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                duration = time.perf_counter() - start
+                logger.exception("ERROR %s after %.3fs: %s", name, duration, e)
+                FUNCTION_SECONDS.observe(duration, function=metric_name, status="error")
+                raise
+        duration = time.perf_counter() - start
+        logger.info("END %s (%.3fs)", name, duration)
+        FUNCTION_SECONDS.observe(duration, function=metric_name, status="ok")
+        return result
     return wrapper
 
 
@@ -76,17 +84,23 @@ def log_operation(logger: logging.Logger, name: str):
         with log_operation(logger, "load_pdf"):
             ...
     """
+    label = operation_label(name)
+
     class _Op:
         def __enter__(self):
             self._start = time.perf_counter()
-            logger.info(f"BEGIN {name}")
+            self._span = span(label)
+            self._span.__enter__()
+            logger.info("BEGIN %s", name)
 
         def __exit__(self, exc_type, exc, tb):
             duration = time.perf_counter() - self._start
+            self._span.__exit__(exc_type, exc, tb)
             if exc is None:
-                logger.info(f"FINISH {name} ({duration:.3f}s)")
+                logger.info("FINISH %s (%.3fs)", name, duration)
             else:
-                logger.exception(f"FAIL {name} ({duration:.3f}s): {exc}")
+                logger.exception("FAIL %s (%.3fs): %s", name, duration, exc)
+            OPERATION_SECONDS.observe(duration, operation=label, status="ok" if exc is None else "error")
             # Do not suppress exceptions
             return False
 
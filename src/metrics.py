@@ -0,0 +1,315 @@
+import bisect
+import logging
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Plain logging here: src.logging_utils feeds this module, so it must not import it back
+logger = logging.getLogger(__name__)
+
+# Seconds; covers in-process cache hits (sub-ms) through slow LLM and chart API calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_LabelKey = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: Sequence[Tuple[str, str]] = ()) -> str:
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> _LabelKey:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type_name}", *self.samples()]
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_fmt_labels(self.labelnames, key)} {_fmt_value(v)}"
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[_LabelKey, list] = {}  # key -> [bucket counts..., count, sum]
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                series[idx] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def time(self, **labels):
+        """Context manager observing the block's wall time."""
+        hist = self
+
+        class _Timer:
+            def __enter__(self):
+                self._start = time.perf_counter()
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                hist.observe(time.perf_counter() - self._start, **labels)
+                return False
+
+        return _Timer()
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return series[-2] if series else 0
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Bucket upper bound below which a fraction `q` of observations fall (Prometheus-style estimate)."""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            if not series or not series[-2]:
+                return None
+            counts, total = series[:-2], series[-2]
+        running = 0
+        for bound, c in zip(self.buckets, counts):
+            running += c
+            if running >= q * total:
+                return bound
+        return float("inf")
+
+    def samples(self):
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            running = 0
+            for bound, c in zip(self.buckets, series[:-2]):
+                running += c
+                yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', _fmt_value(bound))])} {running}"
+            yield f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', '+Inf')])} {series[-2]}"
+            yield f"{self.name}_count{_fmt_labels(self.labelnames, key)} {series[-2]}"
+            yield f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {_fmt_value(series[-1])}"
+
+
+class MetricsRegistry:
+    """Named counters, gauges and histograms plus collectors sampled at export time."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, help_text: str, labelnames: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help_text, labelnames)
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def add_collector(self, collect: Callable[[], None]) -> None:
+        """`collect()` runs before every export, e.g. to copy running stats into gauges."""
+        with self._lock:
+            self._collectors.append(collect)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)."""
+        with self._lock:
+            collectors = list(self._collectors)
+        for collect in collectors:
+            try:
+                collect()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        with self._lock:
+            metrics = [self._metrics[n] for n in sorted(self._metrics)]
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# -------------------- Hot-path metrics --------------------
+
+FUNCTION_SECONDS = REGISTRY.histogram(
+    "jyotish_function_duration_seconds", "Duration of functions wrapped with log_call.", ["function", "status"]
+)
+OPERATION_SECONDS = REGISTRY.histogram(
+    "jyotish_operation_duration_seconds", "Duration of log_operation blocks.", ["operation", "status"]
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "jyotish_cache_requests_total", "Cache lookups by cache, tier and result.", ["cache", "tier", "result"]
+)
+CHART_FETCH_SECONDS = REGISTRY.histogram(
+    "jyotish_chart_fetch_seconds", "Chart resolution time (geocode + cache/API) by chart type and status.",
+    ["chart_type", "status"],
+)
+CHART_API_SECONDS = REGISTRY.histogram(
+    "jyotish_chart_api_seconds", "FreeAstrologyAPI request time by chart type and status.", ["chart_type", "status"]
+)
+GEOCODE_SECONDS = REGISTRY.histogram(
+    "jyotish_geocode_seconds", "City geocode + timezone lookup time by source.", ["source"]
+)
+RETRIEVAL_SECONDS = REGISTRY.histogram(
+    "jyotish_bphs_retrieval_seconds", "BPHS search time (query embedding + Pinecone) by embedding provider.",
+    ["provider", "status"],
+)
+LLM_SECONDS = REGISTRY.histogram(
+    "jyotish_llm_call_seconds", "Chat model call time by provider, tier and status.", ["provider", "tier", "status"]
+)
+LLM_TOKENS = REGISTRY.counter(
+    "jyotish_llm_tokens_total", "Chat model tokens by provider, tier and kind.", ["provider", "tier", "kind"]
+)
+
+_NUMBERED = re.compile(r"_\d+$")
+
+
+def operation_label(name: str) -> str:
+    """Collapse per-iteration names ('embed_batch_12') so labels stay low-cardinality."""
+    return _NUMBERED.sub("", name)
+
+
+def record_cache(cache: str, tier: str, hit: bool) -> None:
+    CACHE_REQUESTS.inc(cache=cache, tier=tier, result="hit" if hit else "miss")
+
+
+def export_stat_counters(prefix: str, stats) -> None:
+    """Expose a `StatCounters` as gauges named `<prefix>_<counter>` at every export."""
+
+    def collect():
+        for name, value in stats.snapshot().items():
+            REGISTRY.gauge(f"{prefix}_{name}", f"Running total of {name}.").set(value)
+
+    REGISTRY.add_collector(collect)
+
+
+# -------------------- Export --------------------
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):  # keep scrapes out of the app log
+        pass
+
+
+_exporter_lock = threading.Lock()
+_exporter_started = False
+
+
+def write_metrics_file(path: str) -> None:
+    """Atomically write the current exposition to `path` (node_exporter textfile style)."""
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(tmp, path)
+
+
+def start_metrics_exporter(port: int = 0, file_path: str = "", interval_seconds: float = 15.0) -> None:
+    """Serve /metrics on localhost:`port` and/or rewrite `file_path` every interval. Idempotent."""
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started or not (port or file_path):
+            return
+        _exporter_started = True
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"Metrics exposed at http://127.0.0.1:{port}/metrics")
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on port {port}: {e}")
+    if file_path:
+        def loop():
+            while True:
+                try:
+                    write_metrics_file(file_path)
+                except Exception as e:
+                    logger.warning(f"Writing metrics file {file_path} failed: {e}")
+                time.sleep(interval_seconds)
+
+        threading.Thread(target=loop, name="metrics-file", daemon=True).start()
+        logger.info(f"Metrics written to {file_path} every {interval_seconds:.0f}s")
@@ -0,0 +1,180 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from src.config import LLM_PROVIDER, MODEL_ROUTING_ENABLED
+from src.logging_utils import get_logger
+from src.metrics import LLM_SECONDS, LLM_TOKENS, export_stat_counters
+from src.tracing import current_span
+from src.tool_router import QueryRouter, StatCounters, chart_code_for_tool, question_text
+
+logger = get_logger(__name__)
+
+_SYNTHESIS = re.compile(
+    r"\b(compar\w*|overall|all (of )?my charts|synthes\w*|combin\w*|in detail|detailed|full reading|complete reading)\b"
+)
+
+
+# Token usage per tier as reported by the provider; cache_read_tokens are prompt tokens served from
+# the provider's prompt cache.
+MODEL_USAGE_STATS = StatCounters()
+export_stat_counters("jyotish_model_usage", MODEL_USAGE_STATS)
+
+
+_usage_scope: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("jyotish_usage_scope", default=None)
+
+
+@contextmanager
+def track_usage():
+    """Collect {tier: {calls, input_tokens, output_tokens, cache_read_tokens}} for model calls in the block.
+
+    Scopes follow the context (threads started with copied context, async tasks), so
+    concurrent turns each see only their own calls, e.g. one batch report at a time.
+    """
+    totals: Dict[str, Dict[str, int]] = {}
+    token = _usage_scope.set(totals)
+    try:
+        yield totals
+    finally:
+        _usage_scope.reset(token)
+
+
+def usage_from_response(response) -> Dict[str, int]:
+    """Input/output/cache-read token counts summed over the AI messages of a model response."""
+    totals = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0}
+    messages = getattr(response, "result", None)
+    if messages is None:
+        messages = [response]  # a middleware may short-circuit with a bare AIMessage
+    for msg in messages:
+        usage = getattr(msg, "usage_metadata", None) or {}
+        totals["input_tokens"] += usage.get("input_tokens", 0) or 0
+        totals["output_tokens"] += usage.get("output_tokens", 0) or 0
+        totals["cache_read_tokens"] += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+    return totals
+
+
+def _charts_this_turn(messages: Sequence) -> set:
+    charts = set()
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            break
+        if isinstance(m, ToolMessage):
+            code = chart_code_for_tool(m.name or "")
+            if code:
+                charts.add(code)
+    return charts
+
+
+def classify_turn(messages: Sequence, router: QueryRouter) -> Tuple[str, str]:
+    """(tier, reason) for the next model call of a turn.
+
+    Multi-chart synthesis (two or more chart results this turn, a question spanning
+    several vargas, or an explicit ask for a combined/detailed reading) goes to the
+    strong tier; greetings, clarifications and single-chart lookups stay on the fast tier.
+    """
+    charts = _charts_this_turn(messages)
+    if len(charts) >= 2:
+        return "strong", f"synthesizing {len(charts)} charts"
+    question = question_text(messages).lower()
+    if _SYNTHESIS.search(question):
+        return "strong", "synthesis requested"
+    decision = router.route(question)
+    if not decision.fallback and len(decision.charts) >= 2:
+        return "strong", f"question spans {', '.join(decision.charts)}"
+    if decision.fallback:
+        return "fast", "greeting or clarification"
+    return "fast", "single-chart lookup"
+
+
+class ModelTierMiddleware(AgentMiddleware):
+    """Pick the fast or strong chat model per model call; log the decision, latency and token usage.
+
+    The graph is compiled with the fast model; the strong model is built lazily through
+    `model_factory(tier)` the first time a call escalates.
+    """
+
+    def __init__(
+        self,
+        router: QueryRouter,
+        model_factory: Optional[Callable[[str], object]] = None,
+        enabled: bool = MODEL_ROUTING_ENABLED,
+    ):
+        super().__init__()
+        self.router = router
+        self.enabled = enabled
+        self._factory = model_factory
+        self._models: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _model(self, tier: str):
+        with self._lock:
+            if tier not in self._models:
+                factory = self._factory
+                if factory is None:
+                    from src.services import get_services
+                    factory = get_services().chat_model
+                self._models[tier] = factory(tier)
+            return self._models[tier]
+
+    def _select(self, request: ModelRequest) -> Tuple[ModelRequest, str, str]:
+        tier, reason = classify_turn(request.messages, self.router)
+        if tier != "fast":
+            request = request.override(model=self._model(tier))
+        return request, tier, reason
+
+    def _log(self, tier: str, reason: str, started: float, response=None) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        provider = LLM_PROVIDER.lower()
+        LLM_SECONDS.observe(ms / 1000, provider=provider, tier=tier, status="error" if response is None else "ok")
+        current_span().set(tier=tier)
+        if response is None:
+            logger.info(f"Model tier={tier} ({reason}) latency_ms={ms:.0f} status=failed")
+            return
+        usage = usage_from_response(response)
+        current_span().set(input_tokens=usage["input_tokens"], output_tokens=usage["output_tokens"])
+        MODEL_USAGE_STATS.add(**{f"{tier}_calls": 1, **{f"{tier}_{k}": v for k, v in usage.items()}})
+        scope = _usage_scope.get()
+        if scope is not None:
+            tier_totals = scope.setdefault(tier, {"calls": 0, **{k: 0 for k in usage}})
+            tier_totals["calls"] += 1
+            for k, v in usage.items():
+                tier_totals[k] += v
+        for kind, count in usage.items():
+            LLM_TOKENS.inc(count, provider=provider, tier=tier, kind=kind.removesuffix("_tokens"))
+        logger.info(
+            f"Model tier={tier} ({reason}) latency_ms={ms:.0f} input_tokens={usage['input_tokens']} "
+            f"cache_read_tokens={usage['cache_read_tokens']} output_tokens={usage['output_tokens']}"
+        )
+
+    def _select_or_default(self, request: ModelRequest) -> Tuple[ModelRequest, str, str]:
+        if not self.enabled:
+            return request, "fast", "routing disabled"
+        return self._select(request)
+
+    def wrap_model_call(self, request, handler):
+        request, tier, reason = self._select_or_default(request)
+        started = time.perf_counter()
+        try:
+            response = handler(request)
+        except Exception:
+            self._log(tier, reason, started)
+            raise
+        self._log(tier, reason, started, response)
+        return response
+
+    async def awrap_model_call(self, request, handler):
+        request, tier, reason = self._select_or_default(request)
+        started = time.perf_counter()
+        try:
+            response = await handler(request)
+        except Exception:
+            self._log(tier, reason, started)
+            raise
+        self._log(tier, reason, started, response)
+        return response
@@ -0,0 +1,139 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.config import PREFETCH_ENABLED, PREFETCH_CHARTS, PREFETCH_MAX_WORKERS, PREFETCH_BPHS
+from src.logging_utils import get_logger
+from src.chart_normalizer import ascendant_sign
+from src.rate_limiter import api_priority
+from src.tools import resolve_chart, retrieve_bphs
+from src.utils import get_lat_lon_offset
+
+logger = get_logger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_handles: Dict[str, "PrefetchHandle"] = {}
+_handles_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="prefetch")
+        return _executor
+
+
+class PrefetchHandle:
+    """Tracks the background jobs started for one session so they can be cancelled.
+
+    Jobs only warm caches, so their results are dropped; once the last job finishes the
+    handle removes itself from the session registry instead of waiting for `cancel_prefetch`.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.futures: List[Future] = []
+        self._pending = 0
+        # Re-entrant: a future cancelled or already done runs its callback in the submitting thread
+        self._lock = threading.RLock()
+
+    def submit(self, fn, *args) -> Optional[Future]:
+        with self._lock:
+            if self.cancelled.is_set():
+                return None
+            fut = _get_executor().submit(self._guarded, fn, *args)
+            self.futures.append(fut)
+            self._pending += 1
+            fut.add_done_callback(self._job_done)
+            return fut
+
+    def _guarded(self, fn, *args) -> None:
+        if not self.cancelled.is_set():
+            fn(*args)
+
+    def _job_done(self, _fut: Future) -> None:
+        with self._lock:
+            self._pending -= 1
+            if self._pending:
+                return
+            self.finished.set()
+        _forget(self)
+
+    def cancel(self) -> None:
+        """Stop scheduling new work and drop jobs that have not started. In-flight HTTP calls finish."""
+        with self._lock:
+            self.cancelled.set()
+            for fut in self.futures:
+                fut.cancel()
+
+    def done(self) -> bool:
+        return all(f.done() for f in self.futures)
+
+
+def _forget(handle: PrefetchHandle) -> None:
+    with _handles_lock:
+        if _handles.get(handle.session_id) is handle:
+            del _handles[handle.session_id]
+
+
+def lagna_query(sign: str) -> str:
+    return f"{sign} ascendant lagna effects"
+
+
+def _warm_chart(handle: PrefetchHandle, profile: dict, chart_type: str):
+    try:
+        with api_priority("prefetch"):
+            result = resolve_chart(profile["dob"], profile["tob"], profile["city"], chart_type)
+    except Exception as e:
+        logger.warning(f"Prefetch of {chart_type} failed for session {handle.session_id}: {e}")
+        return None
+    if chart_type == "D1" and PREFETCH_BPHS and not handle.cancelled.is_set():
+        sign = ascendant_sign((result or {}).get("chart_data"))
+        if sign:
+            handle.submit(_warm_bphs, lagna_query(sign))
+    return result
+
+
+def _warm_bphs(query: str):
+    return retrieve_bphs(query)
+
+
+def _run(handle: PrefetchHandle, profile: dict, charts: List[str]):
+    # Geocode once up front so the chart jobs below all hit the geocode cache
+    try:
+        lat, _, _ = get_lat_lon_offset(profile["city"], datetime.strptime(profile["dob"], "%Y-%m-%d"))
+    except Exception as e:
+        logger.warning(f"Prefetch geocode failed for session {handle.session_id}: {e}")
+        return
+    if lat is None:
+        logger.warning(f"Prefetch skipped for session {handle.session_id}: city could not be geocoded")
+        return
+    for chart_type in charts:
+        handle.submit(_warm_chart, handle, profile, chart_type)
+
+
+def start_prefetch(session_id: str, profile: dict, charts: Optional[List[str]] = None) -> Optional[PrefetchHandle]:
+    """Warm geocoding and the chart cache for a new session in the background."""
+    if not PREFETCH_ENABLED:
+        return None
+    cancel_prefetch(session_id)
+    handle = PrefetchHandle(session_id)
+    with _handles_lock:
+        _handles[session_id] = handle
+    charts = charts or PREFETCH_CHARTS
+    logger.info(f"Starting prefetch of {charts} for session {session_id}")
+    handle.submit(_run, handle, profile, charts)
+    return handle
+
+
+def cancel_prefetch(session_id: str) -> None:
+    with _handles_lock:
+        handle = _handles.pop(session_id, None)
+    if handle is not None:
+        handle.cancel()
+        logger.info(f"Cancelled prefetch for session {session_id}")
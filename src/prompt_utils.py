@@ -1,10 +1,28 @@
-from typing import Optional
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional, Tuple
 from langsmith import Client
+from src.config import PROMPT_CACHE_TTL_SECONDS, PROMPT_SNAPSHOT_DIR
 from src.logging_utils import get_logger, log_call
 from langchain_core.prompts import ChatPromptTemplate, PromptTemplate
 
 logger = get_logger(__name__)
 
+_client: Optional[Client] = None
+
+
+def _get_client() -> Client:
+    """Reuse one LangSmith client per process."""
+    global _client
+    if _client is None:
+        _client = Client()
+    return _client
+
 
 @log_call
 def get_prompt_content(prompt_name: str) -> str:
@@ -13,9 +31,12 @@ def get_prompt_content(prompt_name: str) -> str:
     Fallbacks to string serialization when shape is unknown.
     """
     logger.info(f"Pulling prompt '{prompt_name}' from LangSmith")
-    client = Client()
-    prompt = client.pull_prompt(prompt_name)
+    prompt = _get_client().pull_prompt(prompt_name)
+    return extract_prompt_text(prompt)
 
+
+def extract_prompt_text(prompt) -> str:
+    """Return the raw template text of a pulled/constructed prompt object."""
     # Chat prompt: extract first message template/content
     try:
         if isinstance(prompt, ChatPromptTemplate):
@@ -50,3 +71,144 @@ def get_prompt_content(prompt_name: str) -> str:
 
     # Last resort: string representation
     return str(prompt)
+
+
+# -------------------- Prompt Store (TTL cache + on-disk snapshot) --------------------
+
+def prompt_version(text: str) -> str:
+    """Short content hash identifying a prompt revision."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _snapshot_path(prompt_name: str, snapshot_dir: str) -> str:
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "__", prompt_name)
+    return os.path.join(snapshot_dir, f"{safe}.json")
+
+
+def save_prompt_snapshot(prompt_name: str, text: str, snapshot_dir: str = PROMPT_SNAPSHOT_DIR) -> str:
+    """Write the prompt text to a local JSON snapshot so the app can start offline."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    path = _snapshot_path(prompt_name, snapshot_dir)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "name": prompt_name,
+                "version": prompt_version(text),
+                "saved_at": datetime.now(timezone.utc).isoformat(),
+                "template": text,
+            },
+            f,
+            indent=2,
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def load_prompt_snapshot(prompt_name: str, snapshot_dir: str = PROMPT_SNAPSHOT_DIR) -> Optional[str]:
+    """Return the snapshotted prompt text, or None when no snapshot exists."""
+    path = _snapshot_path(prompt_name, snapshot_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("template")
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Failed to read prompt snapshot {path}: {e}")
+        return None
+
+
+class PromptStore:
+    """In-process TTL cache for system prompts, backed by a local snapshot.
+
+    `get` never waits on LangSmith: fresh entries are served from memory, stale or
+    snapshot-only entries are served immediately while a background thread refreshes
+    them. Successful refreshes also rewrite the on-disk snapshot.
+    """
+
+    def __init__(
+        self,
+        fetcher: Callable[[str], str] = get_prompt_content,
+        ttl_seconds: float = PROMPT_CACHE_TTL_SECONDS,
+        snapshot_dir: str = PROMPT_SNAPSHOT_DIR,
+    ):
+        self._fetcher = fetcher
+        self._ttl = ttl_seconds
+        self._snapshot_dir = snapshot_dir
+        self._entries: Dict[str, Tuple[str, float]] = {}
+        self._inflight: Dict[str, threading.Thread] = {}
+        self._lock = threading.Lock()
+
+    def get(self, prompt_name: str) -> str:
+        """Return the cached prompt text; raise LookupError when nothing is available yet."""
+        with self._lock:
+            entry = self._entries.get(prompt_name)
+        if entry is None:
+            text = load_prompt_snapshot(prompt_name, self._snapshot_dir)
+            if text is not None:
+                # Treat snapshot content as stale so it gets refreshed in the background
+                entry = (text, 0.0)
+                with self._lock:
+                    self._entries.setdefault(prompt_name, entry)
+        if entry is None or time.monotonic() - entry[1] > self._ttl:
+            self.refresh_async(prompt_name)
+        if entry is None:
+            raise LookupError(f"Prompt '{prompt_name}' is not cached yet and no local snapshot exists")
+        return entry[0]
+
+    def refresh(self, prompt_name: str) -> Optional[str]:
+        """Pull the prompt synchronously and update memory + snapshot. Returns None on failure."""
+        try:
+            text = self._fetcher(prompt_name)
+        except Exception as e:
+            logger.warning(f"Prompt refresh for '{prompt_name}' failed: {e}")
+            return None
+        with self._lock:
+            self._entries[prompt_name] = (text, time.monotonic())
+        try:
+            save_prompt_snapshot(prompt_name, text, self._snapshot_dir)
+        except Exception as e:
+            logger.warning(f"Failed to write prompt snapshot for '{prompt_name}': {e}")
+        return text
+
+    def refresh_async(self, prompt_name: str) -> threading.Thread:
+        """Start (or join) a background refresh for `prompt_name`."""
+        with self._lock:
+            running = self._inflight.get(prompt_name)
+            if running is not None and running.is_alive():
+                return running
+            thread = threading.Thread(
+                target=self._refresh_and_clear, args=(prompt_name,), name=f"prompt-refresh-{prompt_name}", daemon=True
+            )
+            self._inflight[prompt_name] = thread
+            # Started under the lock so a concurrent caller never sees a registered, not-yet-alive thread
+            thread.start()
+        return thread
+
+    def _refresh_and_clear(self, prompt_name: str) -> None:
+        try:
+            self.refresh(prompt_name)
+        finally:
+            with self._lock:
+                if self._inflight.get(prompt_name) is threading.current_thread():
+                    del self._inflight[prompt_name]
+
+    def invalidate(self, prompt_name: Optional[str] = None) -> None:
+        with self._lock:
+            if prompt_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(prompt_name, None)
+
+
+_store: Optional[PromptStore] = None
+_store_lock = threading.Lock()
+
+
+def get_prompt_store() -> PromptStore:
+    """Process-wide prompt store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PromptStore()
+        return _store
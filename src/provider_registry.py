@@ -0,0 +1,46 @@
+import importlib
+import threading
+from typing import Dict, Iterable, Tuple
+
+
+class ProviderRegistry:
+    """Provider name -> (module, class) for LLM / embedding SDKs, imported on first use.
+
+    Each provider SDK (langchain_openai, langchain_google_genai, langchain_aws + boto3) is
+    only imported when that provider is actually selected, so processes configured for one
+    provider never pay for the others at startup.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._specs: Dict[str, Tuple[str, str]] = {}
+        self._loaded: Dict[str, type] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, module: str, attr: str, aliases: Iterable[str] = ()) -> None:
+        for key in (name, *aliases):
+            self._specs[key.lower()] = (module, attr)
+
+    def names(self) -> list:
+        return sorted(self._specs)
+
+    def load(self, name: str) -> type:
+        """The provider's class, importing its module on the first call."""
+        key = name.lower()
+        cls = self._loaded.get(key)
+        if cls is not None:
+            return cls
+        spec = self._specs.get(key)
+        if spec is None:
+            raise ValueError(f"Unknown {self.kind} provider: {name}. Use one of {self.names()}.")
+        module_name, attr = spec
+        with self._lock:
+            if key not in self._loaded:
+                try:
+                    module = importlib.import_module(module_name)
+                except ImportError as e:
+                    raise ImportError(
+                        f"{self.kind} provider '{name}' needs the {module_name} package: {e}"
+                    ) from e
+                self._loaded[key] = getattr(module, attr)
+            return self._loaded[key]
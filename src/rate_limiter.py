@@ -0,0 +1,328 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from src.config import (
+    ASTRO_API_RATE_LIMIT_ENABLED, ASTRO_API_RATE_BACKEND, ASTRO_API_RATE_PER_SECOND, ASTRO_API_BURST,
+    ASTRO_API_DAILY_QUOTA, ASTRO_API_RATE_FILE, ASTRO_API_PRIORITY_RESERVE, ASTRO_API_PRIORITY_DEADLINE_SECONDS,
+    MONGO_RATE_LIMIT_COLLECTION,
+)
+from src.logging_utils import get_logger
+from src.metrics import REGISTRY
+
+logger = get_logger(__name__)
+
+# Highest first: live chat turns, then session prefetch, then batch jobs and cache warmers
+PRIORITIES = ("interactive", "prefetch", "batch")
+
+QUOTA_REQUESTS = REGISTRY.counter(
+    "jyotish_chart_api_quota_requests_total", "FreeAstrologyAPI permits by priority and result (granted/timeout).",
+    ["priority", "result"],
+)
+QUOTA_WAIT_SECONDS = REGISTRY.histogram(
+    "jyotish_chart_api_quota_wait_seconds", "Time spent queued for a FreeAstrologyAPI permit by priority.", ["priority"]
+)
+QUOTA_QUEUED = REGISTRY.gauge(
+    "jyotish_chart_api_quota_queued", "Requests in this process waiting for a FreeAstrologyAPI permit.", ["priority"]
+)
+QUOTA_TOKENS = REGISTRY.gauge("jyotish_chart_api_quota_tokens", "Permits left in the shared token bucket.")
+QUOTA_USED_TODAY = REGISTRY.gauge(
+    "jyotish_chart_api_quota_used_today", "FreeAstrologyAPI requests granted today (UTC) across all processes."
+)
+QUOTA_THROTTLED = REGISTRY.counter(
+    "jyotish_chart_api_throttled_total", "HTTP 429 responses from FreeAstrologyAPI by priority.", ["priority"]
+)
+
+_priority: ContextVar[str] = ContextVar("jyotish_api_priority", default="interactive")
+
+
+@contextmanager
+def api_priority(priority: str):
+    """Chart API calls made in this block (and in threads/tasks started from it) queue at `priority`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown API priority: {priority}. Use one of {PRIORITIES}.")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def parse_class_map(raw: str) -> Dict[str, float]:
+    """'interactive:0,prefetch:0.25' -> {'interactive': 0.0, 'prefetch': 0.25}."""
+    values = {}
+    for part in raw.split(","):
+        if ":" in part:
+            name, value = part.split(":", 1)
+            values[name.strip().lower()] = float(value)
+    return values
+
+
+class RateLimitTimeout(RuntimeError):
+    """No permit could be granted before the request's deadline."""
+
+
+# -------------------- Token buckets --------------------
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+def _seconds_to_midnight() -> float:
+    now = datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (tomorrow - now).total_seconds()
+
+
+class TokenBucket:
+    """Refills `rate` permits per second up to `capacity`, with an optional daily cap.
+
+    State is {tokens, ts, day, used}. `take(reserve)` only grants a permit if a share of the
+    burst (`reserve * (capacity - 1)` tokens) and of the daily quota stays untouched, which
+    keeps headroom for higher priority classes even when they run in other processes.
+    Subclasses decide where the state lives; this one keeps it in memory.
+    """
+
+    def __init__(self, rate: float, capacity: float, daily_quota: int = 0):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.daily_quota = daily_quota
+        self._lock = threading.Lock()
+        self._state = self._initial()
+
+    def _initial(self) -> dict:
+        return {"tokens": self.capacity, "ts": time.time(), "day": _today(), "used": 0}
+
+    def _refill(self, state: dict, now: float) -> dict:
+        tokens = min(self.capacity, state["tokens"] + max(0.0, now - state["ts"]) * self.rate)
+        day = _today()
+        used = state["used"] if state.get("day") == day else 0
+        return {"tokens": tokens, "ts": now, "day": day, "used": used}
+
+    def _transact(self, update):
+        """Apply `update(state) -> (new_state, result)` atomically and return result."""
+        with self._lock:
+            new_state, result = update(self._refill(self._state, time.time()))
+            self._state = new_state
+        return result
+
+    def take(self, reserve: float = 0.0) -> float:
+        """Consume one permit and return 0, or return the seconds until one could be granted."""
+        token_floor = reserve * (self.capacity - 1)
+        daily_floor = reserve * self.daily_quota
+
+        def update(state):
+            if self.daily_quota and state["used"] + 1 > self.daily_quota - daily_floor:
+                return state, (_seconds_to_midnight(), state)
+            if state["tokens"] - 1 < token_floor:
+                return state, ((token_floor + 1 - state["tokens"]) / self.rate, state)
+            state = {**state, "tokens": state["tokens"] - 1, "used": state["used"] + 1}
+            return state, (0.0, state)
+
+        wait, state = self._transact(update)
+        _publish(state)
+        return wait
+
+    def penalize(self, seconds: float) -> None:
+        """Drain the bucket so nobody gets a permit for `seconds` (the server said 429)."""
+        def update(state):
+            state = {**state, "tokens": min(state["tokens"], -seconds * self.rate)}
+            return state, state
+
+        _publish(self._transact(update))
+
+    def snapshot(self) -> dict:
+        return self._transact(lambda s: (s, dict(s)))
+
+
+def _publish(state: dict) -> None:
+    QUOTA_TOKENS.set(max(0.0, state["tokens"]))
+    QUOTA_USED_TODAY.set(state["used"])
+
+
+class FileTokenBucket(TokenBucket):
+    """Bucket state in a JSON file guarded by an exclusive `flock`, shared by processes on one host."""
+
+    def __init__(self, path: str, rate: float, capacity: float, daily_quota: int = 0):
+        import fcntl  # POSIX only; use the mongo backend elsewhere
+
+        self._fcntl = fcntl
+        self.path = path
+        super().__init__(rate, capacity, daily_quota)
+
+    def _transact(self, update):
+        with self._lock, open(self.path, "a+", encoding="utf-8") as f:
+            self._fcntl.flock(f, self._fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                raw = f.read()
+                try:
+                    state = json.loads(raw) if raw.strip() else self._initial()
+                except ValueError:
+                    logger.warning(f"Rate limit state in {self.path} is unreadable; resetting it")
+                    state = self._initial()
+                new_state, result = update(self._refill(state, time.time()))
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(new_state))
+                f.flush()
+            finally:
+                self._fcntl.flock(f, self._fcntl.LOCK_UN)
+        return result
+
+
+class MongoTokenBucket(TokenBucket):
+    """Bucket state in one Mongo document, updated with compare-and-set on a version field.
+
+    Shared by every process and host using the same database (all Streamlit and API
+    workers, prefetch, batch jobs), so they split one FreeAstrologyAPI key's quota.
+    """
+
+    def __init__(self, collection, key: str, rate: float, capacity: float, daily_quota: int = 0):
+        self.collection = collection
+        self.key = key
+        super().__init__(rate, capacity, daily_quota)
+
+    def _transact(self, update):
+        for _ in range(50):
+            doc = self.collection.find_one({"_id": self.key})
+            if doc is None:
+                try:
+                    self.collection.insert_one({"_id": self.key, "v": 0, **self._initial()})
+                except DuplicateKeyError:
+                    pass  # another process created it first
+                continue
+            state = {k: doc[k] for k in ("tokens", "ts", "day", "used")}
+            new_state, result = update(self._refill(state, time.time()))
+            updated = self.collection.update_one(
+                {"_id": self.key, "v": doc["v"]}, {"$set": {**new_state, "v": doc["v"] + 1}}
+            )
+            if updated.matched_count:
+                return result
+        raise RuntimeError(f"Rate limit state {self.key} is too contended")
+
+
+# -------------------- Priority queue --------------------
+
+class RateLimiter:
+    """Priority queue in front of a token bucket.
+
+    Within a process, waiters are served strictly by priority class and then arrival
+    order: only the head of the queue polls the bucket, and it does so outside the queue's
+    lock. Across processes, each class also leaves a reserve of the bucket to the classes
+    above it (`ASTRO_API_PRIORITY_RESERVE`).
+    Every request has a deadline per class; a permit that cannot be granted in time raises
+    `RateLimitTimeout` instead of queueing indefinitely.
+    """
+
+    def __init__(self, bucket: Optional[TokenBucket], reserves: Optional[Dict[str, float]] = None,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.bucket = bucket
+        self.reserves = {p: 0.0 for p in PRIORITIES}
+        self.reserves.update(reserves or {})
+        self.deadlines = {p: 60.0 for p in PRIORITIES}
+        self.deadlines.update(deadlines or {})
+        self._cond = threading.Condition()
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._polling = False
+
+    @property
+    def enabled(self) -> bool:
+        return self.bucket is not None
+
+    def acquire(self, priority: Optional[str] = None, timeout: Optional[float] = None) -> float:
+        """Block until a permit is granted; returns the seconds spent waiting."""
+        if self.bucket is None:
+            return 0.0
+        priority = priority or current_priority()
+        started = time.monotonic()
+        deadline = started + (self.deadlines[priority] if timeout is None else timeout)
+        entry: Tuple[int, int] = (PRIORITIES.index(priority), next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            QUOTA_QUEUED.inc(priority=priority)
+            self._cond.notify_all()  # a new head may have arrived
+        try:
+            while True:
+                with self._cond:
+                    # Only the head polls, and one poll at a time; everyone else sleeps here
+                    while self._waiters[0] != entry or self._polling:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeout(priority, None)
+                        self._cond.wait(remaining)
+                    self._polling = True
+                # The bucket may do store round-trips (Mongo CAS retries, file locks): poll it
+                # without the condition lock so other threads can still enqueue meanwhile
+                try:
+                    wait = self.bucket.take(self.reserves[priority])
+                finally:
+                    with self._cond:
+                        self._polling = False
+                        self._cond.notify_all()
+                if wait <= 0:
+                    waited = time.monotonic() - started
+                    QUOTA_REQUESTS.inc(priority=priority, result="granted")
+                    QUOTA_WAIT_SECONDS.observe(waited, priority=priority)
+                    return waited
+                with self._cond:
+                    remaining = deadline - time.monotonic()
+                    if wait > remaining:
+                        self._timeout(priority, wait)
+                    # A higher class that queued during the poll is now head; let it go first
+                    if self._waiters[0] == entry:
+                        self._cond.wait(min(wait, remaining))
+        finally:
+            with self._cond:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                QUOTA_QUEUED.inc(-1, priority=priority)
+                self._cond.notify_all()
+
+    def _timeout(self, priority: str, wait: Optional[float]):
+        QUOTA_REQUESTS.inc(priority=priority, result="timeout")
+        detail = f"next permit in {wait:.1f}s" if wait is not None else "queue did not drain"
+        raise RateLimitTimeout(f"No FreeAstrologyAPI permit for {priority} request within its deadline ({detail})")
+
+    def throttled(self, retry_after: float, priority: Optional[str] = None) -> None:
+        """Record a 429 and pause every class for `retry_after` seconds."""
+        QUOTA_THROTTLED.inc(priority=priority or current_priority())
+        if self.bucket is not None:
+            self.bucket.penalize(retry_after)
+        with self._cond:
+            self._cond.notify_all()
+
+
+def build_rate_limiter(mongo_db=None) -> RateLimiter:
+    """The limiter described by the ASTRO_API_RATE_* settings (disabled: grants immediately)."""
+    if not ASTRO_API_RATE_LIMIT_ENABLED:
+        return RateLimiter(None)
+    args = (ASTRO_API_RATE_PER_SECOND, ASTRO_API_BURST, ASTRO_API_DAILY_QUOTA)
+    if ASTRO_API_RATE_BACKEND == "mongo" and mongo_db is not None:
+        bucket = MongoTokenBucket(mongo_db[MONGO_RATE_LIMIT_COLLECTION], "free_astrology_api", *args)
+    elif ASTRO_API_RATE_BACKEND == "file":
+        bucket = FileTokenBucket(ASTRO_API_RATE_FILE, *args)
+    else:
+        bucket = TokenBucket(*args)
+    logger.info(
+        f"FreeAstrologyAPI rate limit: {ASTRO_API_RATE_PER_SECOND}/s, burst {ASTRO_API_BURST}, "
+        f"daily quota {ASTRO_API_DAILY_QUOTA or 'none'} ({type(bucket).__name__})"
+    )
+    return RateLimiter(
+        bucket,
+        reserves=parse_class_map(ASTRO_API_PRIORITY_RESERVE),
+        deadlines=parse_class_map(ASTRO_API_PRIORITY_DEADLINE_SECONDS),
+    )
@@ -0,0 +1,110 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from pymongo import MongoClient
+
+from src.config import MONGO_URI, MONGO_DB_NAME, MONGO_MAX_POOL_SIZE, GEOCODER_USER_AGENT, ASTRO_API_RATE_BACKEND
+from src.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+class Services:
+    """Process-wide owner of heavy clients: Mongo, chat models, BPHS retriever, geocoder, TimezoneFinder.
+
+    Every resource is built on first use and then shared by all sessions and threads, so
+    the number of Mongo connection pools, model clients and TimezoneFinder polygon tables
+    does not grow with the number of concurrent users. In the Streamlit app the container
+    itself is held by `st.cache_resource` (see `src/ui/resources.py`).
+    """
+
+    def __init__(self, mongo_factory: Optional[Callable[[], MongoClient]] = None):
+        self._lock = threading.RLock()
+        self._resources: Dict[str, object] = {}
+        self._mongo_factory = mongo_factory or (lambda: MongoClient(MONGO_URI, maxPoolSize=MONGO_MAX_POOL_SIZE))
+
+    def _get(self, name: str, build: Callable[[], object]):
+        resource = self._resources.get(name)
+        if resource is not None:
+            return resource
+        with self._lock:
+            if name not in self._resources:
+                logger.info(f"Initializing shared resource: {name}")
+                self._resources[name] = build()
+            return self._resources[name]
+
+    # ---- resources ----
+
+    @property
+    def mongo(self) -> MongoClient:
+        return self._get("mongo", self._mongo_factory)
+
+    def mongo_db(self):
+        return self.mongo[MONGO_DB_NAME]
+
+    def chat_model(self, tier: str = "fast"):
+        from src import llm_factory
+        return self._get(f"chat_model:{tier}", lambda: llm_factory.get_chat_model(tier))
+
+    @property
+    def retriever(self):
+        from src.vector_store import get_pinecone_retriever
+        return self._get("retriever", lambda: get_pinecone_retriever(top_k=4))
+
+    @property
+    def geocoder(self):
+        from geopy.geocoders import Nominatim
+        return self._get("geocoder", lambda: Nominatim(user_agent=GEOCODER_USER_AGENT, timeout=10))
+
+    @property
+    def rate_limiter(self):
+        """FreeAstrologyAPI permits shared by every chart request in the process (see src/rate_limiter.py)."""
+        from src.rate_limiter import build_rate_limiter
+        return self._get(
+            "rate_limiter",
+            lambda: build_rate_limiter(self.mongo_db() if ASTRO_API_RATE_BACKEND == "mongo" else None),
+        )
+
+    @property
+    def timezone_finder(self):
+        # TimezoneFinder loads its polygon data on construction
+        from timezonefinder import TimezoneFinder
+        return self._get("timezone_finder", TimezoneFinder)
+
+    # ---- lifecycle ----
+
+    def initialized(self) -> list:
+        with self._lock:
+            return sorted(self._resources)
+
+    def health(self) -> Dict[str, str]:
+        """'ok', 'idle' (not built yet) or 'error: …' per resource; only Mongo is actively pinged."""
+        status = {name: "idle" for name in ("mongo", "chat_model:fast", "retriever", "geocoder", "timezone_finder")}
+        status.update({name: "ok" for name in self.initialized()})
+        if MONGO_URI or "mongo" in self._resources:
+            try:
+                self.mongo.admin.command("ping")
+                status["mongo"] = "ok"
+            except Exception as e:
+                status["mongo"] = f"error: {e}"
+        return status
+
+    def close(self) -> None:
+        with self._lock:
+            client = self._resources.pop("mongo", None)
+            self._resources.clear()
+        if client is not None:
+            client.close()
+
+
+_services: Optional[Services] = None
+_services_lock = threading.Lock()
+
+
+def get_services() -> Services:
+    """The process-wide service container."""
+    global _services
+    with _services_lock:
+        if _services is None:
+            _services = Services()
+        return _services
@@ -0,0 +1,143 @@
+import re
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from src.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+_OPEN_TAG = "<thinking>"
+_CLOSE_TAG = "</thinking>"
+
+_CHART_TOOL_RE = re.compile(r"^chart_(d\d+)_", re.IGNORECASE)
+
+
+def block_text(content) -> str:
+    """Flatten str / list-of-blocks message content into plain text."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for b in content:
+            if isinstance(b, dict):
+                t = b.get("text")
+                if isinstance(t, str):
+                    parts.append(t)
+            elif isinstance(b, str):
+                parts.append(b)
+        return "".join(parts)
+    return "" if content is None else str(content)
+
+
+def tool_progress_label(tool_name: str, tool_input: Optional[dict] = None) -> str:
+    """Human-readable progress line for a tool call, e.g. 'Fetching D9 chart…'."""
+    m = _CHART_TOOL_RE.match(tool_name or "")
+    if m:
+        return f"Fetching {m.group(1).upper()} chart…"
+    if tool_name == "chart_varga_specific":
+        code = (tool_input or {}).get("chart_code") if isinstance(tool_input, dict) else None
+        return f"Fetching {str(code).upper()} chart…" if code else "Fetching divisional chart…"
+    if tool_name == "bphs_search_pinecone":
+        return "Searching Brihat Parashara Hora Shastra…"
+    return f"Running {tool_name}…"
+
+
+class ThinkingFilter:
+    """Incrementally strip <thinking>…</thinking> segments from streamed text.
+
+    `feed` returns only the text that is safe to display; a possible partial tag at the
+    end of a chunk is held back until the next chunk resolves it. Hidden segments are
+    collected in `segments`.
+    """
+
+    def __init__(self):
+        self.segments: List[str] = []
+        self._buffer = ""
+        self._inside = False
+        self._current: List[str] = []
+
+    def feed(self, text: str) -> str:
+        self._buffer += text
+        out = []
+        while self._buffer:
+            tag = _CLOSE_TAG if self._inside else _OPEN_TAG
+            idx = self._buffer.lower().find(tag)
+            if idx >= 0:
+                self._emit(self._buffer[:idx], out)
+                self._buffer = self._buffer[idx + len(tag):]
+                if self._inside:
+                    self.segments.append("".join(self._current).strip())
+                    self._current = []
+                self._inside = not self._inside
+                continue
+            # Hold back the longest suffix that could still become the tag
+            keep = _partial_tag_suffix(self._buffer, tag)
+            self._emit(self._buffer[: len(self._buffer) - keep], out)
+            self._buffer = self._buffer[len(self._buffer) - keep:]
+            break
+        return "".join(out)
+
+    def flush(self) -> str:
+        """Release anything still buffered at end of stream."""
+        rest, self._buffer = self._buffer, ""
+        if self._inside:
+            # Unterminated segment: keep it hidden
+            self._current.append(rest)
+            self.segments.append("".join(self._current).strip())
+            self._current = []
+            self._inside = False
+            return ""
+        return rest
+
+    def _emit(self, text: str, out: List[str]) -> None:
+        if not text:
+            return
+        if self._inside:
+            self._current.append(text)
+        else:
+            out.append(text)
+
+
+def _partial_tag_suffix(text: str, tag: str) -> int:
+    lowered = text.lower()
+    for n in range(min(len(tag) - 1, len(text)), 0, -1):
+        if tag.startswith(lowered[-n:]):
+            return n
+    return 0
+
+
+async def astream_agent_turn(agent_executor, inputs: Dict[str, Any], config: Dict[str, Any]) -> AsyncIterator[Tuple[str, Any]]:
+    """Translate agent `astream_events` into simple UI events.
+
+    Yields ("model_start", None), ("token", text), ("tool_start", label) and ("tool_end", tool_name).
+    Only tokens produced by the agent's own model node are forwarded.
+    """
+    async for ev in agent_executor.astream_events(inputs, config, version="v2"):
+        kind = ev.get("event")
+        node = (ev.get("metadata") or {}).get("langgraph_node")
+        if kind == "on_chat_model_start" and node == "model":
+            yield "model_start", None
+        elif kind == "on_chat_model_stream" and node == "model":
+            chunk = ev.get("data", {}).get("chunk")
+            text = block_text(getattr(chunk, "content", None))
+            if text:
+                yield "token", text
+        elif kind == "on_tool_start":
+            yield "tool_start", tool_progress_label(ev.get("name"), ev.get("data", {}).get("input"))
+        elif kind == "on_tool_end":
+            yield "tool_end", ev.get("name")
+
+
+def stream_agent_turn(agent_executor, inputs: Dict[str, Any], config: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """Synchronous wrapper around `astream_agent_turn` for Streamlit's script thread."""
+    loop = asyncio.new_event_loop()
+    agen = astream_agent_turn(agent_executor, inputs, config)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(agen.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(agen.aclose())
+        loop.close()
@@ -0,0 +1,217 @@
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import ToolMessage
+
+from src.config import TOOL_MAX_CONCURRENCY, TOOL_CALL_TIMEOUT_SECONDS
+from src.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+# How often a waiting tool call re-checks its turn's cancellation flag
+_POLL_SECONDS = 0.05
+
+
+class ToolCallCancelled(RuntimeError):
+    pass
+
+
+# -------------------- Per-turn scope --------------------
+
+class TurnScope:
+    """Cancellation flag and tool-call slots of one agent turn.
+
+    Slots are created on first use with the middleware's limit, so concurrent turns each
+    get their own `max_concurrency` instead of sharing one process-wide pool.
+    """
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._slots: Optional[threading.Semaphore] = None
+        self._async_slots: Optional[asyncio.Semaphore] = None
+
+    def slots(self, limit: int) -> threading.Semaphore:
+        with self._lock:
+            if self._slots is None:
+                self._slots = threading.BoundedSemaphore(limit)
+            return self._slots
+
+    def async_slots(self, limit: int) -> asyncio.Semaphore:
+        # A turn runs on a single event loop, which the semaphore binds to on first use
+        with self._lock:
+            if self._async_slots is None:
+                self._async_slots = asyncio.Semaphore(limit)
+            return self._async_slots
+
+
+_turns: Dict[str, TurnScope] = {}
+_turns_lock = threading.Lock()
+
+
+def start_turn(session_id: str) -> TurnScope:
+    """Open a fresh scope for the session's next agent turn."""
+    turn = TurnScope()
+    with _turns_lock:
+        _turns[session_id] = turn
+    return turn
+
+
+def end_turn(session_id: str, turn: TurnScope) -> None:
+    """Drop the session's scope once its turn is over (unless a newer turn replaced it)."""
+    with _turns_lock:
+        if _turns.get(session_id) is turn:
+            del _turns[session_id]
+
+
+def abort_turn(session_id: str) -> None:
+    """Cancel the session's in-flight turn: queued tool calls never start, waiting ones stop waiting."""
+    with _turns_lock:
+        turn = _turns.get(session_id)
+    if turn is not None and not turn.cancelled.is_set():
+        turn.cancelled.set()
+        logger.info(f"Aborted tool calls for session {session_id}")
+
+
+def _current_turn(request) -> Optional[TurnScope]:
+    runtime = getattr(request, "runtime", None)
+    session_id = getattr(getattr(runtime, "context", None), "session_id", None)
+    if session_id is None:
+        return None
+    with _turns_lock:
+        return _turns.get(session_id)
+
+
+# -------------------- Middleware --------------------
+
+class ToolExecutionMiddleware(AgentMiddleware):
+    """Bound, time-limit and cancel the agent's tool calls.
+
+    The agent graph already fans a step's tool calls out as parallel tasks and writes
+    their ToolMessages back in tool-call order; this caps how many of a turn's calls run
+    at once (`max_concurrency`) and turns a call that runs longer than `timeout_seconds`
+    into an error ToolMessage the model can react to. Each sync call runs on its own
+    daemon thread that keeps its slot until it finishes, so a timed-out call stops
+    blocking the turn but still counts against the limit while it works. Once a turn is
+    aborted its pending calls return errors and the next model call raises
+    ToolCallCancelled, ending the turn.
+    """
+
+    def __init__(self, max_concurrency: int = TOOL_MAX_CONCURRENCY, timeout_seconds: float = TOOL_CALL_TIMEOUT_SECONDS):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+
+    @staticmethod
+    def _name(request) -> str:
+        return request.tool_call.get("name", "tool")
+
+    def _error(self, request, reason: str) -> ToolMessage:
+        return ToolMessage(
+            content=f"Error: tool '{self._name(request)}' {reason}. Answer without it or tell the user to retry.",
+            tool_call_id=request.tool_call.get("id", ""),
+            name=self._name(request),
+            status="error",
+        )
+
+    def _timed_out(self, request) -> ToolMessage:
+        logger.warning(f"Tool '{self._name(request)}' timed out after {self.timeout_seconds}s")
+        return self._error(request, f"timed out after {self.timeout_seconds:g}s")
+
+    def _cancelled(self, request) -> ToolMessage:
+        return self._error(request, "was cancelled because the turn was aborted")
+
+    @staticmethod
+    def _check_model_call(request) -> None:
+        turn = _current_turn(request)
+        if turn is not None and turn.cancelled.is_set():
+            raise ToolCallCancelled("Agent turn was aborted")
+
+    def wrap_model_call(self, request, handler):
+        self._check_model_call(request)
+        return handler(request)
+
+    async def awrap_model_call(self, request, handler):
+        self._check_model_call(request)
+        return await handler(request)
+
+    # ---- sync ----
+
+    def wrap_tool_call(self, request, handler):
+        turn = _current_turn(request)
+        if turn is None:
+            return self._run_thread(request, handler, None)
+        slots = turn.slots(self.max_concurrency)
+        # Queue time does not count against the per-call timeout
+        while not slots.acquire(timeout=_POLL_SECONDS):
+            if turn.cancelled.is_set():
+                return self._cancelled(request)
+        if turn.cancelled.is_set():
+            slots.release()
+            return self._cancelled(request)
+        return self._run_thread(request, handler, turn, on_exit=slots.release)
+
+    def _run_thread(self, request, handler, turn: Optional[TurnScope], on_exit=None):
+        future: Future = Future()
+        ctx = contextvars.copy_context()  # keep callbacks/config of the calling graph task
+
+        def run():
+            try:
+                future.set_result(ctx.run(handler, request))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                if on_exit is not None:
+                    on_exit()  # the slot is held for as long as the thread works, not as long as we wait
+
+        try:
+            threading.Thread(target=run, name=f"agent-tool-{self._name(request)}", daemon=True).start()
+        except BaseException:
+            if on_exit is not None:
+                on_exit()
+            raise
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return self._timed_out(request)  # the thread finishes on its own; its result is dropped
+            try:
+                return future.result(timeout=min(_POLL_SECONDS, remaining))
+            except TimeoutError:
+                if future.done():
+                    raise  # the tool itself raised TimeoutError
+                if turn is not None and turn.cancelled.is_set():
+                    return self._cancelled(request)
+
+    # ---- async ----
+
+    async def awrap_tool_call(self, request, handler):
+        turn = _current_turn(request)
+        if turn is None:
+            return await self._run_task(request, handler, None)
+        async with turn.async_slots(self.max_concurrency):
+            if turn.cancelled.is_set():
+                return self._cancelled(request)
+            return await self._run_task(request, handler, turn)
+
+    async def _run_task(self, request, handler, turn: Optional[TurnScope]):
+        task = asyncio.ensure_future(handler(request))
+        deadline = time.monotonic() + self.timeout_seconds
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return self._timed_out(request)
+                done, _ = await asyncio.wait({task}, timeout=min(_POLL_SECONDS, remaining))
+                if done:
+                    return task.result()
+                if turn is not None and turn.cancelled.is_set():
+                    return self._cancelled(request)
+        finally:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,237 @@
+import json
+import re
+import threading
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.agents.middleware import AgentMiddleware, ModelRequest
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from src.config import TOOL_ROUTER_ENABLED, TOOL_ROUTER_MIN_SCORE
+from src.llm_factory import allowed_tools_choice, tool_narrowing
+from src.logging_utils import get_logger
+from src.metrics import export_stat_counters
+from src.streaming import block_text
+
+logger = get_logger(__name__)
+
+# Keyword regex fragments per varga, matched at word starts: "marri" covers marriage/married,
+# while short words carry an explicit word end ("cars?\\b" must not match "career").
+CHART_KEYWORDS: Dict[str, List[str]] = {
+    "D1": ["health", "body", "personality", "life", "general", "rasi", "lagna", "ascendant", "overall", "nature"],
+    "D2": ["wealth", "money", "financ", "asset", "income", r"rich\b", "savings", "hora"],
+    "D3": ["sibling", "brother", "sister", "courage", "initiative", "drekkana"],
+    "D4": ["propert", "land", "home", "real estate", "fortune", "chaturthamsa"],
+    "D7": ["child", "kids", "pregnan", "progeny", "baby", r"sons?\b", "daughter", "saptamsa"],
+    "D9": ["marri", "spouse", "wife", "husband", "relationship", "partner", "love", "wedding", "navamsa"],
+    "D10": ["career", "job", "profession", "work", "promotion", "business", "status", "fame", "boss", "dasamsa"],
+    "D12": ["parent", "father", "mother", "lineage", "grandparent", "ancestr", "dwadasamsa"],
+    "D16": ["vehicle", r"cars?\b", "luxur", "comfort", "shodasamsa"],
+    "D20": ["spiritual", "worship", "meditat", "religio", "devotion", r"gods?\b", "vimsamsa"],
+    "D24": ["educat", "study", "studies", "degree", "learning", "exam", "universit", "knowledge", "siddhamsa"],
+    "D30": ["disease", "illness", "misfortune", "accident", "enem", "punish", "trimsamsa"],
+    "D60": ["past life", "past karma", "karma", "previous birth", "tendenc", "shashtiamsa"],
+}
+
+# The dasha tool is only bound for timing questions
+DASHA_TOOL = "dasha_vimshottari"
+TIMING_KEYWORDS = re.compile(
+    r"\b(when|dasha|timing|period|soon|how long|which year|what year|what age|upcoming|next \d* ?(year|month)|future)"
+)
+
+_CHART_TOOL = re.compile(r"^chart_(d\d+)_")
+_EXPLICIT_CHART = re.compile(r"\bd\s?-?(\d{1,2})\b", re.IGNORECASE)
+_DIM = 512
+
+
+def chart_code_for_tool(tool_name: str) -> Optional[str]:
+    m = _CHART_TOOL.match(tool_name)
+    return m.group(1).upper() if m else None
+
+
+def _embed(text: str) -> np.ndarray:
+    """Tiny local embedding: hashed character trigrams of each word, L2-normalized."""
+    vec = np.zeros(_DIM, dtype=np.float32)
+    for word in re.findall(r"[a-z]+", text.lower()):
+        padded = f" {word} "
+        for i in range(len(padded) - 2):
+            vec[zlib.crc32(padded[i:i + 3].encode()) % _DIM] += 1.0
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def question_text(messages: Sequence) -> str:
+    """The user's question from the latest human message (the part after 'User Input:')."""
+    for m in reversed(messages):
+        if isinstance(m, HumanMessage):
+            text = block_text(m.content)
+            return text.split("User Input:", 1)[1].strip() if "User Input:" in text else text.strip()
+    return ""
+
+
+@dataclass
+class RouteDecision:
+    charts: List[str]
+    reason: str  # "explicit" | "keywords" | "embedding" | "fallback"
+    scores: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def fallback(self) -> bool:
+        return self.reason == "fallback"
+
+
+class QueryRouter:
+    """Map a question to the vargas it needs: explicit chart codes, then keywords, then embedding similarity."""
+
+    def __init__(self, chart_descriptions: Dict[str, str], min_score: float = TOOL_ROUTER_MIN_SCORE):
+        self.charts = list(chart_descriptions)
+        self.min_score = min_score
+        self._keywords = {
+            code: re.compile(r"\b(" + "|".join(CHART_KEYWORDS[code]) + r")")
+            for code in self.charts if CHART_KEYWORDS.get(code)
+        }
+        protos = [f"{chart_descriptions[c]} {' '.join(CHART_KEYWORDS.get(c, []))}" for c in self.charts]
+        self._matrix = np.stack([_embed(p) for p in protos]) if protos else np.zeros((0, _DIM), dtype=np.float32)
+
+    def route(self, question: str) -> RouteDecision:
+        q = question.lower()
+        explicit = [f"D{n}" for n in _EXPLICIT_CHART.findall(q) if f"D{n}" in self.charts]
+        if explicit:
+            return RouteDecision(list(dict.fromkeys(explicit)), "explicit")
+        hits = [code for code, rx in self._keywords.items() if rx.search(q)]
+        if hits:
+            return RouteDecision(hits, "keywords")
+        if len(self._matrix):
+            sims = self._matrix @ _embed(q)
+            scores = {c: round(float(s), 3) for c, s in zip(self.charts, sims)}
+            best = int(np.argmax(sims))
+            if sims[best] >= self.min_score:
+                return RouteDecision([self.charts[best]], "embedding", scores)
+            return RouteDecision(list(self.charts), "fallback", scores)
+        return RouteDecision(list(self.charts), "fallback")
+
+
+def _schema_tokens(tool) -> int:
+    try:
+        return len(json.dumps(convert_to_openai_tool(tool))) // 4 + 1
+    except Exception:
+        return 0
+
+
+class StatCounters:
+    """Thread-safe running counters; read via `snapshot()`."""
+
+    def __init__(self, *names: str):
+        self._lock = threading.Lock()
+        self.values = {name: 0 for name in names}
+
+    def add(self, **deltas) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.values[k] = self.values.get(k, 0) + v
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.values)
+
+
+ROUTER_STATS = StatCounters("decisions", "fallbacks", "misroutes", "tools_bound", "schema_tokens_saved")
+export_stat_counters("jyotish_tool_router", ROUTER_STATS)
+
+
+class ToolRouterMiddleware(AgentMiddleware):
+    """Expose only the chart tools a turn needs (plus any non-chart tools such as BPHS search).
+
+    The dasha tool is offered only when the question asks about timing.
+
+    How the routed set is applied depends on `narrowing` (see llm_factory.tool_narrowing):
+    "drop" unbinds the other schemas, "allowed_tools" keeps the full tool list bound (so the
+    cached prompt prefix is byte-identical every turn) and restricts calls via `tool_choice`,
+    and "none" only logs the decision.
+
+    Tools the model already called in this turn stay allowed so later steps can refer to
+    them. A tool call outside the routed set is counted as a misroute; the tool still
+    runs because every tool remains registered with the graph.
+    """
+
+    def __init__(self, tools: Sequence, enabled: bool = TOOL_ROUTER_ENABLED, router: Optional[QueryRouter] = None,
+                 narrowing: Optional[str] = None):
+        super().__init__()
+        self.enabled = enabled
+        self.narrowing = narrowing or tool_narrowing()
+        self._chart_tools = {chart_code_for_tool(t.name): t for t in tools if chart_code_for_tool(t.name)}
+        self._schema_cost = {t.name: _schema_tokens(t) for t in tools}
+        self.router = router or QueryRouter(
+            {code: (t.description or "") for code, t in self._chart_tools.items()}
+        )
+
+    @staticmethod
+    def _called_this_turn(messages: Sequence) -> set:
+        called = set()
+        for m in reversed(messages):
+            if isinstance(m, HumanMessage):
+                break
+            if isinstance(m, AIMessage):
+                called.update(tc["name"] for tc in m.tool_calls)
+        return called
+
+    def _route(self, request: ModelRequest):
+        question = question_text(request.messages)
+        decision = self.router.route(question)
+        keep_charts = set(decision.charts)
+        timing = bool(TIMING_KEYWORDS.search(question.lower()))
+        called = self._called_this_turn(request.messages)
+        tools, dropped = [], []
+        for t in request.tools:
+            name = getattr(t, "name", None)
+            code = chart_code_for_tool(name or "")
+            if name == DASHA_TOOL:
+                keep = timing
+            else:
+                keep = code is None or code in keep_charts
+            if keep or name in called:
+                tools.append(t)
+            else:
+                dropped.append(name)
+        allowed = {getattr(t, "name", None) for t in tools}
+        saved = sum(self._schema_cost.get(n, 0) for n in dropped) if self.narrowing == "drop" else 0
+        ROUTER_STATS.add(
+            decisions=1, fallbacks=int(decision.fallback), tools_bound=len(tools), schema_tokens_saved=saved
+        )
+        logger.info(
+            f"Tool routing ({decision.reason}, {self.narrowing}): charts={decision.charts} timing={timing} "
+            f"allowed={len(tools)}/{len(request.tools)} "
+            f"tool_schema_tokens_saved~{saved}"
+        )
+        if self.narrowing == "drop":
+            return request.override(tools=tools), allowed
+        if self.narrowing == "allowed_tools" and dropped and request.tool_choice is None:
+            # Same tools in the same order every turn: only tool_choice varies, after the cached prefix
+            return request.override(tool_choice=allowed_tools_choice([t.name for t in tools])), allowed
+        return request, allowed
+
+    def _record_misroutes(self, response, bound: set) -> None:
+        for msg in getattr(response, "result", None) or []:
+            for tc in getattr(msg, "tool_calls", None) or []:
+                if tc["name"] not in bound:
+                    ROUTER_STATS.add(misroutes=1)
+                    logger.warning(f"Tool router misroute: model called unbound tool '{tc['name']}'")
+
+    def wrap_model_call(self, request, handler):
+        if not self.enabled:
+            return handler(request)
+        routed, bound = self._route(request)
+        response = handler(routed)
+        self._record_misroutes(response, bound)
+        return response
+
+    async def awrap_model_call(self, request, handler):
+        if not self.enabled:
+            return await handler(request)
+        routed, bound = self._route(request)
+        response = await handler(routed)
+        self._record_misroutes(response, bound)
+        return response
@@ -1,19 +1,26 @@
 import json
 import hashlib
-from datetime import datetime, timezone
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
 from functools import wraps
 import requests
 import html
-from pymongo import MongoClient
 from langchain.tools import tool
 from src.logging_utils import get_logger, log_call
+from src.metrics import CHART_API_SECONDS, CHART_FETCH_SECONDS, RETRIEVAL_SECONDS, record_cache
 
 from src.config import (
-    MONGO_URI, MONGO_DB_NAME, MONGO_API_CACHE_COLLECTION,
-    FREE_ASTROLOGY_API_KEY, ASTRO_OBSERVATION_POINT, ASTRO_AYANAMSHA
+    MONGO_API_CACHE_COLLECTION, EMBEDDING_PROVIDER,
+    FREE_ASTROLOGY_API_KEY, ASTRO_OBSERVATION_POINT, ASTRO_AYANAMSHA, CHART_OUTPUT_FORMAT
 )
+from src.chart_normalizer import compact_chart
+from src.dasha import format_dasha_table, timeline_from_chart
 from src.utils import get_lat_lon_offset
-from src.vector_store import get_pinecone_retriever
+from src.services import get_services
+from src.rate_limiter import RateLimitTimeout
+from src.api_cache import ensure_indexes as ensure_cache_indexes, entry_fields, record_access
 
 logger = get_logger(__name__)
 
@@ -66,31 +73,52 @@ def _cache_key(dob, tob, lat, lon, chart_type):
     payload = {"dob": dob, "tob": tob, "lat": lat, "lon": lon, "chart_type": chart_type}
     return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest(), payload
 
+# Per-key locks so concurrent callers (e.g. prefetch + first tool call) share one API request.
+_inflight_locks = {}
+_inflight_guard = threading.Lock()
+
+
+def _key_lock(cache_id):
+    with _inflight_guard:
+        lock = _inflight_locks.get(cache_id)
+        if lock is None:
+            lock = _inflight_locks[cache_id] = threading.Lock()
+        return lock
+
+
 def mongo_cache(func):
     """Caching Decorator."""
     @wraps(func)
     def wrapper(*args, **kwargs):
         dob = kwargs["dob"]; tob = kwargs["tob"]; lat = kwargs["lat"]; lon = kwargs["lon"]; chart_type = kwargs["chart_type"]
         cache_id, payload = _cache_key(dob, tob, lat, lon, chart_type)
-        
-        client = MongoClient(MONGO_URI)
-        col = client[MONGO_DB_NAME][MONGO_API_CACHE_COLLECTION]
-        
-        hit = col.find_one({"_id": cache_id})
-        if hit:
-            client.close()
-            return hit["api_response"]
-        
-        result = func(*args, **kwargs)
-        if result and "error" not in result:
-            col.insert_one({
-                "_id": cache_id, **payload,
-                "api_response": result, "created_at": datetime.now(timezone.utc)
-            })
-        client.close()
-        return result
+        lock = _key_lock(cache_id)
+        with lock:
+            try:
+                return _cached_call(func, cache_id, payload, args, kwargs)
+            finally:
+                with _inflight_guard:
+                    if _inflight_locks.get(cache_id) is lock:
+                        _inflight_locks.pop(cache_id, None)
     return wrapper
 
+
+def _cached_call(func, cache_id, payload, args, kwargs):
+    """Mongo read-through for a single cache key (caller holds the key lock)."""
+    col = get_services().mongo_db()[MONGO_API_CACHE_COLLECTION]
+    ensure_cache_indexes(col)
+
+    hit = col.find_one({"_id": cache_id}, {"api_response": 1})
+    record_cache("api_cache", "mongo", bool(hit))
+    if hit:
+        record_access(col, cache_id)  # batched last_access_at / hits update
+        return hit["api_response"]
+    
+    result = func(*args, **kwargs)
+    if result and "error" not in result:
+        col.insert_one({"_id": cache_id, **payload, "api_response": result, **entry_fields(result)})
+    return result
+
 def _build_payload(dob, tob, lat, lon, tz):
     """Builds standard API payload."""
     year, month, day = [int(x) for x in dob.split("-")]
@@ -103,19 +131,38 @@ def _build_payload(dob, tob, lat, lon, tz):
     }
 
 def _post(url, payload):
+    """POST to FreeAstrologyAPI once the shared rate limiter grants a permit; a 429 pauses all callers."""
     headers = {"Content-Type": "application/json", "x-api-key": FREE_ASTROLOGY_API_KEY}
+    limiter = get_services().rate_limiter
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=30)
-        resp.raise_for_status()
-        try:
-            return resp.json()
-        except ValueError as e:
-            logger.warning(f"Non-JSON response from {url}: {e}")
-            return resp.text  # Handle raw text responses
+        for attempt in range(2):
+            limiter.acquire()
+            resp = requests.post(url, headers=headers, json=payload, timeout=30)
+            if resp.status_code == 429 and attempt == 0:
+                retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+                logger.warning(f"FreeAstrologyAPI rate limited {url}; pausing requests for {retry_after:.0f}s")
+                limiter.throttled(retry_after)
+                continue
+            resp.raise_for_status()
+            try:
+                return resp.json()
+            except ValueError as e:
+                logger.warning(f"Non-JSON response from {url}: {e}")
+                return resp.text  # Handle raw text responses
+    except RateLimitTimeout as e:
+        logger.warning(f"{e}: {url}")
+        return {"error": str(e)}
     except Exception as e:
         logger.exception(f"HTTP POST error to {url}: {e}")
         return {"error": str(e)}
 
+
+def _retry_after_seconds(value, default: float = 5.0) -> float:
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
+
 @mongo_cache
 def _fetch_chart(dob, tob, lat, lon, tz, chart_type):
     """Dynamic fetcher that looks up the endpoint in CHART_CONFIG."""
@@ -126,7 +173,10 @@ def _fetch_chart(dob, tob, lat, lon, tz, chart_type):
     payload = _build_payload(dob, tob, lat, lon, tz)
     
     # 1. Fetch Data
+    started = time.perf_counter()
     data_response = _post(config["data"], payload)
+    failed = data_response is None or not isinstance(data_response, dict) or "error" in data_response
+    CHART_API_SECONDS.observe(time.perf_counter() - started, chart_type=chart_type, status="error" if failed else "ok")
     logger.info(f"Fetched {chart_type} chart data for DOB: {dob}, TOB: {tob}, Lat: {lat}, Lon: {lon}")
     # 2. Validate and surface errors at the top-level so the agent can reliably detect failures
     if data_response is None:
@@ -150,8 +200,10 @@ def _fetch_chart(dob, tob, lat, lon, tz, chart_type):
 
 # -------------------- LangChain Tools (Exposed to Agent) --------------------
 
-def _tool_impl(dob, tob, city, chart_type):
-    """Common logic for all chart tools."""
+def resolve_chart(dob, tob, city, chart_type):
+    """Sanitize inputs, geocode and fetch the full (cached) chart payload."""
+    started = time.perf_counter()
+    status = "error"
     try:
         def _sanitize_str(s):
             if s is None:
@@ -195,16 +247,35 @@ def _tool_impl(dob, tob, city, chart_type):
             raise RuntimeError(
                 "I apologize, but I encountered a technical error while calculating your chart. Please come back tomorrow."
             )
+        status = "ok"
         return result
     except Exception as e:
         logger.exception(f"Tool implementation error for chart_type={chart_type}: {e}")
         # Raise to allow the UI/agent wrapper to present a friendly failure message and avoid hallucinations
         raise
+    finally:
+        CHART_FETCH_SECONDS.observe(time.perf_counter() - started, chart_type=chart_type, status=status)
+
+
+def _tool_impl(dob, tob, city, chart_type):
+    """Common logic for all chart tools.
+
+    The full API payload stays in the Mongo cache; the agent receives the compact
+    planet table unless CHART_OUTPUT_FORMAT=raw or the payload is unrecognized.
+    """
+    result = resolve_chart(dob, tob, city, chart_type)
+    if CHART_OUTPUT_FORMAT != "compact" or not isinstance(result, dict) or "chart_data" not in result:
+        return result
+    table = compact_chart(chart_type, result["chart_data"])
+    if table is None:
+        logger.warning(f"Could not normalize {chart_type} payload; returning raw chart data")
+        return result
+    return table
 
 # --- PRIMARY TOOLS (The Big 3) ---
 
 @tool("chart_d10_career")
-def get_d10_chart(dob: str, tob: str, city: str) -> dict:
+def get_d10_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Dasamsa (D10) chart. 
     USE CASE: Career, Profession, Status, Fame, Promotion, Business.
@@ -213,7 +284,7 @@ def get_d10_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D10")
 
 @tool("chart_d9_marriage")
-def get_d9_chart(dob: str, tob: str, city: str) -> dict:
+def get_d9_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Navamsa (D9) chart. 
     USE CASE: Marriage, Spouse, Relationships, Inner Strength, Partnership.
@@ -222,7 +293,7 @@ def get_d9_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D9")
 
 @tool("chart_d1_general_health")
-def get_d1_chart(dob: str, tob: str, city: str) -> dict:
+def get_d1_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Rasi (D1) / Planetary Chart.
     USE CASE: General Health, Body, Personality, Life Direction, or fallback.
@@ -233,7 +304,7 @@ def get_d1_chart(dob: str, tob: str, city: str) -> dict:
 # --- SECONDARY TOOLS (Wealth, Progeny, etc.) ---
 
 @tool("chart_d2_wealth_hora")
-def get_d2_chart(dob: str, tob: str, city: str) -> dict:
+def get_d2_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Hora (D2) chart. 
     USE CASE: Wealth, Assets, Money, Family Resources.
@@ -242,7 +313,7 @@ def get_d2_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D2")
 
 @tool("chart_d3_siblings_drekkana")
-def get_d3_chart(dob: str, tob: str, city: str) -> dict:
+def get_d3_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Drekkana (D3) chart.
     USE CASE: Siblings, courage, initiative.
@@ -251,7 +322,7 @@ def get_d3_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D3")
 
 @tool("chart_d4_property_chaturthamsa")
-def get_d4_chart(dob: str, tob: str, city: str) -> dict:
+def get_d4_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Chaturthamsa (D4) chart.
     USE CASE: Property, land, happiness/fortune.
@@ -260,7 +331,7 @@ def get_d4_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D4")
 
 @tool("chart_d7_progeny_saptamsa")
-def get_d7_chart(dob: str, tob: str, city: str) -> dict:
+def get_d7_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Saptamsa (D7) chart. 
     USE CASE: Children, Progeny, Pregnancy, Creative Output.
@@ -269,7 +340,7 @@ def get_d7_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D7")
 
 @tool("chart_d24_education_siddhamsa")
-def get_d24_chart(dob: str, tob: str, city: str) -> dict:
+def get_d24_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Siddhamsa (D24) chart. 
     USE CASE: Education, Learning, Degrees, Knowledge.
@@ -278,7 +349,7 @@ def get_d24_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D24")
 
 @tool("chart_d12_parents_dwadasamsa")
-def get_d12_chart(dob: str, tob: str, city: str) -> dict:
+def get_d12_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Dwadasamsa (D12) chart.
     USE CASE: Parents, grandparents, lineage.
@@ -287,7 +358,7 @@ def get_d12_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D12")
 
 @tool("chart_d16_vehicles_shodasamsa")
-def get_d16_chart(dob: str, tob: str, city: str) -> dict:
+def get_d16_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Shodasamsa (D16) chart.
     USE CASE: Vehicles, comforts, luxuries.
@@ -296,7 +367,7 @@ def get_d16_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D16")
 
 @tool("chart_d20_spirituality_vimsamsa")
-def get_d20_chart(dob: str, tob: str, city: str) -> dict:
+def get_d20_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Vimsamsa (D20) chart.
     USE CASE: Spiritual progress, worship, religious involvement.
@@ -305,7 +376,7 @@ def get_d20_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D20")
 
 @tool("chart_d30_misfortunes_trimsamsa")
-def get_d30_chart(dob: str, tob: str, city: str) -> dict:
+def get_d30_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Trimsamsa (D30) chart.
     USE CASE: Misfortunes, diseases, punishments.
@@ -314,7 +385,7 @@ def get_d30_chart(dob: str, tob: str, city: str) -> dict:
     return _tool_impl(dob, tob, city, "D30")
 
 @tool("chart_d60_pastkarma_shashtiamsa")
-def get_d60_chart(dob: str, tob: str, city: str) -> dict:
+def get_d60_chart(dob: str, tob: str, city: str) -> str | dict:
     """
     Fetches Shashtiamsa (D60) chart.
     USE CASE: Past karma, deep-seated tendencies.
@@ -325,7 +396,7 @@ def get_d60_chart(dob: str, tob: str, city: str) -> dict:
 # --- GENERAL FETCHER (Advanced) ---
 
 @tool("chart_varga_specific")
-def get_specific_varga_chart(dob: str, tob: str, city: str, chart_code: str) -> dict:
+def get_specific_varga_chart(dob: str, tob: str, city: str, chart_code: str) -> str | dict:
     """
     Fetches any specific Divisional Chart by its code.
     
@@ -344,16 +415,73 @@ def get_specific_varga_chart(dob: str, tob: str, city: str, chart_code: str) ->
     
     return _tool_impl(dob, tob, city, chart_code.upper())
 
-@tool("bphs_search_pinecone")
-def search_bphs(query: str) -> str:
-    """Search BPHS in Pinecone for interpretation rules."""
-    retriever = get_pinecone_retriever(top_k=4)
+# --- TIMING (computed locally from the cached D1 chart) ---
+
+@tool("dasha_vimshottari")
+def get_vimshottari_dasha(dob: str, tob: str, city: str, from_year: int = 0, years: int = 10) -> str | dict:
+    """
+    Computes the Vimshottari dasha timeline (Mahadasha, Antardasha, Pratyantardasha) from the Moon in the D1 chart.
+    USE CASE: Timing questions - "when will I marry / get a job / have children", current and upcoming periods.
+    ARGS: dob (YYYY-MM-DD), tob (HH:MM), city (str), from_year (start of the window, within 120 years of birth; 0 = today), years (window length).
+    """
+    result = resolve_chart(dob, tob, city, "D1")
+    if isinstance(result, dict) and "error" in result:
+        return result  # e.g. the city could not be geocoded
+    chart_data = result.get("chart_data") if isinstance(result, dict) else None
+    timeline = timeline_from_chart(chart_data)
+    if timeline is None:
+        return {"error": "Could not compute dashas: the D1 chart has no Moon longitude or birth time."}
+    today = datetime.now()
+    if not from_year or int(from_year) == today.year:
+        start = today
+    else:
+        # Only the 120-year cycle from birth has dashas (and keeps dates inside datetime's range)
+        first, last = timeline.birth.year, timeline.birth.year + 120
+        if not first <= int(from_year) <= last:
+            return {"error": f"from_year must be between {first} and {last}, the 120-year dasha cycle from birth."}
+        start = datetime(int(from_year), 1, 1)
+    return format_dasha_table(timeline, start, years=max(1, min(int(years or 10), 40)))
+
+# -------------------- BPHS Retrieval (cached) --------------------
+
+_BPHS_CACHE_SIZE = 256
+_bphs_cache = OrderedDict()
+_bphs_cache_lock = threading.Lock()
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(str(query or "").lower().split())
+
+
+def retrieve_bphs(query: str) -> str:
+    """Search BPHS passages with an in-process LRU cache keyed by the normalized query."""
+    key = _normalize_query(query)
+    with _bphs_cache_lock:
+        if key in _bphs_cache:
+            _bphs_cache.move_to_end(key)
+            record_cache("bphs_search", "memory", True)
+            return _bphs_cache[key]
+    record_cache("bphs_search", "memory", False)
+    started = time.perf_counter()
     try:
         # Use standard retriever API for compatibility across LangChain versions
         # VectorStoreRetriever implements BaseRunnable; prefer public invoke()
-        docs = retriever.invoke(query)
+        docs = get_services().retriever.invoke(query)
         logger.info(f"BPHS search returned {len(docs) if docs else 0} documents with query: {query}")
-        return "\n\n".join([d.page_content for d in docs]) if docs else "No relevant passages found."
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - started, provider=EMBEDDING_PROVIDER, status="ok")
     except Exception as e:
         logger.exception(f"BPHS search error: {e}")
-        return "No relevant passages found."
\ No newline at end of file
+        RETRIEVAL_SECONDS.observe(time.perf_counter() - started, provider=EMBEDDING_PROVIDER, status="error")
+        return "No relevant passages found."
+    result = "\n\n".join([d.page_content for d in docs]) if docs else "No relevant passages found."
+    with _bphs_cache_lock:
+        _bphs_cache[key] = result
+        while len(_bphs_cache) > _BPHS_CACHE_SIZE:
+            _bphs_cache.popitem(last=False)
+    return result
+
+
+@tool("bphs_search_pinecone")
+def search_bphs(query: str) -> str:
+    """Search BPHS in Pinecone for interpretation rules."""
+    return retrieve_bphs(query)
@@ -0,0 +1,176 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from src.config import TRACING_ENABLED, TRACE_SAMPLE_RATE
+
+# Plain logging here: src.logging_utils opens spans, so it must not be imported back
+logger = logging.getLogger(__name__)
+
+_RECENT_TRACES = 256
+
+_current: ContextVar[Optional["Span"]] = ContextVar("jyotish_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+class Trace:
+    """All spans of one sampled chat turn."""
+
+    def __init__(self, session_id: Optional[str]):
+        self.trace_id = _new_id(16)
+        self.session_id = session_id
+        self.spans: List["Span"] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: "Span") -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+class Span:
+    __slots__ = ("name", "trace", "span_id", "parent_id", "attrs", "start", "end", "_token")
+
+    def __init__(self, name: str, trace: Trace, parent_id: Optional[str], attrs: Dict[str, object]):
+        self.name = name
+        self.trace = trace
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = self.end = 0.0
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) * 1000
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current.reset(self._token)
+        if exc is not None:
+            self.attrs["error"] = type(exc).__name__
+        self.trace.add(self)
+        logger.debug("span %s trace=%s %.1fms", self.name, self.trace.trace_id, self.duration_ms)
+        if self.parent_id is None:
+            _finish(self.trace)
+        return False
+
+
+class _NoopSpan:
+    """Stand-in when no sampled trace is active: entering, exiting and set() do nothing."""
+
+    __slots__ = ()
+
+    def set(self, **attrs) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str, **attrs):
+    """Child span of the active span, or a no-op when this turn is not traced."""
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(name, parent.trace, parent.span_id, attrs)
+
+
+def start_trace(name: str, session_id: Optional[str] = None, sample_rate: Optional[float] = None,
+                enabled: Optional[bool] = None):
+    """Root span for a chat turn; sampled per turn with `TRACE_SAMPLE_RATE` when tracing is on."""
+    if not (TRACING_ENABLED if enabled is None else enabled):
+        return NOOP_SPAN
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate < 1.0 and random.random() >= rate:
+        return NOOP_SPAN
+    return Span(name, Trace(session_id), None, {})
+
+
+def current_span():
+    """The active span (to attach attributes to), or the no-op span."""
+    active = _current.get()
+    return active if active is not None else NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current.get()
+    return active.trace.trace_id if active is not None else None
+
+
+# -------------------- Finished traces --------------------
+
+_recent: "OrderedDict[str, Trace]" = OrderedDict()
+_recent_lock = threading.Lock()
+
+
+def _finish(trace: Trace) -> None:
+    if trace.session_id is not None:
+        with _recent_lock:
+            _recent[trace.session_id] = trace
+            _recent.move_to_end(trace.session_id)
+            while len(_recent) > _RECENT_TRACES:
+                _recent.popitem(last=False)
+    if logger.isEnabledFor(logging.INFO):
+        root = next((s for s in trace.spans if s.parent_id is None), None)
+        logger.info(
+            "Trace %s %s %.0fms (%d spans)", trace.trace_id,
+            root.name if root else "?", root.duration_ms if root else 0.0, len(trace.spans),
+        )
+
+
+def last_trace(session_id: str) -> Optional[Trace]:
+    """The session's most recent finished trace, if its last turn was sampled."""
+    with _recent_lock:
+        return _recent.get(session_id)
+
+
+def pop_trace(session_id: str) -> Optional[Trace]:
+    with _recent_lock:
+        return _recent.pop(session_id, None)
+
+
+def breakdown(trace: Trace) -> List[Tuple[int, Span]]:
+    """(depth, span) pairs in start order, children under their parents."""
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in trace.spans:
+        children.setdefault(s.parent_id, []).append(s)
+    out: List[Tuple[int, Span]] = []
+
+    def walk(parent_id: Optional[str], depth: int) -> None:
+        for s in sorted(children.get(parent_id, []), key=lambda s: s.start):
+            out.append((depth, s))
+            walk(s.span_id, depth + 1)
+
+    walk(None, 0)
+    return out
+
+
+def format_breakdown(trace: Trace) -> str:
+    """Indented per-span timings, e.g. for the UI's assistant notes."""
+    lines = [f"trace {trace.trace_id}"]
+    for depth, s in breakdown(trace):
+        attrs = " ".join(f"{k}={v}" for k, v in s.attrs.items())
+        lines.append(f"{'  ' * depth}{s.name:<{max(8, 40 - 2 * depth)}} {s.duration_ms:>8.1f} ms {attrs}".rstrip())
+    return "\n".join(lines)
@@ -3,6 +3,30 @@ import streamlit as st
 
 from langchain_core.messages import HumanMessage
 
+from src.agent import compose_turn_input
+from src.answer_cache import get_answer_cache, record_cached_turn, turn_cache_key
+from src.streaming import ThinkingFilter, stream_agent_turn
+from src.tracing import format_breakdown, pop_trace
+
+
+def _lookup_cached_answer(history, profile, prompt, app_logger):
+    """(cache, key, versions, hit) for this turn; cache failures never block the live path."""
+    cache = get_answer_cache()
+    if cache is None:
+        return None, None, None, None
+    try:
+        # The agent replays stored history (from earlier visits too), so only a user with
+        # none gets an answer that depends on nothing but the birth profile and question
+        first_turn = not history.load_tail(1)
+        keyed = turn_cache_key(profile, prompt, first_turn)
+        if keyed is None:
+            return None, None, None, None
+        key, versions = keyed
+        return cache, key, versions, cache.get(key)
+    except Exception as e:
+        app_logger.warning(f"Answer cache lookup failed: {e}")
+        return None, None, None, None
+
 
 def handle_chat_interaction(agent_executor, session_id, user_profile, app_logger):
     # Chat input
@@ -11,81 +35,77 @@ def handle_chat_interaction(agent_executor, session_id, user_profile, app_logger
         with st.chat_message("user"):
             st.markdown(prompt)
         profile = user_profile
-        composed = (
-            "User Profile:\n"
-            f"DOB: {profile['dob']}\nTime: {profile['tob']}\nCity: {profile['city']}\n\n"
-            "User Input:\n"
-            f"{prompt}\n\n"
+        composed = compose_turn_input(profile, prompt)
+        cache, cache_key, versions, hit = _lookup_cached_answer(
+            agent_executor.get_session_history(session_id), profile, prompt, app_logger
         )
+        if hit:
+            with st.chat_message("assistant"):
+                st.markdown(hit["answer"], unsafe_allow_html=True)
+                if hit["notes"]:
+                    with st.expander("Show assistant notes", expanded=False):
+                        st.markdown("**Hidden reasoning**")
+                        for seg in hit["notes"]:
+                            st.code(seg)
+            try:
+                record_cached_turn(agent_executor.get_session_history(session_id), composed, hit["answer"])
+            except Exception as e:
+                app_logger.warning(f"Failed to record cached answer in history: {e}")
+            app_logger.info(f"Answer served from cache for session {session_id}")
+            return
         with st.chat_message("assistant"):
-            with st.spinner("Consulting charts and classical texts..."):
-                try:
-                    resp = agent_executor.invoke(
-                        {"messages": [HumanMessage(content=composed)]},
-                        {"configurable": {"session_id": session_id}},
-                    )
-
-                    def _block_text(content):
-                        if isinstance(content, str):
-                            return content
-                        if isinstance(content, list):
-                            parts = []
-                            for b in content:
-                                if isinstance(b, dict):
-                                    t = b.get("text")
-                                    if isinstance(t, str):
-                                        parts.append(t)
-                            return "\n".join(parts) if parts else str(content)
-                        return str(content)
-
-                    def _extract_output(r):
-                        if isinstance(r, dict):
-                            out = r.get("output")
-                            if isinstance(out, str) and out:
-                                return out
-                            msgs = r.get("messages")
-                            if isinstance(msgs, list) and msgs:
-                                try:
-                                    from langchain_core.messages import AIMessage as ai_message_cls
-                                except Exception:
-                                    ai_message_cls = None
-                                for m in reversed(msgs):
-                                    if ai_message_cls is not None and isinstance(m, ai_message_cls):
-                                        return _block_text(m.content)
-                                    if isinstance(m, dict) and (m.get("type") == "ai" or m.get("role") == "assistant"):
-                                        return _block_text(m.get("content"))
-                            return str(r)
-                        if hasattr(r, "content"):
-                            return _block_text(getattr(r, "content"))
-                        return str(r)
-
-                    def _sanitize_and_capture_thinking(text):
-                        if not isinstance(text, str):
-                            return "", []
-                        pattern = re.compile(r"<thinking>(.*?)</thinking>", flags=re.DOTALL | re.IGNORECASE)
-                        segments = [m.strip() for m in pattern.findall(text)]
-                        cleaned = pattern.sub("", text)
-                        return cleaned.strip(), segments
-
-                    output = _extract_output(resp)
-                    sanitized_out, thinking_notes_out = _sanitize_and_capture_thinking(output)
-                    st.markdown(sanitized_out or "Sorry, I encountered an error.", unsafe_allow_html=True)
-                    if thinking_notes_out:
-                        with st.expander("Show assistant notes", expanded=False):
+            status = st.status("Consulting charts and classical texts...", expanded=False)
+            placeholder = st.empty()
+            try:
+                visible = ""
+                thinking = ThinkingFilter()
+                for kind, value in stream_agent_turn(
+                    agent_executor,
+                    {"messages": [HumanMessage(content=composed)]},
+                    {"configurable": {"session_id": session_id}},
+                ):
+                    if kind == "model_start":
+                        # A new model step supersedes any text streamed before its tool calls
+                        visible = ""
+                        thinking = ThinkingFilter()
+                        placeholder.empty()
+                    elif kind == "token":
+                        visible += thinking.feed(value)
+                        if visible.strip():
+                            placeholder.markdown(visible + "▌", unsafe_allow_html=True)
+                    elif kind == "tool_start":
+                        status.update(label=value)
+                        status.write(value)
+                visible += thinking.flush()
+                status.update(label="Done", state="complete")
+                placeholder.markdown(visible.strip() or "Sorry, I encountered an error.", unsafe_allow_html=True)
+                trace = pop_trace(session_id)  # set only when this turn was sampled for tracing
+                if thinking.segments or trace:
+                    with st.expander("Show assistant notes", expanded=False):
+                        if thinking.segments:
                             st.markdown("**Hidden reasoning**")
-                            for seg in thinking_notes_out:
+                            for seg in thinking.segments:
                                 st.code(seg)
-                except Exception as e:
-                    msg = str(e)
-                    retry_secs = None
-                    m = re.search(r"retry in\s*([\d\.]+)s", msg, re.IGNORECASE)
-                    if m:
-                        try:
-                            retry_secs = int(float(m.group(1)))
-                        except Exception:
-                            retry_secs = None
-                    friendly = "The Jyotish AI is meditating now, come back later for deeper insights."
-                    if retry_secs:
-                        friendly += " Try again tomorrow."
-                    st.warning(friendly)
-                    app_logger.exception(f"Agent invocation failed: {e}")
+                        if trace:
+                            st.markdown("**Timing**")
+                            st.code(format_breakdown(trace))
+                if cache is not None and visible.strip():
+                    try:
+                        cache.put(cache_key, visible.strip(), versions, thinking.segments)
+                    except Exception as e:
+                        app_logger.warning(f"Failed to store answer in cache: {e}")
+            except Exception as e:
+                status.update(label="Interrupted", state="error")
+                msg = str(e)
+                retry_secs = None
+                m = re.search(r"retry in\s*([\d\.]+)s", msg, re.IGNORECASE)
+                if m:
+                    try:
+                        retry_secs = int(float(m.group(1)))
+                    except Exception:
+                        retry_secs = None
+                friendly = "The Jyotish AI is meditating now, come back later for deeper insights."
+                if retry_secs:
+                    friendly += " Try again tomorrow."
+                st.warning(friendly)
+                app_logger.exception(f"Agent invocation failed: {e}")
@@ -1,76 +1,162 @@
 import json
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import streamlit as st
 
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
 
+from src.chart_svg import chart_from_tool_output, chart_hash, get_render_cache
+from src.config import CHART_SVG_STYLE, HISTORY_RENDER_MESSAGES
+from src.streaming import block_text
+
+_THINKING = re.compile(r"<thinking>(.*?)</thinking>", flags=re.DOTALL | re.IGNORECASE)
+
+_LIMIT_KEY = "history_render_limit"
+_VIEWS_KEY = "history_views"
+
+
+def sanitize_and_capture_thinking(text) -> Tuple[str, List[str]]:
+    if not isinstance(text, str):
+        return "", []
+    segments = [m.strip() for m in _THINKING.findall(text)]
+    return _THINKING.sub("", text).strip(), segments
+
+
+@dataclass
+class MessageView:
+    """Render model for one history bubble; built once per message id and reused across reruns."""
+
+    id: str
+    role: str  # "user" | "assistant" | other message types
+    text: str
+    notes: List[str] = field(default_factory=list)
+    tool_outputs: List[str] = field(default_factory=list)
+    charts: List[Tuple[str, list, str]] = field(default_factory=list)  # (chart type, rows, content hash)
+    _parsed: Optional[list] = field(default=None, repr=False)
+
+    def parsed_tool_outputs(self) -> list:
+        """(is_json, value) per tool output, parsed on first access only."""
+        if self._parsed is None:
+            parsed = []
+            for note in self.tool_outputs:
+                try:
+                    parsed.append((True, json.loads(note)))
+                except Exception:
+                    parsed.append((False, note))
+            self._parsed = parsed
+        return self._parsed
+
+
+def _turn_aligned(pairs: Sequence[Tuple[object, object]]) -> Sequence[Tuple[object, object]]:
+    """Drop leading AI/tool messages so a page never opens mid-turn."""
+    for i, (_, msg) in enumerate(pairs):
+        if isinstance(msg, HumanMessage):
+            return pairs[i:]
+    return pairs
+
+
+def _charts(tool_outputs: Sequence[str]) -> List[Tuple[str, list, str]]:
+    charts = []
+    for text in tool_outputs:
+        chart = chart_from_tool_output(text)
+        if chart:
+            charts.append((*chart, chart_hash(*chart)))
+    return charts
+
+
+def _render_charts(charts: Sequence[Tuple[str, list, str]]) -> None:
+    cache = get_render_cache()
+    if cache is None or not charts:
+        return
+    cols = st.columns(min(len(charts), 3))
+    for i, (chart_type, rows, digest) in enumerate(charts):
+        with cols[i % len(cols)]:
+            st.markdown(cache.svg_for(chart_type, rows, CHART_SVG_STYLE, digest), unsafe_allow_html=True)
+
+
+def build_views(pairs: Sequence[Tuple[object, object]], memo: Dict[str, MessageView]) -> List[MessageView]:
+    """Turn (doc id, message) pairs into render models, reusing `memo` entries by message id.
+
+    Tool messages are not rendered as bubbles; their outputs attach to the next assistant
+    message's notes.
+    """
+    views, tool_buffer = [], []
+    for doc_id, msg in pairs:
+        key = str(doc_id)
+        if isinstance(msg, ToolMessage):
+            tool_buffer.append(key)
+            if key not in memo:
+                memo[key] = MessageView(key, "tool", block_text(msg.content))
+            continue
+        view = memo.get(key)
+        if view is None:
+            if isinstance(msg, AIMessage):
+                text, notes = sanitize_and_capture_thinking(block_text(msg.content))
+                tools = [memo[t].text for t in tool_buffer]
+                view = MessageView(key, "assistant", text, notes, tools, _charts(tools))
+            elif isinstance(msg, HumanMessage):
+                view = MessageView(key, "user", block_text(msg.content))
+            else:
+                view = MessageView(key, getattr(msg, "type", "assistant"), block_text(msg.content))
+            memo[key] = view
+        if view.role == "assistant":
+            tool_buffer = []
+        views.append(view)
+    return views
+
+
+def _render_view(view: MessageView) -> None:
+    if view.role == "user":
+        if view.text:
+            with st.chat_message("user"):
+                st.markdown(view.text, unsafe_allow_html=True)
+        return
+    with st.chat_message(view.role):
+        if view.text:
+            st.markdown(view.text, unsafe_allow_html=True)
+        _render_charts(view.charts)
+        if view.notes or view.tool_outputs:
+            with st.expander("Show assistant notes", expanded=False):
+                if view.notes:
+                    st.markdown("**Hidden reasoning**")
+                    for seg in view.notes:
+                        st.code(seg)
+                # Expander bodies execute on every rerun; tool outputs render only once asked for
+                if view.tool_outputs and st.toggle(
+                    f"Show tool outputs ({len(view.tool_outputs)})", key=f"history-tools-{view.id}"
+                ):
+                    for is_json, value in view.parsed_tool_outputs():
+                        if is_json:
+                            st.json(value)
+                        else:
+                            st.code(str(value))
+
 
 def render_session_history(agent_executor, session_id, app_logger):
-    # Display previous chat messages (from Mongo history)
+    # Display the newest page(s) of chat messages (from Mongo history); "Load older" widens the window
     try:
         history = agent_executor.get_session_history(session_id)
+        limit = st.session_state.get(_LIMIT_KEY, HISTORY_RENDER_MESSAGES)
+        memo = st.session_state.setdefault(_VIEWS_KEY, {})
 
-        def _msg_block_text(content):
-            if isinstance(content, str):
-                return content
-            if isinstance(content, list):
-                parts = []
-                for b in content:
-                    if isinstance(b, dict):
-                        t = b.get("text")
-                        if isinstance(t, str):
-                            parts.append(t)
-                    elif isinstance(b, str):
-                        parts.append(b)
-                return "\n".join(parts) if parts else str(content)
-            return str(content)
-
-        def _sanitize_and_capture_thinking(text):
-            if not isinstance(text, str):
-                return "", []
-            import re
-            pattern = re.compile(r"<thinking>(.*?)</thinking>", flags=re.DOTALL | re.IGNORECASE)
-            segments = [m.strip() for m in pattern.findall(text)]
-            cleaned = pattern.sub("", text)
-            return cleaned.strip(), segments
-
-        tool_notes_buffer = []
-        for msg in history.messages:
-            # Skip rendering ToolMessage bubble; buffer for next AIMessage expander
-            if isinstance(msg, ToolMessage):
-                tool_notes_buffer.append(_msg_block_text(getattr(msg, "content", "")))
-                continue
-            # Human/user message
-            if isinstance(msg, HumanMessage):
-                text = _msg_block_text(getattr(msg, "content", ""))
-                if text:
-                    with st.chat_message("user"):
-                        st.markdown(text, unsafe_allow_html=True)
-                continue
-            # Assistant message with hidden notes
-            if isinstance(msg, AIMessage):
-                raw = _msg_block_text(getattr(msg, "content", ""))
-                sanitized, thinking_notes = _sanitize_and_capture_thinking(raw)
-                with st.chat_message("assistant"):
-                    if sanitized:
-                        st.markdown(sanitized, unsafe_allow_html=True)
-                    if thinking_notes or tool_notes_buffer:
-                        with st.expander("Show assistant notes", expanded=False):
-                            if thinking_notes:
-                                st.markdown("**Hidden reasoning**")
-                                for seg in thinking_notes:
-                                    st.code(seg)
-                            if tool_notes_buffer:
-                                st.markdown("**Tool outputs**")
-                                for note in tool_notes_buffer:
-                                    try:
-                                        parsed = json.loads(note)
-                                        st.json(parsed)
-                                    except Exception:
-                                        st.code(str(note))
-                    tool_notes_buffer = []
-                continue
-            # Fallback for unknown message types
-            with st.chat_message(getattr(msg, "type", "assistant")):
-                st.markdown(_msg_block_text(getattr(msg, "content", "")), unsafe_allow_html=True)
+        # One extra message tells us whether anything older exists
+        pairs = history.load_tail(limit + 1)
+        has_older = len(pairs) > limit
+        if has_older:
+            pairs = _turn_aligned(pairs[1:])
+
+        if has_older and st.button("Load older messages", key="history-load-older"):
+            st.session_state[_LIMIT_KEY] = limit + HISTORY_RENDER_MESSAGES
+            st.rerun()
+
+        views = build_views(pairs, memo)
+        # Keep the memo bounded by the window, not by the whole conversation
+        live = {str(doc_id) for doc_id, _ in pairs}
+        for key in [k for k in memo if k not in live]:
+            del memo[key]
+        for view in views:
+            _render_view(view)
     except Exception as e:
         app_logger.warning(f"Failed to load chat history: {e}")
@@ -0,0 +1,29 @@
+from typing import Dict
+
+import streamlit as st
+
+from src.config import METRICS_FILE, METRICS_FILE_INTERVAL_SECONDS, METRICS_PORT
+from src.metrics import start_metrics_exporter
+from src.services import Services, get_services
+
+
+@st.cache_resource(show_spinner=False)
+def get_app_services() -> Services:
+    """The service container, held once per server process and shared by every browser session."""
+    start_metrics_exporter(METRICS_PORT, METRICS_FILE, METRICS_FILE_INTERVAL_SECONDS)
+    return get_services()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _health() -> Dict[str, str]:
+    # Reruns happen on every widget interaction; ping Mongo at most once a minute
+    return get_app_services().health()
+
+
+def check_services(app_logger) -> Services:
+    """Return the shared services, warning in the UI when a started resource is unhealthy."""
+    for name, state in _health().items():
+        if state.startswith("error"):
+            app_logger.warning(f"Service {name} unhealthy: {state}")
+            st.warning(f"Backend service '{name}' is unavailable; some features may not work.", icon="⚠️")
+    return get_app_services()
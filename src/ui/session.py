@@ -2,6 +2,7 @@ from datetime import datetime
 import streamlit as st
 
 from src.agent import create_agent_executor
+from src.prefetch import start_prefetch
 
 
 def init_session_state():
@@ -34,6 +35,8 @@ def render_session_form_and_create_agent(app_logger):
                         "gender": gender,
                     }
                     st.session_state.agent_executor = create_agent_executor(st.session_state.session_id, gender)
+                    # Warm geocoding + D1/D9/D10 while the user types the first question
+                    start_prefetch(st.session_state.session_id, st.session_state.user_profile)
                     st.rerun()
                 else:
                     st.error("Please fill in all fields.")
@@ -1,8 +1,14 @@
 import streamlit as st
 
+from src.prefetch import cancel_prefetch
+from src.tool_execution import abort_turn
+
 
 def render_end_session(app_logger):
     if st.button("End Session"):
         app_logger.info("Ending session and clearing state")
+        if st.session_state.get("session_id"):
+            cancel_prefetch(st.session_state.session_id)
+            abort_turn(st.session_state.session_id)
         st.session_state.clear()
         st.rerun()
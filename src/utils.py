@@ -1,13 +1,26 @@
-from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderUnavailable, GeocoderTimedOut
-from timezonefinder import TimezoneFinder
 from datetime import datetime
 import pytz
 import time
+import threading
 from src.logging_utils import get_logger, log_call
+from src.metrics import GEOCODE_SECONDS, record_cache
+from src.services import get_services
 
 logger = get_logger(__name__)
 
+# Real geocoder results are cached per process; failures and static fallbacks are not, so a
+# transient outage is retried on the next call instead of pinning fallback coordinates.
+_GEOCODE_CACHE = {}
+_GEOCODE_CACHE_MAX = 1024
+_geocode_lock = threading.Lock()
+
+def _cache_geocode(city_name: str, coords):
+    with _geocode_lock:
+        if len(_GEOCODE_CACHE) >= _GEOCODE_CACHE_MAX:
+            _GEOCODE_CACHE.pop(next(iter(_GEOCODE_CACHE)))
+        _GEOCODE_CACHE[city_name] = coords
+
 # Best-effort static fallbacks for common Nepal cities to avoid geocoding outages
 CITY_COORD_FALLBACKS = {
     "Kathmandu, Nepal": (27.7172, 85.3240),
@@ -23,9 +36,18 @@ def get_lat_lon_offset(city_name: str, date_object: datetime):
     Returns (lat, lon, utc_offset_hours) for a city on the given historical date.
     Handles DST and historical timezone changes.
     """
+    started = time.perf_counter()
+    source = "failed"
     try:
+        cached = _GEOCODE_CACHE.get(city_name)
+        record_cache("geocode", "memory", cached is not None)
+        if cached is not None:
+            lat, lon = cached
+            source = "memory"
+            return _with_offset(lat, lon, date_object)
+
         logger.info(f"Geocoding city '{city_name}' for date {date_object}")
-        geolocator = Nominatim(user_agent="vedic-astro-bot", timeout=10)
+        geolocator = get_services().geocoder
 
         # Retry geocoding a few times to handle transient timeouts
         location = None
@@ -54,22 +76,32 @@ def get_lat_lon_offset(city_name: str, date_object: datetime):
 
             if fallback:
                 lat, lon = fallback
+                source = "fallback"
                 logger.warning(f"Using fallback coordinates for '{city_name}': (lat={lat}, lon={lon})")
             else:
                 logger.warning("City geocode not found and no fallback available")
                 return None, None, None
         else:
             lat, lon = location.latitude, location.longitude
-        tz_name = TimezoneFinder().timezone_at(lng=lon, lat=lat)
-        if not tz_name:
-            logger.warning("Timezone not found; returning lat/lon without offset")
-            return lat, lon, None
-
-        tz = pytz.timezone(tz_name)
-        # Localize to compute historical offset (DST-aware)
-        localized = tz.localize(date_object, is_dst=None)
-        offset_hours = localized.utcoffset().total_seconds() / 3600.0
-        return lat, lon, offset_hours
+            source = "nominatim"
+            _cache_geocode(city_name, (lat, lon))
+        return _with_offset(lat, lon, date_object)
     except Exception:
         logger.exception("Failed to compute lat/lon/offset")
+        source = "failed"
         return None, None, None
+    finally:
+        GEOCODE_SECONDS.observe(time.perf_counter() - started, source=source)
+
+
+def _with_offset(lat: float, lon: float, date_object: datetime):
+    tz_name = get_services().timezone_finder.timezone_at(lng=lon, lat=lat)
+    if not tz_name:
+        logger.warning("Timezone not found; returning lat/lon without offset")
+        return lat, lon, None
+
+    tz = pytz.timezone(tz_name)
+    # Localize to compute historical offset (DST-aware)
+    localized = tz.localize(date_object, is_dst=None)
+    offset_hours = localized.utcoffset().total_seconds() / 3600.0
+    return lat, lon, offset_hours
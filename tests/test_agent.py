@@ -0,0 +1,88 @@
+import pytest
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import src.agent as agent_mod
+import src.llm_factory as llm_factory
+import src.services as services
+import src.tool_execution as tool_execution
+
+
+class _FakeChatModel(FakeMessagesListChatModel):
+    seen: list = []
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.seen.append(messages)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+@pytest.fixture
+def fake_agent(monkeypatch):
+    model = _FakeChatModel(responses=[AIMessage(content="first"), AIMessage(content="second")], seen=[])
+    builds = []
+    monkeypatch.setattr(llm_factory, "get_chat_model", lambda tier="fast": builds.append(1) or model)
+    monkeypatch.setattr(agent_mod, "_shared_agent", None)
+    monkeypatch.setattr(services, "_services", None)
+    monkeypatch.setattr(agent_mod, "_load_system_template", lambda: "SYS for {gender}")
+    histories = {}
+    monkeypatch.setattr(agent_mod, "get_session_history", lambda sid: histories.setdefault(sid, InMemoryChatMessageHistory()))
+    return model, builds, histories
+
+
+def test_sessions_share_one_graph_with_per_session_context(fake_agent):
+    model, builds, histories = fake_agent
+    a = agent_mod.create_agent_executor("a@example.com", "Female")
+    b = agent_mod.create_agent_executor("b@example.com", "Male")
+
+    a.invoke({"messages": [HumanMessage("q1")]}, {"configurable": {"session_id": "a@example.com"}})
+    b.invoke({"messages": [HumanMessage("q2")]}, {"configurable": {"session_id": "b@example.com"}})
+
+    assert builds == [1]
+    prompts = [m[0].content for m in model.seen]
+    assert [p.rsplit("User gender: ", 1)[1].split(".")[0] for p in prompts] == ["Female", "Male"]
+    assert set(histories) == {"a@example.com", "b@example.com"}
+
+
+def test_history_is_replayed_to_model_and_stored_once(fake_agent):
+    model, _, histories = fake_agent
+    a = agent_mod.create_agent_executor("a@example.com", "Female")
+    config = {"configurable": {"session_id": "a@example.com"}}
+
+    a.invoke({"messages": [HumanMessage("q1")]}, config)
+    a.invoke({"messages": [HumanMessage("q2")]}, config)
+
+    assert [m.content for m in model.seen[1][1:]] == ["q1", "first", "q2"]
+    assert [m.content for m in histories["a@example.com"].messages] == ["q1", "first", "q2", "second"]
+    assert "a@example.com" not in tool_execution._turns  # turn scopes do not outlive their turn
+
+
+def test_render_system_prompt_appends_context_without_placeholder():
+    out = agent_mod.render_system_prompt("Prompt with {input}", "Male")
+    assert out.startswith("Prompt with {input}")
+    assert "User gender: Male" in out
+
+
+def test_system_prompt_has_byte_stable_prefix_across_genders():
+    template = "Intro.\n- **User Gender:** {gender}\nRules follow."
+    male = agent_mod.render_system_prompt(template, "Male")
+    female = agent_mod.render_system_prompt(template, "Female")
+    static = agent_mod.static_system_prompt(template)
+    assert male.startswith(static) and female.startswith(static)
+    assert "Male" not in static and "{gender}" not in static
+
+
+def test_system_template_is_read_from_configured_repo(monkeypatch):
+    asked = []
+
+    class _Store:
+        def get(self, name):
+            asked.append(name)
+            return "from snapshot"
+
+    monkeypatch.setattr(agent_mod, "get_prompt_store", lambda: _Store())
+    assert agent_mod._load_system_template() == "from snapshot"
+    assert asked == [agent_mod.JYOTISH_AI_PROMPT_REPO]
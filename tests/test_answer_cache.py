@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+from langchain_core.messages import AIMessage, HumanMessage
+
+import src.answer_cache as answer_cache
+from src.answer_cache import AnswerCache, answer_key, record_cached_turn, turn_cache_key
+from src.chat_memory import WindowedChatHistory
+
+PROFILE = {"dob": "1990-01-01", "tob": "6:30", "city": "Kathmandu, Nepal", "gender": "Male"}
+VERSIONS = {"prompt_version": "p1", "model": "openai:gpt-4.1-nano", "index_version": "idx:gemini:1"}
+
+
+def test_key_ignores_formatting_but_not_versions():
+    key = answer_key(PROFILE, "What does my D10 say about my career?", VERSIONS)
+    same = dict(PROFILE, tob="06:30:00", city="  kathmandu nepal")
+    assert answer_key(same, "  what does my d10 say about my   career", VERSIONS) == key
+    assert answer_key(PROFILE, "What does my D9 say?", VERSIONS) != key
+    assert answer_key(dict(PROFILE, gender="Female"), "What does my D10 say about my career?", VERSIONS) != key
+    assert answer_key(PROFILE, "What does my D10 say about my career?", dict(VERSIONS, prompt_version="p2")) != key
+
+
+def test_put_get_ttl_and_invalidation():
+    cache = AnswerCache(mongomock.MongoClient(), ttl_seconds=60)
+    cache.put("k1", "Your career shines.", VERSIONS, ["notes"])
+    cache.put("k2", "Old prompt answer.", dict(VERSIONS, prompt_version="p0"))
+    assert cache.get("k1") == {"answer": "Your career shines.", "notes": ["notes"]}
+
+    cache.collection.update_one({"_id": "k1"}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    assert cache.get("k1") is None
+
+    assert cache.purge_stale({"prompt_version": "p1"}) == 1
+    assert cache.get("k2") is None
+    cache.put("k3", "x", VERSIONS)
+    cache.invalidate(index_version="idx:gemini:1")
+    assert cache.collection.count_documents({}) == 0
+
+
+def test_first_turn_scope_and_recording(monkeypatch):
+    monkeypatch.setattr(answer_cache, "current_versions", lambda: VERSIONS)
+    key, versions = turn_cache_key(PROFILE, "Career?", first_turn=True)
+    assert versions == VERSIONS and key == answer_key(PROFILE, "Career?", VERSIONS)
+    assert turn_cache_key(PROFILE, "Career?", first_turn=False) is None
+
+    history = WindowedChatHistory("user@example.com", client=mongomock.MongoClient(), summarize_async=False)
+    record_cached_turn(history, "User Profile: ...", "Cached answer")
+    msgs = history.load_all()
+    assert isinstance(msgs[0], HumanMessage) and isinstance(msgs[1], AIMessage)
+
+    monkeypatch.setattr(answer_cache, "ANSWER_CACHE_SCOPE", "always")
+    assert turn_cache_key(PROFILE, "Career?", first_turn=False)[0] == key
+
+
+def test_session_with_stored_history_neither_reads_nor_writes_shared_answers(monkeypatch):
+    from src.ui import chat as ui_chat
+
+    client = mongomock.MongoClient()
+    cache = AnswerCache(client)
+    monkeypatch.setattr(answer_cache, "current_versions", lambda: VERSIONS)
+    monkeypatch.setattr(ui_chat, "get_answer_cache", lambda: cache)
+    key = answer_key(PROFILE, "Career?", VERSIONS)
+    cache.put(key, "Cached answer", VERSIONS)
+
+    fresh = WindowedChatHistory("new@example.com", client=client, summarize_async=False)
+    _, hit_key, _, hit = ui_chat._lookup_cached_answer(fresh, PROFILE, "Career?", answer_cache.logger)
+    assert hit_key == key and hit["answer"] == "Cached answer"
+
+    # History from an earlier visit is replayed to the model, so the shared entry is off limits
+    returning = WindowedChatHistory("user@example.com", client=client, summarize_async=False)
+    returning.add_messages([HumanMessage("old question"), AIMessage("old answer")])
+    # No cache handle and no key: the UI neither serves the hit nor stores its live answer
+    assert ui_chat._lookup_cached_answer(returning, PROFILE, "Career?", answer_cache.logger) == (None, None, None, None)
@@ -0,0 +1,165 @@
+import asyncio
+import json
+
+import pytest
+from starlette.testclient import TestClient
+
+import src.api.app as api
+import src.prefetch as prefetch
+from bench.standins import offline_stack, reset_caches
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, "API_AUTH_ENABLED", False)
+    monkeypatch.setattr(prefetch, "PREFETCH_ENABLED", False)
+    with offline_stack() as stack:
+        reset_caches(stack)
+        with TestClient(api.create_app()) as c:
+            c.stack = stack
+            yield c
+
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def _session(client, **overrides):
+    body = {"dob": "1990-05-01", "tob": "06:30", "city": "New Delhi, India", "gender": "female", **overrides}
+    return client.post("/sessions", json=body)
+
+
+def test_session_chart_and_streamed_turn(client):
+    created = _session(client)
+    assert created.status_code == 201
+    sid = created.json()["session_id"]
+    assert sid.startswith(api.SESSION_PREFIX)
+    assert client.get(f"/sessions/{sid}").json()["profile"]["gender"] == "Female"
+
+    chart = client.get(f"/sessions/{sid}/charts/d9", params={"style": "south"})
+    assert chart.status_code == 200
+    assert chart.json()["chart"].startswith("D9 |") and chart.json()["svg"].startswith("<svg")
+
+    turn = client.post(f"/sessions/{sid}/turns", json={"message": "How will my career grow?"})
+    assert turn.headers["content-type"].startswith("text/event-stream")
+    events = _events(turn)
+    assert ("tool", {"label": "Fetching D10 chart…"}) in events
+    kind, done = events[-1]
+    assert kind == "done" and done["answer"].startswith("Answer:") and not done["cached"]
+    assert done["notes"] and "<thinking>" not in done["answer"]
+
+    messages = client.get(f"/sessions/{sid}/messages").json()["messages"]
+    assert [m["role"] for m in messages][0] == "human" and messages[-1]["role"] == "ai"
+    assert "<thinking>" not in messages[-1]["content"]
+
+
+def test_validation_and_unknown_session(client):
+    assert _session(client, dob="01/05/1990").status_code == 400
+    assert _session(client, gender="robot").status_code == 400
+    assert client.get("/sessions/nope").status_code == 404
+    sid = _session(client).json()["session_id"]
+    assert client.get(f"/sessions/{sid}/charts/D99").status_code == 404
+    assert client.post(f"/sessions/{sid}/turns", json={"message": "  "}).status_code == 400
+
+
+def test_session_ids_cannot_address_streamlit_histories(client):
+    assert _session(client, session_id="user@example.com").status_code == 400
+    # A session stored under an email before ids were namespaced is not served
+    store = api._store()
+    store.collection.insert_one({"_id": "user@example.com", "profile": {"gender": "Other"}})
+    assert client.get("/sessions/user@example.com").status_code == 404
+    assert client.get("/sessions/user@example.com/messages").status_code == 404
+
+
+def test_turn_lease_is_shared_across_workers(client):
+    sid = _session(client).json()["session_id"]
+    worker_a, worker_b = api._store(), api._store()
+    lease = worker_a.acquire_turn(sid)
+    assert lease and worker_b.acquire_turn(sid) is None
+    assert client.post(f"/sessions/{sid}/turns", json={"message": "Career?"}).status_code == 409
+
+    worker_b.release_turn(sid, "not-the-holder")
+    assert worker_b.acquire_turn(sid) is None
+    worker_a.release_turn(sid, lease)
+    assert client.post(f"/sessions/{sid}/turns", json={"message": "Career?"}).status_code == 200
+    # A worker that died mid-turn leaves an expiring lease behind
+    assert worker_a.acquire_turn(sid, ttl_seconds=-1)
+    assert worker_b.acquire_turn(sid) is not None
+
+
+def test_turn_lease_is_renewed_while_streaming_and_released_on_disconnect(client, monkeypatch):
+    monkeypatch.setattr(api, "API_TURN_LEASE_SECONDS", 0.3)
+    sid = _session(client).json()["session_id"]
+
+    async def run():
+        loop, renewed = asyncio.get_running_loop(), asyncio.Event()
+
+        class _Store(api.SessionStore):
+            def renew_turn(self, *args):
+                ok = super().renew_turn(*args)
+                loop.call_soon_threadsafe(renewed.set)
+                return ok
+
+        store = _Store(api._store().collection)
+
+        async def slow_turn():
+            await renewed.wait()  # the turn outlives a renewal interval
+            assert store.acquire_turn(sid) is None  # still held after renewing
+            yield "event: done\ndata: {}\n\n"
+
+        async def connected():
+            await asyncio.Event().wait()
+
+        async def sent(message):
+            pass
+
+        async def gone(message):
+            raise OSError("client disconnected before the response started")
+
+        lease = store.acquire_turn(sid)
+        await api.LeasedEventStream(slow_turn(), store, sid, lease)({"type": "http"}, connected, sent)
+        # A client that vanished before the first byte does not leave the session blocked
+        lease = store.acquire_turn(sid)
+        assert lease
+        with pytest.raises(OSError):
+            await api.LeasedEventStream(slow_turn(), store, sid, lease)({"type": "http"}, connected, gone)
+        assert store.acquire_turn(sid) is not None
+
+    asyncio.run(run())
+
+
+def test_bearer_token_is_the_app_password(client, monkeypatch):
+    monkeypatch.setattr(api, "API_AUTH_ENABLED", True)
+    monkeypatch.setattr(api, "_auth_cache", {"hash": None, "at": 0.0})
+    monkeypatch.setattr(api, "get_active_password", lambda: api.hash_password("s3cret"))
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    ok = client.get("/metrics", headers={"Authorization": "Bearer s3cret"})
+    assert ok.status_code == 200 and "jyotish_" in ok.text
+    assert client.get("/healthz").status_code == 200
+
+
+def test_many_concurrent_turns_in_one_worker(client):
+    import asyncio
+
+    import httpx
+
+    app = client.app
+    sids = [_session(client, dob=f"1990-05-{i + 1:02d}").json()["session_id"] for i in range(8)]
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+            return await asyncio.gather(*(
+                http.post(f"/sessions/{sid}/turns", json={"message": "Compare my marriage and career"})
+                for sid in sids
+            ))
+
+    responses = asyncio.run(run())
+    finals = [_events(r)[-1] for r in responses]
+    assert all(kind == "done" and body["answer"] for kind, body in finals)
+    assert client.stack.stats["mongo_clients"] == 1
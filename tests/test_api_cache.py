@@ -0,0 +1,99 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+from pymongo.errors import OperationFailure
+
+import src.api_cache as api_cache
+from src.api_cache import AccessTracker, backfill, cache_stats, entry_fields, prune
+
+
+def _seed(col, n=6):
+    now = datetime.now(timezone.utc)
+    for i in range(n):
+        result = {"output": [{"i": i, "pad": "x" * 100}]}
+        doc = {"_id": f"k{i}", "chart_type": "D1" if i % 2 else "D9", "api_response": result, **entry_fields(result)}
+        doc["created_at"] = doc["last_access_at"] = now - timedelta(days=10 * i)
+        col.insert_one(doc)
+
+
+class _ReadOnlyCollection:
+    """Collection whose index creation fails, like one reached with a read-only user."""
+
+    def __init__(self):
+        self.attempts = 0
+
+    def create_index(self, *args, **kwargs):
+        self.attempts += 1
+        raise OperationFailure("not authorized")
+
+
+def test_failed_index_creation_is_not_retried_per_lookup(monkeypatch):
+    monkeypatch.setattr(api_cache, "_indexes_checked", False)
+    col = _ReadOnlyCollection()
+    for _ in range(3):
+        api_cache.ensure_indexes(col, idle_ttl_days=0)
+    assert col.attempts == 1
+
+
+def test_full_access_buffer_is_flushed_off_the_request_thread():
+    col = mongomock.MongoClient().db.api_cache
+    _seed(col, 2)
+    written, writers = threading.Event(), []
+    update_many = col.update_many
+
+    def tracked_update_many(*args, **kwargs):
+        writers.append(threading.current_thread())
+        result = update_many(*args, **kwargs)
+        written.set()
+        return result
+
+    col.update_many = tracked_update_many
+    tracker = AccessTracker(flush_seconds=3600, max_pending=2)
+    tracker.record(col, "k0")
+    tracker.record(col, "k1")
+    assert written.wait(5)
+    assert threading.current_thread() not in writers
+    assert col.find_one({"_id": "k1"})["hits"] == 1
+
+
+def test_access_tracker_batches_hits():
+    col = mongomock.MongoClient().db.api_cache
+    _seed(col, 2)
+    tracker = AccessTracker(flush_seconds=3600, max_pending=100)
+    for _ in range(3):
+        tracker.record(col, "k1")
+    tracker.record(col, "k0")
+    assert col.find_one({"_id": "k1"})["hits"] == 0  # still buffered
+    assert tracker.flush() == 2
+    k1 = col.find_one({"_id": "k1"})
+    assert k1["hits"] == 3
+    assert k1["last_access_at"] > datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=1)
+
+
+def test_prune_expires_idle_then_evicts_least_recently_used():
+    col = mongomock.MongoClient().db.api_cache
+    _seed(col)  # last access 0, 10, ..., 50 days ago
+    result = prune(col, idle_ttl_days=35, max_entries=2, max_mb=0)
+    assert result["expired"] == 2
+    assert result["evicted_entries"] == 2
+    assert sorted(d["_id"] for d in col.find()) == ["k0", "k1"]
+
+    size = col.find_one({"_id": "k0"})["size_bytes"]
+    prune(col, idle_ttl_days=0, max_entries=0, max_mb=(size + 1) / 1048576)
+    assert [d["_id"] for d in col.find()] == ["k0"]
+
+
+def test_stats_per_chart_type_and_backfill():
+    col = mongomock.MongoClient().db.api_cache
+    _seed(col, 4)
+    col.insert_one({"_id": "legacy", "chart_type": "D9", "api_response": {"a": 1},
+                    "created_at": datetime.now(timezone.utc)})
+    col.update_one({"_id": "k1"}, {"$set": {"hits": 3}})
+    assert backfill(col) == 1
+    report = cache_stats(col)
+    d1, d9 = report["charts"]["D1"], report["charts"]["D9"]
+    assert (d1["entries"], d9["entries"]) == (2, 3)
+    assert d1["hit_rate"] == 3 / 5
+    assert d9["ages"] == {"<1d": 2, "7-30d": 1}
+    assert report["total"]["bytes"] == sum(d["size_bytes"] for d in col.find())
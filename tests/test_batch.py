@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+from bench.standins import offline_stack, reset_caches
+from src.batch import BatchRunner, load_profiles, load_template
+
+TEMPLATE = os.path.join(os.path.dirname(__file__), "..", "data", "report_templates", "full_life.json")
+
+
+def _write_profiles(path):
+    path.write_text(
+        "id,name,dob,tob,city,gender\n"
+        "a1,Asha,1990-05-17,06:30,\"Mumbai, India\",Female\n"
+        "b2,Bela,1990-05-17,6:30,\"mumbai, india\",female\n"  # same native as a1
+        "c3,Chet,1984-11-02,22:10,\"New Delhi, India\",Male\n"
+    )
+    return str(path)
+
+
+def test_load_template_and_profiles_validate(tmp_path):
+    template = load_template(TEMPLATE)
+    assert template.name == "full_life" and template.questions
+    bad = tmp_path / "t.json"
+    bad.write_text(json.dumps({"topics": [{"title": "X", "questions": ["q"], "charts": ["D99"]}]}))
+    with pytest.raises(ValueError, match="D99"):
+        load_template(str(bad))
+    missing = tmp_path / "p.csv"
+    missing.write_text("id,dob,tob,city\nx,1990-01-01,,Delhi\n")
+    with pytest.raises(ValueError, match="tob"):
+        load_profiles(str(missing))
+
+
+def test_batch_dedupes_natives_and_resumes(tmp_path):
+    profiles = load_profiles(_write_profiles(tmp_path / "natives.csv"))
+    template = load_template(TEMPLATE)
+    out = tmp_path / "reports"
+    with offline_stack() as stack:
+        reset_caches(stack)
+        summary = BatchRunner(template, str(out), workers=2).run(profiles)
+        assert (summary.done, summary.deduped, summary.failed) == (2, 1, 0)
+        # Warm-up fetched each unique native's template charts once; the agent's chart calls hit the cache
+        charts = {c for t in template.topics for c in t.charts}
+        assert stack.api.requests == 2 * len(charts)
+        assert summary.cost_per_report and summary.cost_per_report > 0
+
+        b2 = (out / "b2.md").read_text()
+        assert b2.startswith("# Full Life Reading: Bela")
+        assert b2.count("### ") == len(template.questions)
+        assert "<thinking>" not in b2
+        assert not list(out.glob("*.partial"))
+
+        os.remove(out / "c3.md")
+        again = BatchRunner(template, str(out), workers=2).run(profiles)
+        assert (again.skipped, again.done, again.deduped) == (2, 1, 0)
+    entries = [json.loads(line) for line in (out / "manifest.jsonl").read_text().splitlines()]
+    assert [e["id"] for e in entries if e["status"] == "deduped"] == ["b2"]
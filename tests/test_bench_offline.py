@@ -0,0 +1,65 @@
+import copy
+
+import src.services as services
+import src.tools as tools
+from bench import e2e
+from bench.standins import offline_stack, reset_caches
+
+
+def test_offline_turn_uses_stand_ins_and_restores_state():
+    original_services = services._services
+    original_url = tools.CHART_CONFIG["D1"]["data"]
+    with offline_stack() as stack:
+        assert tools.CHART_CONFIG["D1"]["data"].startswith(stack.api.base_url)
+        reset_caches(stack)
+        e2e._single_chart(stack, 0)
+        assert stack.api.requests == 1  # the D10 chart; the model routes the career question there
+        assert stack.geocoder.calls == 1
+    assert services._services is original_services
+    assert tools.CHART_CONFIG["D1"]["data"] == original_url
+
+
+def test_run_reports_stages_and_allocations():
+    report = e2e.run(iterations=2, names=["tool_impl_cold", "turn_multi_chart"])
+    assert set(report["scenarios"]) == {"tool_impl_cold", "turn_multi_chart"}
+    multi = report["scenarios"]["turn_multi_chart"]
+    assert multi["total"]["n"] == 2
+    assert {"model", "tool:chart_d9_marriage", "tool:chart_d10_career"} <= set(multi["stages"])
+    assert multi["allocations"]["peak_kb"] > 0
+
+
+def test_compare_flags_only_regressions_beyond_tolerance():
+    baseline = {"scenarios": {"turn": {"total": {"n": 20, "p50_ms": 10.0, "p95_ms": 20.0}, "allocations": {"peak_kb": 500}}}}
+    same = copy.deepcopy(baseline)
+    same["scenarios"]["turn"]["total"]["p50_ms"] = 16.0  # within 50% + slack
+    assert e2e.compare(same, baseline, tolerance=0.5) == []
+
+    slower = copy.deepcopy(baseline)
+    slower["scenarios"]["turn"]["total"]["p95_ms"] = 40.0
+    slower["scenarios"]["turn"]["allocations"]["peak_kb"] = 2000
+    problems = e2e.compare(slower, baseline, tolerance=0.5)
+    assert len(problems) == 2 and problems[0].startswith("turn: p95_ms")
+
+    # A short run's p95 is its single slowest iteration: only p50 is gated
+    slower["scenarios"]["turn"]["total"]["n"] = 5
+    assert [p.split(":")[1].split()[0] for p in e2e.compare(slower, baseline, tolerance=0.5)] == ["peak_kb"]
+
+
+def test_load_level_counts_turns_and_connections():
+    from bench import load
+
+    with offline_stack() as stack:
+        reset_caches(stack)
+        result = load.run_level(stack, sessions=3, turns=2, think_ms=0, cache_hit_ratio=0.0, seed=7, level_tag="t")
+    assert result.turns == 6 and result.errors == 0
+    assert len(result.latencies_ms) == 6
+    assert result.http_requests == result.http_connections > 0  # cold profiles go to the chart API
+    assert result.mongo_clients == 1  # one pooled client shared by every session
+
+
+def test_saturation_level_is_first_flat_step():
+    from bench.load import LevelResult, saturation_level
+
+    levels = [LevelResult(sessions=n, turns=t, wall_s=1.0) for n, t in ((1, 10), (5, 40), (10, 42), (20, 30))]
+    assert saturation_level(levels) == 10
+    assert saturation_level(levels[:2]) is None
@@ -0,0 +1,52 @@
+import json
+import os
+
+import src.tools as tools
+from src.chart_normalizer import COLUMNS, ascendant_sign, compact_chart, normalize_chart
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "charts")
+
+
+def _fixture(chart_type):
+    with open(os.path.join(FIXTURES, f"{chart_type}.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_d1_list_payload_is_merged_into_fixed_schema_rows():
+    rows = normalize_chart("D1", _fixture("D1"))
+    assert [r["planet"] for r in rows][:3] == ["Ascendant", "Sun", "Moon"]
+    assert len(rows) == 10  # outer planets and ayanamsa entries are dropped
+    assert all(list(r) == COLUMNS for r in rows)
+    moon = rows[2]
+    assert moon == {"planet": "Moon", "sign": "Capricorn", "degree": 28.57, "house": 2,
+                    "nakshatra": "Dhanishta", "retrograde": False}
+    assert next(r for r in rows if r["planet"] == "Jupiter")["retrograde"] is True
+
+
+def test_varga_dict_payload_and_whole_sign_house_fallback():
+    payload = {"output": {
+        "0": {"name": "Ascendant", "current_sign": 3, "isRetro": "false"},
+        "1": {"name": "Saturn", "current_sign": 7, "normDegree": 1.714, "isRetro": "true"},
+    }}
+    rows = normalize_chart("D9", payload)
+    assert rows[1] == {"planet": "Saturn", "sign": "Libra", "degree": 1.71, "house": 5,
+                       "nakshatra": None, "retrograde": True}
+    assert ascendant_sign(payload) == "Gemini"
+
+
+def test_compact_table_is_much_smaller_than_raw_json():
+    payload = _fixture("D1")
+    table = compact_chart("D1", payload)
+    assert table.splitlines()[0] == "D1 | " + " | ".join(COLUMNS)
+    assert "Jupiter | Gemini | 13.41 | 7 | Ardra | R" in table
+    assert len(table) * 4 < len(json.dumps(payload))
+    assert compact_chart("D1", {"output": []}) is None
+
+
+def test_tool_returns_table_but_falls_back_to_raw(monkeypatch):
+    payload = _fixture("D9")
+    monkeypatch.setattr(tools, "resolve_chart", lambda dob, tob, city, c: {"chart_type": c, "chart_data": payload})
+    assert tools._tool_impl("1990-01-01", "06:30", "Kathmandu", "D9").startswith("D9 | planet")
+
+    monkeypatch.setattr(tools, "CHART_OUTPUT_FORMAT", "raw")
+    assert tools._tool_impl("1990-01-01", "06:30", "Kathmandu", "D9")["chart_data"] is payload
@@ -0,0 +1,53 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+import mongomock
+import pytest
+
+import src.chart_svg as chart_svg
+from src.chart_normalizer import compact_chart, normalize_chart
+from src.chart_svg import ChartRenderCache, chart_from_tool_output, chart_hash, render_chart_svg
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "charts")
+
+
+def _rows(chart_type="D1"):
+    with open(os.path.join(FIXTURES, f"{chart_type}.json"), "r", encoding="utf-8") as f:
+        return normalize_chart(chart_type, json.load(f))
+
+
+@pytest.mark.parametrize("style", ["north", "south"])
+def test_render_is_well_formed_and_places_every_body(style):
+    svg = render_chart_svg("D1", _rows(), style)
+    root = ET.fromstring(svg)
+    texts = [t.text for t in root.iter("{http://www.w3.org/2000/svg}text")]
+    assert "D1" in texts and "Asc" in texts
+    assert any(t.startswith("Ju 13°") and t.endswith("R") for t in texts)
+    for abbr in ("Su", "Mo", "Ma", "Me", "Ve", "Sa", "Ra", "Ke"):
+        assert any(t.startswith(abbr + " ") for t in texts)
+
+
+def test_compact_table_and_raw_json_address_the_same_chart():
+    with open(os.path.join(FIXTURES, "D1.json"), "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    from_table = chart_from_tool_output(compact_chart("D1", payload))
+    from_json = chart_from_tool_output(json.dumps({"chart_type": "D1", "chart_data": payload}))
+    assert chart_hash(*from_table) == chart_hash(*from_json)
+    assert chart_from_tool_output("Chapter 3: the Sun in the tenth house...") is None
+
+
+def test_cache_renders_once_per_chart_and_style(monkeypatch):
+    calls = []
+    real = chart_svg.render_chart_svg
+    monkeypatch.setattr(chart_svg, "render_chart_svg", lambda *a: calls.append(a[2]) or real(*a))
+    collection = mongomock.MongoClient()["db"]["chart_renders"]
+    rows = _rows()
+    cache = ChartRenderCache(collection)
+    first = cache.svg_for("D1", rows, "north")
+    assert cache.svg_for("D1", rows, "north") is first
+    cache.svg_for("D1", rows, "south")
+    # A new process (empty LRU) reads the stored render instead of drawing again
+    assert ChartRenderCache(collection).svg_for("D1", rows, "north") == first
+    assert calls == ["north", "south"]
+    assert collection.count_documents({}) == 2
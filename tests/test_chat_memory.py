@@ -0,0 +1,93 @@
+import threading
+import time
+
+import mongomock
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+import src.chat_memory as chat_memory
+from src.chat_memory import WindowedChatHistory, select_window
+
+
+def _history(summarizer=None, **kwargs):
+    client = mongomock.MongoClient()
+    return WindowedChatHistory(
+        "user@example.com", client=client, summarizer=summarizer, summarize_async=False, **kwargs
+    )
+
+
+def _turn(i, answer_len=40):
+    return [HumanMessage(f"question {i}"), AIMessage("a" * answer_len)]
+
+
+def test_window_keeps_recent_turns_within_budget():
+    msgs = _turn(1, 400) + _turn(2, 400) + _turn(3, 400)
+    start = select_window(msgs, token_budget=150)
+    assert start == 4
+    assert isinstance(msgs[start], HumanMessage)
+
+
+def test_window_never_starts_on_tool_message():
+    msgs = _turn(0) + [HumanMessage("q"), AIMessage("calling"), ToolMessage("x" * 2000, tool_call_id="1"), AIMessage("ok")]
+    # The newest turn alone is over budget: it is kept from its question, never from the tool output
+    assert select_window(msgs, token_budget=300) == 2
+
+
+def test_messages_returns_bounded_tail_and_summarizes_older_turns():
+    calls = []
+
+    def summarizer(previous, transcript):
+        calls.append(transcript)
+        return (previous + " | " if previous else "") + f"{transcript.count('User:')} questions"
+
+    hist = _history(summarizer=summarizer, token_budget=40)
+    for i in range(5):
+        hist.add_messages(_turn(i, 100))
+
+    window = hist.messages
+    assert [m.content for m in window if isinstance(m, HumanMessage)] == ["question 4"]
+    # Older turns were folded into the cached summary, which now leads the window
+    assert "4 questions" in hist.load_summary()[0]
+    window = hist.messages
+    assert isinstance(window[0], SystemMessage) and "4 questions" in window[0].content
+    assert len(calls) == 1
+    assert len(hist.load_all()) == 10
+
+
+def test_tool_outputs_are_truncated_in_window():
+    hist = _history(token_budget=10_000)
+    hist.add_messages([HumanMessage("q"), ToolMessage("{" + "x" * 5000 + "}", tool_call_id="1"), AIMessage("ok")])
+    tool = [m for m in hist.messages if isinstance(m, ToolMessage)][0]
+    assert len(tool.content) < 2000
+    assert tool.content.endswith("[truncated]")
+
+
+def test_overflow_trims_below_budget_so_window_start_is_stable():
+    hist = _history(token_budget=100)
+    for i in range(4):
+        hist.add_messages(_turn(i, 100))  # ~30 tokens per turn: 3 turns fit, 4 do not
+    first = hist.messages
+    assert [m.content for m in first if isinstance(m, HumanMessage)] == ["question 2", "question 3"]
+
+
+def test_trimmed_turns_stay_in_window_until_async_summary_lands():
+    release = threading.Event()
+
+    def summarizer(previous, transcript):
+        release.wait(5)
+        return f"{transcript.count('User:')} questions"
+
+    hist = WindowedChatHistory("async@example.com", client=mongomock.MongoClient(), summarizer=summarizer,
+                               token_budget=40, summarize_async=True)
+    for i in range(5):
+        hist.add_messages(_turn(i, 100))
+
+    pending = hist.messages
+    assert [m.content for m in pending if isinstance(m, HumanMessage)] == [f"question {i}" for i in range(5)]
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while "async@example.com" in chat_memory._summaries_inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+    window = hist.messages
+    assert isinstance(window[0], SystemMessage) and "4 questions" in window[0].content
+    assert [m.content for m in window if isinstance(m, HumanMessage)] == ["question 4"]
@@ -0,0 +1,70 @@
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+import src.tools as tools
+from bench.standins import offline_stack, reset_caches
+from src.dasha import DASHA_LORDS, DASHA_YEARS, timeline_from_chart, vimshottari
+from src.tools import get_d1_chart, get_vimshottari_dasha
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "charts")
+
+
+def _d1():
+    with open(os.path.join(FIXTURES, "D1.json"), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_timeline_starts_from_moon_nakshatra_balance():
+    timeline = timeline_from_chart(_d1())  # Moon 298.57 deg: Dhanishta, ruled by Mars
+    assert timeline.birth == datetime(1990, 1, 1, 6, 30)
+    assert timeline.nakshatra == "Dhanishta"
+    assert DASHA_LORDS[timeline.lords[0, 0]] == "Mars"
+    elapsed = (298.57 - 22 * 360 / 27) / (360 / 27)
+    assert np.isclose(timeline.balance_years, (1 - elapsed) * 7)
+    assert timeline.active(datetime(2026, 10, 19)) == ("Jupiter", "Rahu", "Saturn")
+
+
+def test_sub_periods_partition_their_parent():
+    timeline = vimshottari(10.0, datetime(2000, 1, 1))  # Ashwini: Ketu first
+    maha_lords, maha_starts, maha_ends = timeline.level(1)
+    assert [DASHA_LORDS[i] for i in maha_lords[:, 0]][:3] == ["Ketu", "Venus", "Sun"]
+    assert np.allclose(maha_ends - maha_starts, DASHA_YEARS[maha_lords[:, 0]])
+    antar_lords, antar_starts, antar_ends = timeline.level(2)
+    assert (antar_lords[::9, 1] == antar_lords[::9, 0]).all()  # each mahadasha opens with its own antardasha
+    assert np.allclose(antar_ends.reshape(9, 9)[:, -1], maha_ends)
+    assert np.allclose(timeline.starts[1:], timeline.ends[:-1])
+    assert np.isclose(timeline.ends[-1] - timeline.starts[0], 120.0)
+
+
+def test_tool_reuses_the_cached_d1_chart():
+    with offline_stack() as stack:
+        reset_caches(stack)
+        get_d1_chart.invoke({"dob": "1990-01-01", "tob": "06:30", "city": "Kathmandu, Nepal"})
+        before = stack.api.requests
+        table = get_vimshottari_dasha.invoke(
+            {"dob": "1990-01-01", "tob": "06:30", "city": "Kathmandu, Nepal", "from_year": 2030, "years": 5}
+        )
+        assert stack.api.requests == before
+    assert table.startswith("Vimshottari dasha | Moon 298.57 deg in Dhanishta")
+    assert "Antardasha 2030-01-01 to 2035-01-01" in table
+    assert "Running on 2030-01-01: Saturn / Saturn" in table
+
+
+@pytest.mark.parametrize("from_year", [1989, 2111, 9999, 10000])
+def test_years_outside_the_cycle_are_tool_errors(from_year):
+    with offline_stack() as stack:
+        reset_caches(stack)
+        out = get_vimshottari_dasha.invoke(
+            {"dob": "1990-01-01", "tob": "06:30", "city": "Kathmandu, Nepal", "from_year": from_year}
+        )
+    assert out == {"error": "from_year must be between 1990 and 2110, the 120-year dasha cycle from birth."}
+
+
+def test_chart_errors_are_passed_through(monkeypatch):
+    error = {"error": "Could not geocode city: Atlantis"}
+    monkeypatch.setattr(tools, "resolve_chart", lambda *args: error)
+    assert get_vimshottari_dasha.invoke({"dob": "1990-01-01", "tob": "06:30", "city": "Atlantis"}) == error
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from src.embedding_snapshot import SnapshotWriter, load_snapshot, upsert_snapshot
+
+
+class _FakeIndex:
+    def __init__(self):
+        self.upserts = []
+
+    def upsert(self, vectors, namespace=None):
+        self.upserts.append((namespace, vectors))
+
+
+def _write(tmp_path, capacity=3, rows=3):
+    writer = SnapshotWriter(str(tmp_path / "snap"), capacity, 4, "openai", "bphs")
+    vecs = np.arange(rows * 4, dtype=np.float32).reshape(rows, 4)
+    writer.append(
+        [f"id{i}" for i in range(rows)],
+        [f"text {i}" for i in range(rows)],
+        [{"page": i} for i in range(rows)],
+        vecs,
+    )
+    return writer.close(), vecs
+
+
+def test_snapshot_roundtrip_is_memory_mapped(tmp_path):
+    path, vecs = _write(tmp_path)
+    snap = load_snapshot(path, expected_provider="openai", expected_dimension=4)
+    assert len(snap) == 3
+    assert isinstance(snap.vectors, np.memmap)
+    np.testing.assert_array_equal(np.asarray(snap.vectors), vecs)
+    assert snap.records[1] == {"id": "id1", "text": "text 1", "metadata": {"page": 1}}
+
+
+def test_snapshot_compacts_skipped_rows(tmp_path):
+    path, _ = _write(tmp_path, capacity=5, rows=2)
+    snap = load_snapshot(path)
+    assert snap.vectors.shape == (2, 4)
+    assert snap.manifest["count"] == 2
+
+
+def test_snapshot_rejects_other_provider(tmp_path):
+    path, _ = _write(tmp_path)
+    with pytest.raises(ValueError):
+        load_snapshot(path, expected_provider="gemini")
+
+
+def test_upsert_snapshot_skips_embedding(tmp_path):
+    path, vecs = _write(tmp_path)
+    index = _FakeIndex()
+    written = upsert_snapshot(load_snapshot(path), index, batch_size=2)
+    assert written == 3
+    assert [len(v) for _, v in index.upserts] == [2, 1]
+    ns, first = index.upserts[0]
+    assert ns == "bphs"
+    assert first[0] == ("id0", vecs[0].tolist(), {"page": 0, "text": "text 0"})
@@ -0,0 +1,49 @@
+import mongomock
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from src.chat_memory import WindowedChatHistory
+from src.ui.history import _turn_aligned, build_views
+
+
+def _history():
+    return WindowedChatHistory("user@example.com", client=mongomock.MongoClient(), summarize_async=False)
+
+
+def _seed(hist, turns):
+    for i in range(turns):
+        hist.add_messages([
+            HumanMessage(f"question {i}"),
+            AIMessage("", tool_calls=[{"name": "chart_d1_rasi", "args": {}, "id": f"c{i}"}]),
+            ToolMessage('{"sign": "Aries"}', tool_call_id=f"c{i}"),
+            AIMessage(f"<thinking>plan {i}</thinking>answer {i}"),
+        ])
+
+
+def test_views_attach_tool_outputs_and_strip_thinking():
+    hist = _history()
+    _seed(hist, 2)
+    views = build_views(hist.load_tail(8), {})
+    assert [v.role for v in views] == ["user", "assistant", "assistant"] * 2
+    final = views[2]
+    assert final.text == "answer 0" and final.notes == ["plan 0"]
+    assert final.tool_outputs == ['{"sign": "Aries"}']
+    assert final.parsed_tool_outputs() == [(True, {"sign": "Aries"})]
+
+
+def test_views_are_reused_by_message_id():
+    hist = _history()
+    _seed(hist, 3)
+    memo = {}
+    first = build_views(hist.load_tail(8), memo)
+    hist.add_messages([HumanMessage("next"), AIMessage("reply")])
+    second = build_views(hist.load_tail(10), memo)
+    assert all(any(a is b for b in second) for a in first)
+    assert second[-1].text == "reply"
+
+
+def test_page_opens_on_a_user_turn():
+    hist = _history()
+    _seed(hist, 3)
+    pairs = _turn_aligned(hist.load_tail(6))
+    assert isinstance(pairs[0][1], HumanMessage)
+    assert len(pairs) == 4
@@ -0,0 +1,57 @@
+import threading
+import urllib.request
+
+import pytest
+
+import src.metrics as metrics
+from src.logging_utils import log_call, log_operation, get_logger
+from src.metrics import MetricsRegistry
+
+
+def test_histogram_exposition_and_quantiles():
+    reg = MetricsRegistry()
+    hist = reg.histogram("t_seconds", "Test latency.", ["chart_type"], buckets=(0.1, 1.0))
+    for v in (0.05, 0.05, 0.5, 2.0):
+        hist.observe(v, chart_type="D9")
+    text = reg.render()
+    assert "# TYPE t_seconds histogram" in text
+    assert 't_seconds_bucket{chart_type="D9",le="0.1"} 2' in text
+    assert 't_seconds_bucket{chart_type="D9",le="1"} 3' in text
+    assert 't_seconds_bucket{chart_type="D9",le="+Inf"} 4' in text
+    assert 't_seconds_count{chart_type="D9"} 4' in text
+    assert hist.quantile(0.5, chart_type="D9") == 0.1
+    assert hist.quantile(0.99, chart_type="D9") == float("inf")
+    with pytest.raises(ValueError):
+        hist.observe(1.0, provider="openai")
+
+
+def test_log_call_and_log_operation_feed_the_registry():
+    @log_call
+    def work():
+        return 1
+
+    before = metrics.FUNCTION_SECONDS.count(function=f"{__name__}.work", status="ok")
+    work()
+    assert metrics.FUNCTION_SECONDS.count(function=f"{__name__}.work", status="ok") == before + 1
+
+    with pytest.raises(RuntimeError):
+        with log_operation(get_logger(__name__), "embed_batch_7"):
+            raise RuntimeError("boom")
+    assert metrics.OPERATION_SECONDS.count(operation="embed_batch", status="error") >= 1
+
+
+def test_stat_counters_and_http_endpoint():
+    from src.tool_router import ROUTER_STATS
+
+    ROUTER_STATS.add(decisions=1)
+    metrics.record_cache("api_cache", "mongo", True)
+    text = metrics.REGISTRY.render()
+    assert "jyotish_tool_router_decisions " in text
+    assert 'jyotish_cache_requests_total{cache="api_cache",tier="mongo",result="hit"}' in text
+
+    server = metrics.ThreadingHTTPServer(("127.0.0.1", 0), metrics._Handler)
+    port = server.server_address[1]
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read().decode()
+    server.server_close()
+    assert "# TYPE jyotish_cache_requests_total counter" in body
@@ -0,0 +1,79 @@
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import src.tools as tools
+from src.agent import AGENT_TOOLS
+from src.model_router import ModelTierMiddleware, classify_turn
+from src.tool_router import ToolRouterMiddleware
+
+ROUTER = ToolRouterMiddleware(AGENT_TOOLS).router
+ARGS = {"dob": "1990-01-01", "tob": "06:30", "city": "Kathmandu"}
+
+
+class _FakeChatModel(FakeMessagesListChatModel):
+    calls: int = 0
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def _ask(text):
+    return HumanMessage(f"User Profile:\nDOB: 1990-01-01\n\nUser Input:\n{text}\n\n")
+
+
+def test_classify_turn_heuristics():
+    assert classify_turn([_ask("hi there!")], ROUTER)[0] == "fast"
+    assert classify_turn([_ask("How is my career?")], ROUTER) == ("fast", "single-chart lookup")
+    assert classify_turn([_ask("Will my marriage affect my career?")], ROUTER)[0] == "strong"
+    assert classify_turn([_ask("Give me a detailed reading of my health")], ROUTER)[0] == "strong"
+    results = [
+        _ask("What about my kids?"),
+        ToolMessage("D7 table", tool_call_id="1", name="chart_d7_progeny_saptamsa"),
+        ToolMessage("D1 table", tool_call_id="2", name="chart_d1_general_health"),
+    ]
+    assert classify_turn(results, ROUTER) == ("strong", "synthesizing 2 charts")
+
+
+def test_multi_chart_synthesis_escalates_to_strong_model(monkeypatch):
+    monkeypatch.setattr(tools, "resolve_chart", lambda dob, tob, city, c: {"chart_type": c, "chart_data": {}})
+    fast = _FakeChatModel(responses=[AIMessage(content="", tool_calls=[
+        {"name": "chart_d7_progeny_saptamsa", "args": ARGS, "id": "1"},
+        {"name": "chart_d1_general_health", "args": ARGS, "id": "2"},
+    ])])
+    strong = _FakeChatModel(responses=[AIMessage(content="synthesis")])
+    tiers = []
+    agent = create_agent(
+        fast, tools=AGENT_TOOLS,
+        middleware=[ModelTierMiddleware(ROUTER, model_factory=lambda tier: tiers.append(tier) or strong)],
+    )
+    out = agent.invoke({"messages": [_ask("When will I have kids?")]})
+    assert out["messages"][-1].content == "synthesis"
+    assert (fast.calls, strong.calls, tiers) == (1, 1, ["strong"])
+
+
+def test_disabled_routing_keeps_compiled_model():
+    fast = _FakeChatModel(responses=[AIMessage(content="hello")])
+    agent = create_agent(
+        fast, tools=AGENT_TOOLS,
+        middleware=[ModelTierMiddleware(ROUTER, model_factory=lambda tier: 1 / 0, enabled=False)],
+    )
+    assert agent.invoke({"messages": [_ask("compare all my charts")]})["messages"][-1].content == "hello"
+
+
+def test_cache_read_tokens_are_counted_per_tier():
+    from src.model_router import MODEL_USAGE_STATS
+
+    usage = {"input_tokens": 1200, "output_tokens": 50, "total_tokens": 1250,
+             "input_token_details": {"cache_read": 1024}}
+    fast = _FakeChatModel(responses=[AIMessage(content="hello", usage_metadata=usage)])
+    agent = create_agent(fast, tools=AGENT_TOOLS, middleware=[ModelTierMiddleware(ROUTER, enabled=False)])
+    before = MODEL_USAGE_STATS.snapshot()
+    agent.invoke({"messages": [_ask("hi")]})
+    after = MODEL_USAGE_STATS.snapshot()
+    assert after["fast_cache_read_tokens"] - before.get("fast_cache_read_tokens", 0) == 1024
+    assert after["fast_input_tokens"] - before.get("fast_input_tokens", 0) == 1200
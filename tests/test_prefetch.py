@@ -0,0 +1,64 @@
+import threading
+
+import src.prefetch as prefetch
+
+PROFILE = {"dob": "1990-01-01", "tob": "06:30", "city": "Kathmandu, Nepal", "gender": "Other"}
+
+
+def _wait(handle, timeout=5):
+    assert handle.finished.wait(timeout)
+
+
+def test_prefetch_geocodes_once_and_warms_charts(monkeypatch):
+    geocodes, charts = [], []
+    monkeypatch.setattr(prefetch, "get_lat_lon_offset", lambda city, d: geocodes.append(city) or (27.7, 85.3, 5.75))
+    monkeypatch.setattr(prefetch, "resolve_chart", lambda dob, tob, city, c: charts.append(c) or {"chart_type": c})
+    handle = prefetch.start_prefetch("s1", PROFILE, charts=["D1", "D9", "D10"])
+    _wait(handle)
+    assert geocodes == ["Kathmandu, Nepal"]
+    assert sorted(charts) == ["D1", "D10", "D9"]
+    assert "s1" not in prefetch._handles  # finished handles do not outlive their jobs
+    assert all(f.result() is None for f in handle.futures)
+
+
+def test_cancel_stops_pending_chart_jobs(monkeypatch):
+    release = threading.Event()
+    charts = []
+
+    def slow_geocode(city, d):
+        release.wait(5)
+        return 27.7, 85.3, 5.75
+
+    monkeypatch.setattr(prefetch, "get_lat_lon_offset", slow_geocode)
+    monkeypatch.setattr(prefetch, "resolve_chart", lambda dob, tob, city, c: charts.append(c))
+    handle = prefetch.start_prefetch("s2", PROFILE, charts=["D1"])
+    prefetch.cancel_prefetch("s2")
+    release.set()
+    _wait(handle)
+    assert handle.cancelled.is_set()
+    assert charts == []
+
+
+def test_ascendant_sign_from_nested_payload():
+    payload = {"output": [{"0": {"name": "Ascendant", "current_sign": 7}, "1": {"name": "Sun", "current_sign": 9}}]}
+    assert prefetch.ascendant_sign(payload) == "Libra"
+    assert prefetch.ascendant_sign({"output": {}}) is None
+
+
+def test_fallback_coordinates_are_not_cached():
+    from datetime import datetime
+
+    import src.utils as utils
+    from bench.standins import FakeGeocoder, offline_stack, reset_caches
+
+    with offline_stack() as stack:
+        reset_caches(stack)
+        geocoder = FakeGeocoder({"Pokhara, Nepal": (28.2, 84.0)})  # outage for Kathmandu
+        stack.services._resources["geocoder"] = geocoder
+        lat, lon, _ = utils.get_lat_lon_offset("Kathmandu, Nepal", datetime(1990, 1, 1))
+        assert (lat, lon) == utils.CITY_COORD_FALLBACKS["Kathmandu, Nepal"]
+        assert "Kathmandu, Nepal" not in utils._GEOCODE_CACHE
+
+        geocoder.coords = {"Kathmandu, Nepal": (27.70, 85.30)}
+        assert utils.get_lat_lon_offset("Kathmandu, Nepal", datetime(1990, 1, 1))[:2] == (27.70, 85.30)
+        assert utils._GEOCODE_CACHE["Kathmandu, Nepal"] == (27.70, 85.30)
@@ -0,0 +1,75 @@
+import threading
+
+import pytest
+
+from src.prompt_utils import PromptStore, load_prompt_snapshot, save_prompt_snapshot
+
+
+def test_snapshot_served_without_waiting_on_fetch(tmp_path):
+    save_prompt_snapshot("owner/jyotish-ai", "from disk", str(tmp_path))
+    release = threading.Event()
+
+    def slow_fetch(name):
+        release.wait(5)
+        return "from langsmith"
+
+    store = PromptStore(fetcher=slow_fetch, ttl_seconds=60, snapshot_dir=str(tmp_path))
+    assert store.get("owner/jyotish-ai") == "from disk"
+
+    release.set()
+    store.refresh_async("owner/jyotish-ai").join(5)
+    assert store.get("owner/jyotish-ai") == "from langsmith"
+    assert load_prompt_snapshot("owner/jyotish-ai", str(tmp_path)) == "from langsmith"
+
+
+def test_missing_prompt_raises_and_refreshes_in_background(tmp_path):
+    calls = []
+    release = threading.Event()  # keep the refresh started by get() in flight until the test joins it
+    store = PromptStore(fetcher=lambda n: release.wait(5) and (calls.append(n) or "fetched"),
+                        ttl_seconds=60, snapshot_dir=str(tmp_path))
+    with pytest.raises(LookupError):
+        store.get("jyotish-ai")
+    refresh = store.refresh_async("jyotish-ai")
+    release.set()
+    refresh.join(5)
+    assert store.get("jyotish-ai") == "fetched"
+    assert calls == ["jyotish-ai"]
+
+
+def test_fetch_failure_keeps_cached_text(tmp_path):
+    def failing(name):
+        raise RuntimeError("offline")
+
+    save_prompt_snapshot("jyotish-ai", "cached", str(tmp_path))
+    store = PromptStore(fetcher=failing, ttl_seconds=0, snapshot_dir=str(tmp_path))
+    assert store.refresh("jyotish-ai") is None
+    assert store.get("jyotish-ai") == "cached"
+
+
+def test_concurrent_refreshes_share_one_fetch(tmp_path):
+    calls = []
+    release = threading.Event()
+
+    def fetch(name):
+        calls.append(name)
+        release.wait(5)
+        return "fetched"
+
+    store = PromptStore(fetcher=fetch, ttl_seconds=60, snapshot_dir=str(tmp_path))
+    start = threading.Barrier(8)
+    seen = []
+
+    def refresh():
+        start.wait(5)
+        seen.append(store.refresh_async("jyotish-ai"))
+
+    callers = [threading.Thread(target=refresh) for _ in range(8)]
+    for t in callers:
+        t.start()
+    for t in callers:
+        t.join(5)
+    release.set()
+    for thread in seen:
+        thread.join(5)
+    assert len({id(t) for t in seen}) == 1
+    assert calls == ["jyotish-ai"]
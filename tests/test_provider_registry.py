@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+import pytest
+
+from src.provider_registry import ProviderRegistry
+
+PROJECT_ROOT = __file__.rsplit("/tests/", 1)[0]
+
+
+def test_factories_do_not_import_provider_sdks():
+    code = (
+        "import sys, src.llm_factory, src.embedding_factory\n"
+        "print(sorted(m for m in ('langchain_openai', 'langchain_google_genai', 'langchain_aws', 'boto3')"
+        " if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == "[]"
+
+
+def test_load_imports_on_first_use_and_caches():
+    registry = ProviderRegistry("test")
+    registry.register("json", "json", "JSONDecoder", aliases=("JS",))
+    import json
+
+    assert registry.load("js") is json.JSONDecoder
+    assert registry.load("JSON") is registry.load("json")
+
+
+def test_unknown_and_missing_providers_raise():
+    registry = ProviderRegistry("LLM")
+    registry.register("ghost", "not_an_installed_sdk", "Model")
+    with pytest.raises(ValueError, match="Unknown LLM provider: nope"):
+        registry.load("nope")
+    with pytest.raises(ImportError, match="needs the not_an_installed_sdk package"):
+        registry.load("ghost")
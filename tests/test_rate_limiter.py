@@ -0,0 +1,120 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import mongomock
+import pytest
+
+import src.tools as tools
+from src.rate_limiter import (
+    FileTokenBucket, MongoTokenBucket, RateLimiter, RateLimitTimeout, TokenBucket, api_priority, parse_class_map,
+)
+
+
+def _drain(bucket):
+    while bucket.take() == 0:
+        pass
+
+
+def test_head_of_queue_is_highest_priority():
+    bucket = TokenBucket(rate=20, capacity=1)
+    _drain(bucket)
+    limiter = RateLimiter(bucket)
+    order = []
+
+    def worker(priority):
+        limiter.acquire(priority)
+        order.append(priority)
+
+    batch = threading.Thread(target=worker, args=("batch",))
+    batch.start()
+    time.sleep(0.01)
+    interactive = threading.Thread(target=worker, args=("interactive",))
+    interactive.start()
+    batch.join()
+    interactive.join()
+    assert order == ["interactive", "batch"]
+
+
+def test_lower_classes_leave_a_reserve_of_the_burst():
+    bucket = TokenBucket(rate=0.001, capacity=5)
+    assert [bucket.take(reserve=0.5) for _ in range(3)] == [0, 0, 0]
+    assert bucket.take(reserve=0.5) > 0  # two permits stay for higher classes
+    assert bucket.take(reserve=0.0) == 0
+    assert bucket.take(reserve=0.0) == 0
+    assert bucket.take(reserve=0.0) > 0
+
+
+def test_deadline_raises_instead_of_queueing():
+    bucket = TokenBucket(rate=0.1, capacity=1)
+    _drain(bucket)
+    limiter = RateLimiter(bucket, deadlines={"batch": 0.05})
+    with api_priority("batch"), pytest.raises(RateLimitTimeout):
+        limiter.acquire()
+
+
+def test_daily_quota_is_shared_through_mongo():
+    col = mongomock.MongoClient().db.rate_limits
+    a = MongoTokenBucket(col, "api", rate=100, capacity=100, daily_quota=3)
+    b = MongoTokenBucket(col, "api", rate=100, capacity=100, daily_quota=3)
+    assert [a.take(), b.take(), a.take()] == [0, 0, 0]
+    assert b.take() > 0
+    assert col.find_one({"_id": "api"})["used"] == 3
+
+
+def test_file_bucket_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "bucket.json")
+    a = FileTokenBucket(path, rate=0.001, capacity=2)
+    b = FileTokenBucket(path, rate=0.001, capacity=2)
+    assert a.take() == 0 and b.take() == 0
+    assert a.take() > 0
+
+
+def test_post_pauses_and_retries_after_429(monkeypatch):
+    limiter = RateLimiter(TokenBucket(rate=50, capacity=1))
+    monkeypatch.setattr(tools, "get_services", lambda: SimpleNamespace(rate_limiter=limiter))
+    responses = [
+        SimpleNamespace(status_code=429, headers={"Retry-After": "0.05"}),
+        SimpleNamespace(status_code=200, headers={}, raise_for_status=lambda: None, json=lambda: {"ok": 1}),
+    ]
+    monkeypatch.setattr(tools.requests, "post", lambda *a, **k: responses.pop(0))
+    started = time.monotonic()
+    assert tools._post("http://api.test/planets", {}) == {"ok": 1}
+    assert time.monotonic() - started >= 0.05
+
+
+def test_parse_class_map():
+    assert parse_class_map("interactive:0, batch:0.5,bad") == {"interactive": 0.0, "batch": 0.5}
+
+
+class _SlowBucket(TokenBucket):
+    """Bucket whose poll blocks until released, like a contended Mongo CAS loop."""
+
+    def __init__(self):
+        super().__init__(rate=100, capacity=100)
+        self.polling, self.release = threading.Event(), threading.Event()
+
+    def take(self, reserve=0.0):
+        self.polling.set()
+        self.release.wait(5)
+        return super().take(reserve)
+
+
+def test_bucket_is_polled_outside_the_queue_lock():
+    bucket = _SlowBucket()
+    limiter = RateLimiter(bucket)
+    head = threading.Thread(target=limiter.acquire, args=("batch",))
+    head.start()
+    assert bucket.polling.wait(5)
+    # While the head is inside the bucket, another thread can still join the queue
+    enqueued = threading.Event()
+
+    def join_queue():
+        with limiter._cond:
+            enqueued.set()
+
+    threading.Thread(target=join_queue).start()
+    assert enqueued.wait(5)
+    bucket.release.set()
+    head.join(5)
+    assert not head.is_alive()
@@ -0,0 +1,37 @@
+import threading
+
+import mongomock
+
+from src.services import Services
+
+
+def test_resources_are_built_once_and_shared_across_threads():
+    builds = []
+    services = Services(mongo_factory=lambda: builds.append(1) or mongomock.MongoClient())
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(services.mongo)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(builds) == 1
+    assert all(c is clients[0] for c in clients)
+    assert services.initialized() == ["mongo"]
+
+
+def test_health_reports_idle_ok_and_errors():
+    services = Services(mongo_factory=mongomock.MongoClient)
+    services.mongo
+    health = services.health()
+    assert health["mongo"] == "ok"
+    assert health["retriever"] == "idle"
+
+    class _Down:
+        class admin:
+            @staticmethod
+            def command(name):
+                raise ConnectionError("no route")
+
+    broken = Services(mongo_factory=_Down)
+    broken.mongo
+    assert broken.health()["mongo"].startswith("error")
@@ -0,0 +1,62 @@
+from langchain_core.chat_history import InMemoryChatMessageHistory
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import src.agent as agent_mod
+import src.llm_factory as llm_factory
+import src.services as services
+from src.streaming import ThinkingFilter, stream_agent_turn, tool_progress_label
+
+
+def _feed_all(chunks):
+    f = ThinkingFilter()
+    out = "".join(f.feed(c) for c in chunks) + f.flush()
+    return out, f.segments
+
+
+def test_thinking_filter_handles_tags_split_across_chunks():
+    out, segments = _feed_all(["Hello <thi", "nking>secret", " plan</Thin", "king> world"])
+    assert out == "Hello  world"
+    assert segments == ["secret plan"]
+
+
+def test_thinking_filter_releases_lookalike_prefix():
+    out, segments = _feed_all(["a <th", "e end"])
+    assert out == "a <the end"
+    assert segments == []
+
+
+def test_thinking_filter_hides_unterminated_segment():
+    out, segments = _feed_all(["visible <thinking>never closed"])
+    assert out == "visible "
+    assert segments == ["never closed"]
+
+
+def test_tool_progress_labels():
+    assert tool_progress_label("chart_d9_marriage") == "Fetching D9 chart…"
+    assert tool_progress_label("chart_varga_specific", {"chart_code": "d45"}) == "Fetching D45 chart…"
+    assert tool_progress_label("bphs_search_pinecone").startswith("Searching")
+
+
+class _FakeStreamingModel(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def test_stream_agent_turn_yields_tokens_and_saves_history(monkeypatch):
+    model = _FakeStreamingModel(messages=iter([AIMessage(content="Your D10 shows <thinking>x</thinking> growth")]))
+    monkeypatch.setattr(llm_factory, "get_chat_model", lambda tier="fast": model)
+    monkeypatch.setattr(agent_mod, "_shared_agent", None)
+    monkeypatch.setattr(services, "_services", None)
+    monkeypatch.setattr(agent_mod, "_load_system_template", lambda: "SYS")
+    history = InMemoryChatMessageHistory()
+    monkeypatch.setattr(agent_mod, "get_session_history", lambda sid: history)
+
+    executor = agent_mod.create_agent_executor("s@example.com", "Male")
+    events = list(stream_agent_turn(executor, {"messages": [HumanMessage("career?")]}, {"configurable": {"session_id": "s@example.com"}}))
+
+    kinds = [k for k, _ in events]
+    assert kinds[0] == "model_start"
+    tokens = "".join(v for k, v in events if k == "token")
+    assert tokens == "Your D10 shows <thinking>x</thinking> growth"
+    assert isinstance(history.messages[-1], AIMessage)
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+
+import pytest
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+import src.tool_execution as tool_execution
+from src.agent import AstrologyContext
+from src.tool_execution import ToolCallCancelled, ToolExecutionMiddleware, abort_turn, end_turn, start_turn
+
+SESSION = "user@example.com"
+WAIT = 5  # generous upper bound for event waits; tests never assert on elapsed time
+
+# Per-test tool behaviour, keyed by chart name
+_behaviour = {}
+
+
+class _FakeChatModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool
+def chart(name: str) -> str:
+    """Return the chart name once its scripted behaviour allows it."""
+    _behaviour.get(name, lambda: None)()
+    return f"{name} ready"
+
+
+@tool
+async def achart(name: str) -> str:
+    """Async variant of `chart`."""
+    await _behaviour.get(name, _noop)()
+    return f"{name} ready"
+
+
+async def _noop():
+    return None
+
+
+def _agent(names, tool_name="chart", **middleware_kwargs):
+    tool_calls = [{"name": tool_name, "args": {"name": n}, "id": f"call_{i}"} for i, n in enumerate(names)]
+    model = _FakeChatModel(responses=[AIMessage(content="", tool_calls=tool_calls), AIMessage(content="answer")])
+    return create_agent(
+        model, tools=[chart, achart], context_schema=AstrologyContext,
+        middleware=[ToolExecutionMiddleware(**middleware_kwargs)],
+    )
+
+
+def _invoke(agent, session=SESSION):
+    turn = start_turn(session)
+    try:
+        return agent.invoke({"messages": [HumanMessage("q")]}, context=AstrologyContext(session))
+    finally:
+        end_turn(session, turn)
+
+
+def _tool_messages(out):
+    return [m for m in out["messages"] if isinstance(m, ToolMessage)]
+
+
+@pytest.fixture(autouse=True)
+def _clear_behaviour():
+    _behaviour.clear()
+    yield
+    _behaviour.clear()
+
+
+def test_step_runs_tool_calls_concurrently_and_keeps_order():
+    together = threading.Barrier(3, timeout=WAIT)  # only passes if all three calls run at once
+    for name in ("D9", "D1", "D10"):
+        _behaviour[name] = together.wait
+    out = _invoke(_agent(["D9", "D1", "D10"]))
+    assert [m.content for m in _tool_messages(out)] == ["D9 ready", "D1 ready", "D10 ready"]
+
+
+def test_concurrency_limit_is_per_turn():
+    # One slot per turn, yet two sessions' calls meet at the barrier: the limit is not process-wide
+    together = threading.Barrier(2, timeout=WAIT)
+    _behaviour["D9"] = together.wait
+    results = {}
+
+    def run(session):
+        results[session] = _invoke(_agent(["D9"], max_concurrency=1), session)
+
+    threads = [threading.Thread(target=run, args=(f"s{i}@example.com",)) for i in range(2)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(WAIT)
+    assert [_tool_messages(out)[0].content for out in results.values()] == ["D9 ready", "D9 ready"]
+
+
+def test_async_step_is_bounded():
+    running, peak = 0, 0
+
+    async def tracked():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0)  # yield so sibling calls could start if a slot were free
+        running -= 1
+
+    for name in ("D9", "D1", "D10"):
+        _behaviour[name] = tracked
+
+    async def go():
+        turn = start_turn(SESSION)
+        try:
+            return await _agent(["D9", "D1", "D10"], tool_name="achart", max_concurrency=1).ainvoke(
+                {"messages": [HumanMessage("q")]}, context=AstrologyContext(SESSION)
+            )
+        finally:
+            end_turn(SESSION, turn)
+
+    out = asyncio.run(go())
+    assert [m.content for m in _tool_messages(out)] == ["D9 ready", "D1 ready", "D10 ready"]
+    assert peak == 1
+
+
+def test_slow_call_becomes_error_message_and_turn_continues():
+    release = threading.Event()
+    _behaviour["D60"] = lambda: release.wait(WAIT)
+    _behaviour["D1"] = lambda: None
+    try:
+        out = _invoke(_agent(["D60", "D1"], timeout_seconds=0.1))
+    finally:
+        release.set()
+    slow, fast = _tool_messages(out)
+    assert slow.status == "error" and "timed out" in slow.content and slow.tool_call_id == "call_0"
+    assert fast.content == "D1 ready"
+    assert out["messages"][-1].content == "answer"
+
+
+def test_timed_out_call_keeps_its_slot_until_its_thread_finishes():
+    timed_out, release, d1_started = threading.Event(), threading.Event(), threading.Event()
+    running, peak = 0, 0
+    lock = threading.Lock()
+
+    def tracked(body):
+        def run():
+            nonlocal running, peak
+            with lock:
+                running += 1
+                peak = max(peak, running)
+            try:
+                body()
+            finally:
+                with lock:
+                    running -= 1
+        return run
+
+    _behaviour["D60"] = tracked(lambda: release.wait(WAIT))
+    _behaviour["D1"] = tracked(d1_started.set)
+
+    class _Middleware(ToolExecutionMiddleware):
+        def _timed_out(self, request):
+            timed_out.set()
+            return super()._timed_out(request)
+
+    def release_after_timeout():
+        timed_out.wait(WAIT)
+        d1_started.wait(0.2)  # D1 must not start while the abandoned D60 thread still works
+        release.set()
+
+    releaser = threading.Thread(target=release_after_timeout)
+    releaser.start()
+    tool_calls = [{"name": "chart", "args": {"name": n}, "id": f"call_{i}"} for i, n in enumerate(["D60", "D1"])]
+    model = _FakeChatModel(responses=[AIMessage(content="", tool_calls=tool_calls), AIMessage(content="answer")])
+    agent = create_agent(
+        model, tools=[chart], context_schema=AstrologyContext,
+        middleware=[_Middleware(max_concurrency=1, timeout_seconds=0.1)],
+    )
+    try:
+        out = _invoke(agent)
+    finally:
+        release.set()
+        releaser.join(WAIT)
+    slow, fast = _tool_messages(out)
+    assert slow.status == "error" and fast.content == "D1 ready"
+    assert peak == 1
+
+
+def test_abort_turn_cancels_waiting_calls_and_ends_turn():
+    started, release = threading.Event(), threading.Event()
+
+    def blocked():
+        started.set()
+        release.wait(WAIT)
+
+    _behaviour["D60"] = blocked
+
+    def abort_when_started():
+        started.wait(WAIT)
+        abort_turn(SESSION)
+
+    aborter = threading.Thread(target=abort_when_started)
+    aborter.start()
+    try:
+        with pytest.raises(ToolCallCancelled):
+            _invoke(_agent(["D60"]))
+    finally:
+        release.set()
+        aborter.join(WAIT)
+
+
+def test_turn_scopes_are_removed_when_turns_end():
+    first = start_turn(SESSION)
+    second = start_turn(SESSION)
+    end_turn(SESSION, first)  # a stale turn must not remove its successor
+    assert tool_execution._turns[SESSION] is second
+    end_turn(SESSION, second)
+    assert SESSION not in tool_execution._turns
@@ -0,0 +1,114 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+
+import json
+
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import src.agent as agent_mod
+import src.llm_factory as llm_factory
+import src.services as services
+import src.tools as tools
+from src.agent import AGENT_TOOLS
+from src.tool_router import ROUTER_STATS, ToolRouterMiddleware
+
+
+class _FakeChatModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class _CaptureTools(AgentMiddleware):
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def wrap_model_call(self, request, handler):
+        self.seen.append(sorted(t.name for t in request.tools))
+        return handler(request)
+
+
+def _router():
+    return ToolRouterMiddleware(AGENT_TOOLS).router
+
+
+def test_routes_by_explicit_code_keywords_and_falls_back():
+    router = _router()
+    assert router.route("Show me my D60 chart").charts == ["D60"]
+    assert router.route("When will I get married?").charts == ["D9"]
+    assert router.route("Will my career or my business grow?").charts == ["D10"]
+    assert router.route("Will I buy a car?").charts == ["D16"]  # "car" must not hit "career"
+    decision = router.route("hello there")
+    assert decision.fallback and len(decision.charts) == 13
+
+
+def test_middleware_binds_routed_charts_plus_bphs_and_counts_misroutes(monkeypatch):
+    monkeypatch.setattr(tools, "resolve_chart", lambda dob, tob, city, c: {"chart_type": c, "chart_data": {}})
+    capture = _CaptureTools()
+    responses = [
+        AIMessage(content="", tool_calls=[{"name": "chart_d9_marriage", "args": {"dob": "1990-01-01", "tob": "06:30", "city": "X"}, "id": "1"}]),
+        AIMessage(content="done"),
+    ]
+    before = ROUTER_STATS.snapshot()
+    agent = create_agent(
+        _FakeChatModel(responses=responses), tools=AGENT_TOOLS,
+        middleware=[ToolRouterMiddleware(AGENT_TOOLS, narrowing="drop"), capture],
+    )
+    composed = "User Profile:\nDOB: 1990-01-01\n\nUser Input:\nHow is my career going?\n\n"
+    agent.invoke({"messages": [HumanMessage(composed)]})
+    assert capture.seen[0] == ["bphs_search_pinecone", "chart_d10_career"]
+    # A tool the model already called this turn stays bound for the follow-up step
+    assert capture.seen[1] == ["bphs_search_pinecone", "chart_d10_career", "chart_d9_marriage"]
+    after = ROUTER_STATS.snapshot()
+    assert after["misroutes"] == before["misroutes"] + 1
+    assert after["schema_tokens_saved"] > before["schema_tokens_saved"]
+
+
+def test_dasha_tool_is_bound_only_for_timing_questions():  # with schemas dropped (no prefix cache)
+    capture = _CaptureTools()
+    agent = create_agent(
+        _FakeChatModel(responses=[AIMessage(content="a"), AIMessage(content="b")]), tools=AGENT_TOOLS,
+        middleware=[ToolRouterMiddleware(AGENT_TOOLS, narrowing="drop"), capture],
+    )
+    agent.invoke({"messages": [HumanMessage("User Input:\nWhen will I get married?")]})
+    agent.invoke({"messages": [HumanMessage("User Input:\nDescribe my spouse.")]})
+    assert capture.seen[0] == ["bphs_search_pinecone", "chart_d9_marriage", "dasha_vimshottari"]
+    assert capture.seen[1] == ["bphs_search_pinecone", "chart_d9_marriage"]
+
+
+class _RecordingChatModel(FakeMessagesListChatModel):
+    calls: list = []
+
+    def bind_tools(self, tools, tool_choice=None, **kwargs):
+        schemas = json.dumps([convert_to_openai_tool(t) for t in tools], sort_keys=True)
+        self.calls.append({"tools": schemas, "tool_choice": tool_choice})
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls[-1]["system"] = messages[0].content
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def test_cached_prefix_is_identical_across_differently_routed_turns(monkeypatch):
+    model = _RecordingChatModel(responses=[AIMessage(content="a"), AIMessage(content="b")], calls=[])
+    monkeypatch.setattr(llm_factory, "LLM_PROVIDER", "openai")
+    monkeypatch.setattr(llm_factory, "PROMPT_CACHING_ENABLED", True)
+    monkeypatch.setattr(llm_factory, "get_chat_model", lambda tier="fast": model)
+    monkeypatch.setattr(agent_mod, "_shared_agent", None)
+    monkeypatch.setattr(services, "_services", None)
+    monkeypatch.setattr(agent_mod, "_load_system_template", lambda: "SYS for {gender}")
+    context = agent_mod.AstrologyContext("user@example.com", "Female")
+    graph = agent_mod.get_shared_agent()
+    graph.invoke({"messages": [HumanMessage("User Input:\nHow is my career going?")]}, context=context)
+    graph.invoke({"messages": [HumanMessage("User Input:\nWhen will I get married?")]}, context=context)
+
+    career, marriage = model.calls
+    assert career["tools"] == marriage["tools"]  # every tool schema, same bytes and order
+    assert career["system"] == marriage["system"]
+    allowed = [[t["function"]["name"] for t in c["tool_choice"]["allowed_tools"]["tools"]] for c in model.calls]
+    assert allowed == [
+        ["chart_d10_career", "bphs_search_pinecone"],
+        ["chart_d9_marriage", "dasha_vimshottari", "bphs_search_pinecone"],
+    ]
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+
+from langchain.agents import create_agent
+from langchain_core.language_models.fake_chat_models import FakeMessagesListChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.tools import tool
+
+import src.tracing as tracing
+from src.agent import AstrologyContext, TracingMiddleware
+from src.logging_utils import log_call
+from src.tracing import NOOP_SPAN, breakdown, format_breakdown, pop_trace, span, start_trace
+
+
+class _FakeChatModel(FakeMessagesListChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@log_call
+def geocode(city):
+    return city
+
+
+@tool
+def chart_d9_navamsa(city: str) -> str:
+    """Navamsa chart."""
+    return geocode(city)
+
+
+def test_disabled_or_unsampled_turns_are_noops():
+    assert start_trace("turn", "s", enabled=False) is NOOP_SPAN
+    assert start_trace("turn", "s", enabled=True, sample_rate=0.0) is NOOP_SPAN
+    assert span("child") is NOOP_SPAN
+    with start_trace("turn", "s", enabled=False):
+        assert span("child") is NOOP_SPAN
+    assert pop_trace("s") is None
+
+
+def test_turn_trace_nests_model_tool_and_log_call_spans():
+    model = _FakeChatModel(responses=[
+        AIMessage(content="", tool_calls=[{"name": "chart_d9_navamsa", "args": {"city": "Pune"}, "id": "c1"}]),
+        AIMessage(content="done"),
+    ])
+    agent = create_agent(model, tools=[chart_d9_navamsa], context_schema=AstrologyContext,
+                         middleware=[TracingMiddleware()])
+
+    async def run():
+        with start_trace("turn", "trace@example.com", enabled=True):
+            await agent.ainvoke({"messages": [HumanMessage("q")]}, context=AstrologyContext("trace@example.com"))
+
+    asyncio.run(run())
+    trace = pop_trace("trace@example.com")
+    names = [(depth, s.name) for depth, s in breakdown(trace)]
+    assert names[0] == (0, "turn")
+    assert (1, "model") in names and (1, "tool:chart_d9_navamsa") in names
+    assert (2, f"{__name__}.geocode") in names
+    assert len({s.trace.trace_id for s in trace.spans}) == 1
+    assert format_breakdown(trace).startswith(f"trace {trace.trace_id}")
+
+
+def test_log_call_skips_argument_repr_unless_debug(caplog):
+    class Loud:
+        def __repr__(self):
+            raise AssertionError("repr must stay lazy")
+
+    caplog.set_level(logging.INFO)
+    assert geocode(Loud()) is not None